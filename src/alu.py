@@ -0,0 +1,105 @@
+from array import array
+
+# Bit cờ trạng thái, được đóng gói trong một số nguyên (CPU.flag_bits)
+FLAG_O = 0x1  # Overflow Flag
+FLAG_Z = 0x2  # Zero Flag
+FLAG_N = 0x4  # Negative Flag
+
+# Mỗi phần tử bảng ALU là một số 16 bit: byte thấp = kết quả 8 bit, byte cao = các cờ O/Z/N.
+# Chỉ số: ADD/SUB dùng (A << 8) | B, ADDI dùng (A << 4) | Immediate.
+FLAGS_SHIFT = 8
+RESULT_MASK = 0xFF
+
+
+def _to_signed_8bit(value):
+    """Chuyển đổi giá trị không dấu 8-bit (0-255) sang có dấu (-128 đến 127)."""
+    if value > 127:
+        return value - 256
+    return value
+
+
+def zn_flags(value):
+    """Cờ Z/N của một giá trị 8 bit."""
+    return (FLAG_Z if value == 0 else 0) | (FLAG_N if value & 0x80 else 0)
+
+
+# --- Cài đặt tham chiếu (rẽ nhánh), giữ nguyên logic ALU gốc của CPU ---
+# Trả về (kết quả 8 bit, flag_bits). Chỉ dùng để dựng và kiểm tra bảng.
+
+def reference_add(val_a, val_b):
+    result = val_a + val_b
+    signed_a = _to_signed_8bit(val_a)
+    signed_b = _to_signed_8bit(val_b)
+    # Kiểm tra overflow cho phép cộng có dấu
+    overflow = (signed_a > 0 and signed_b > 0 and _to_signed_8bit(result) < 0) or \
+               (signed_a < 0 and signed_b < 0 and _to_signed_8bit(result) > 0)
+    value = result & 0xFF
+    return value, (FLAG_O if overflow else 0) | zn_flags(value)
+
+
+def reference_sub(val_a, val_b):
+    result = val_a - val_b
+    signed_a = _to_signed_8bit(val_a)
+    signed_b = _to_signed_8bit(val_b)
+    # Kiểm tra overflow cho phép trừ có dấu
+    overflow = (signed_a > 0 and signed_b < 0 and _to_signed_8bit(result) < 0) or \
+               (signed_a < 0 and signed_b > 0 and _to_signed_8bit(result) > 0)
+    value = result & 0xFF
+    return value, (FLAG_O if overflow else 0) | zn_flags(value)
+
+
+def reference_addi(val_a, immediate):
+    result = val_a + immediate
+    # immediate luôn dương (0-15) nên chỉ cần kiểm tra trường hợp dương + dương ra âm
+    overflow = _to_signed_8bit(val_a) > 0 and immediate > 0 and _to_signed_8bit(result) < 0
+    value = result & 0xFF
+    return value, (FLAG_O if overflow else 0) | zn_flags(value)
+
+
+def _build_table(reference, operand_bits):
+    """Dựng bảng 16 bit cho mọi cặp (A, operand): 256 x 2^operand_bits phần tử."""
+    table = array('H', bytes(2 << (8 + operand_bits)))
+    for val_a in range(256):
+        base = val_a << operand_bits
+        for operand in range(1 << operand_bits):
+            value, flag_bits = reference(val_a, operand)
+            table[base | operand] = value | (flag_bits << FLAGS_SHIFT)
+    return table
+
+
+# Các bảng được tính một lần khi import (ADD/SUB: 64K phần tử, ADDI: 4K phần tử)
+ADD_TABLE = _build_table(reference_add, 8)
+SUB_TABLE = _build_table(reference_sub, 8)
+ADDI_TABLE = _build_table(reference_addi, 4)
+# Cờ Z/N cho lệnh LOAD_A (O luôn bằng 0)
+ZN_TABLE = bytes(zn_flags(value) for value in range(256))
+
+
+def add(val_a, val_b):
+    """Trả về (kết quả, flag_bits) của A + B."""
+    entry = ADD_TABLE[(val_a << 8) | val_b]
+    return entry & RESULT_MASK, entry >> FLAGS_SHIFT
+
+
+def sub(val_a, val_b):
+    """Trả về (kết quả, flag_bits) của A - B."""
+    entry = SUB_TABLE[(val_a << 8) | val_b]
+    return entry & RESULT_MASK, entry >> FLAGS_SHIFT
+
+
+def addi(val_a, immediate):
+    """Trả về (kết quả, flag_bits) của A + Immediate (0-15)."""
+    entry = ADDI_TABLE[(val_a << 4) | immediate]
+    return entry & RESULT_MASK, entry >> FLAGS_SHIFT
+
+
+def alu_output(op_name, val_a, val_b, immediate=None):
+    """Giá trị ALU_OUT hiển thị trên sơ đồ (chưa thực thi lệnh). Trả về None nếu không phải lệnh ALU."""
+    if op_name == 'ADD':
+        return ADD_TABLE[(val_a << 8) | val_b] & RESULT_MASK
+    elif op_name == 'SUB':
+        return SUB_TABLE[(val_a << 8) | val_b] & RESULT_MASK
+    elif op_name == 'ADDI':
+        return ADDI_TABLE[(val_a << 4) | immediate] & RESULT_MASK
+    return None
+
@@ -0,0 +1,343 @@
+"""
+Trình hợp dịch hai lượt và trình dịch ngược cho tập lệnh của CPU.
+
+    python -m src.assembler program.asm -o program.bin
+    python -m src.assembler program.bin --disassemble
+
+Cú pháp nguồn (không phân biệt hoa thường ở tên lệnh):
+
+    ; chú thích (hoặc #, trừ '#' đứng đầu toán hạng số như '#5')
+    start:  LOAD_A x        ; nhãn, tên lệnh lấy từ OPCODE_MAP, toán hạng là số hoặc nhãn
+            ADDI #1         ; hằng số 4 bit, dấu '#' không bắt buộc
+            STORE_A x
+            HALT
+    .org 14                 ; đặt địa chỉ hiện tại
+    x:      .data 5, 0x07   ; các byte dữ liệu
+
+Kết quả là ảnh bộ nhớ gọn (bytes, tới ô cuối cùng được dùng). assemble_cached() lưu ảnh
+trên đĩa theo mã băm nội dung nguồn, nên hợp dịch lại nguồn không đổi chỉ là một lần đọc file.
+Module này không import PyQt6.
+"""
+import argparse
+import hashlib
+import os
+import re
+import struct
+import sys
+from pathlib import Path
+
+from .cpu_core import OPCODE_MAP, _DECODE_TABLE
+from .memory import extension_bytes
+from .wide_cpu import encode_instruction
+
+_OPERAND_KINDS = {info['name']: info['operands'] for info in OPCODE_MAP.values()}
+_REGS_FIELD = 0b1001  # Trường thanh ghi cố định của ADD/SUB (giống bộ nạp lệnh của giao diện)
+# Chú thích bắt đầu bằng ';' hoặc '#'. Ngoại lệ: '#' đứng đầu một toán hạng (sau tên lệnh hoặc
+# dấu phẩy) và theo sau là chữ số là tiền tố hằng số ('ADDI #5', 'ADDI #0x0F')
+_COMMENT_START = re.compile(r'[;#]')
+_IMMEDIATE_PREFIX = re.compile(r'#\d')
+_OPERAND_START = re.compile(r'(?:,|^\s*(?:[A-Za-z_]\w*\s*:\s*)*[.\w]+\s)\s*$')
+
+# Định dạng file đối tượng trong cache: header, ảnh bộ nhớ, rồi bảng nhãn
+_OBJECT_MAGIC = b'CPUO'
+_OBJECT_VERSION = 1
+_OBJECT_HEADER = struct.Struct('<4sBBIH')  # magic, phiên bản, độ rộng địa chỉ, độ dài ảnh, số nhãn
+_LABEL_ENTRY = struct.Struct('<IB')        # địa chỉ, độ dài tên (UTF-8)
+DEFAULT_CACHE_DIR = Path.home() / '.cache' / 'cpu_visualizer' / 'assembler'
+
+
+class AssemblyError(ValueError):
+    """Lỗi cú pháp/ngữ nghĩa trong nguồn, kèm số dòng (bắt đầu từ 1)."""
+
+    def __init__(self, line, message):
+        super().__init__(f"Line {line}: {message}")
+        self.line = line
+
+
+class AssembledProgram:
+    """
+    Kết quả hợp dịch: image (bytes), labels (tên -> địa chỉ), digest (mã băm nguồn),
+    source_map (địa chỉ -> số dòng nguồn, rỗng nếu lấy từ cache) và cached (True nếu lấy từ cache).
+    """
+
+    def __init__(self, image, labels, address_bits, digest, source_map=None, cached=False):
+        self.image = image
+        self.labels = labels
+        self.address_bits = address_bits
+        self.digest = digest
+        self.source_map = source_map or {}
+        self.cached = cached
+
+
+def source_digest(source, address_bits=4):
+    """Mã băm SHA-256 của nguồn (cùng phiên bản định dạng và độ rộng địa chỉ) dùng làm khóa cache."""
+    hasher = hashlib.sha256()
+    hasher.update(_OBJECT_MAGIC + bytes((_OBJECT_VERSION, address_bits)))
+    hasher.update(source.encode('utf-8'))
+    return hasher.hexdigest()
+
+
+def _strip_comment(line):
+    for match in _COMMENT_START.finditer(line):
+        position = match.start()
+        if (line[position] == '#' and _IMMEDIATE_PREFIX.match(line, position)
+                and _OPERAND_START.search(line, 0, position)):
+            continue
+        return line[:position].strip()
+    return line.strip()
+
+
+def _parse_number(token):
+    try:
+        return int(token, 0)
+    except ValueError:
+        return None
+
+
+def _parse(source):
+    """Tách nguồn thành danh sách (số dòng, nhãn, lệnh/chỉ thị, toán hạng)."""
+    statements = []
+    for number, raw in enumerate(source.splitlines(), 1):
+        line = _strip_comment(raw)
+        labels = []
+        while ':' in line:
+            label, rest = line.split(':', 1)
+            label = label.strip()
+            if not label.isidentifier():
+                raise AssemblyError(number, f"Invalid label '{label}'.")
+            labels.append(label)
+            line = rest.strip()
+        if not line and not labels:
+            continue
+        parts = line.split(None, 1)
+        mnemonic = parts[0].upper() if parts else None
+        operands = [item.strip() for item in parts[1].split(',')] if len(parts) > 1 else []
+        statements.append((number, labels, mnemonic, operands))
+    return statements
+
+
+def _first_pass(statements, address_bits):
+    """Lượt 1: gán địa chỉ cho từng câu lệnh và thu thập nhãn."""
+    size = 1 << address_bits
+    span = extension_bytes(address_bits)
+    labels = {}
+    placed = []
+    address = 0
+    for number, names, mnemonic, operands in statements:
+        for name in names:
+            if name in labels:
+                raise AssemblyError(number, f"Duplicate label '{name}'.")
+            labels[name] = address
+        if mnemonic is None:
+            continue
+        if mnemonic == '.ORG':
+            if len(operands) != 1 or _parse_number(operands[0]) is None:
+                raise AssemblyError(number, ".org requires one numeric address.")
+            address = _parse_number(operands[0])
+            if not 0 <= address < size:
+                raise AssemblyError(number, f"Address {address} is outside memory (0-{size - 1}).")
+            for name in names:
+                labels[name] = address  # Nhãn trên cùng dòng .org trỏ tới địa chỉ mới
+            continue
+        if mnemonic == '.DATA':
+            if not operands or not all(operands):
+                raise AssemblyError(number, ".data requires at least one value.")
+            length = len(operands)
+        elif mnemonic in _OPERAND_KINDS:
+            length = 1 + span if _OPERAND_KINDS[mnemonic] == 'Addr' else 1
+        else:
+            raise AssemblyError(number, f"Unknown instruction '{mnemonic}'.")
+        if address + length > size:
+            raise AssemblyError(number, f"Program does not fit in {size} bytes of memory.")
+        placed.append((address, number, mnemonic, operands))
+        address += length
+    return labels, placed
+
+
+def _resolve(token, labels, number):
+    value = _parse_number(token)
+    if value is None:
+        if token not in labels:
+            raise AssemblyError(number, f"Undefined label or invalid number '{token}'.")
+        value = labels[token]
+    return value
+
+
+def _encode(mnemonic, operands, labels, number, address_bits):
+    """Lượt 2: mã hóa một lệnh/chỉ thị thành bytes."""
+    if mnemonic == '.DATA':
+        values = [_resolve(token, labels, number) for token in operands]
+        for value in values:
+            if not 0 <= value <= 0xFF:
+                raise AssemblyError(number, f"Data value must be between 0 and 255. Received: {value}")
+        return bytes(values)
+
+    kind = _OPERAND_KINDS[mnemonic]
+    value = 0
+    if kind in ('None', 'Regs'):
+        if operands:
+            raise AssemblyError(number, f"{mnemonic} takes no operand.")
+    elif len(operands) != 1:
+        raise AssemblyError(number, f"{mnemonic} requires exactly one operand.")
+    else:
+        token = operands[0]
+        if kind == 'Data' and token.startswith('#'):
+            token = token[1:]
+        value = _resolve(token, labels, number)
+    try:
+        return encode_instruction(mnemonic, value, address_bits)
+    except ValueError as e:
+        raise AssemblyError(number, str(e)) from None
+
+
+def assemble(source, address_bits=4):
+    """
+    Hợp dịch hai lượt. address_bits=4 là máy 16 ô (mỗi lệnh 1 byte); giá trị lớn hơn dùng
+    mã hóa toán hạng mở rộng của WideCPU. Ném AssemblyError (kèm số dòng) khi nguồn có lỗi.
+    """
+    labels, placed = _first_pass(_parse(source), address_bits)
+    image = bytearray()
+    occupied = bytearray()  # 1 = ô đã được một câu lệnh trước dùng
+    source_map = {}
+    for address, number, mnemonic, operands in placed:
+        encoded = _encode(mnemonic, operands, labels, number, address_bits)
+        end = address + len(encoded)
+        if end > len(image):
+            image.extend(bytes(end - len(image)))
+            occupied.extend(bytes(end - len(occupied)))
+        if any(occupied[address:end]):
+            raise AssemblyError(number, f"Overlaps code or data already placed at address {address}.")
+        image[address:end] = encoded
+        occupied[address:end] = b'\x01' * len(encoded)
+        source_map[address] = number
+    return AssembledProgram(bytes(image), labels, address_bits, source_digest(source, address_bits), source_map)
+
+
+def _pack_object(program):
+    parts = [_OBJECT_HEADER.pack(_OBJECT_MAGIC, _OBJECT_VERSION, program.address_bits,
+                                 len(program.image), len(program.labels)), program.image]
+    for name, address in program.labels.items():
+        encoded = name.encode('utf-8')
+        parts.append(_LABEL_ENTRY.pack(address, len(encoded)))
+        parts.append(encoded)
+    return b''.join(parts)
+
+
+def _unpack_object(data, digest):
+    magic, version, address_bits, length, count = _OBJECT_HEADER.unpack_from(data)
+    if magic != _OBJECT_MAGIC or version != _OBJECT_VERSION:
+        raise ValueError("Not an assembler cache object.")
+    offset = _OBJECT_HEADER.size
+    image = bytes(data[offset:offset + length])
+    offset += length
+    labels = {}
+    for _ in range(count):
+        address, size = _LABEL_ENTRY.unpack_from(data, offset)
+        offset += _LABEL_ENTRY.size
+        labels[bytes(data[offset:offset + size]).decode('utf-8')] = address
+        offset += size
+    return AssembledProgram(image, labels, address_bits, digest, cached=True)
+
+
+def assemble_cached(source, address_bits=4, cache_dir=None):
+    """
+    Như assemble() nhưng dùng cache trên đĩa theo mã băm nguồn: nếu file <digest>.obj đã có,
+    trả về ảnh đã lưu mà không hợp dịch lại. Cache hỏng được bỏ qua và ghi lại.
+    """
+    cache_dir = Path(cache_dir) if cache_dir is not None else DEFAULT_CACHE_DIR
+    digest = source_digest(source, address_bits)
+    path = cache_dir / f"{digest}.obj"
+    try:
+        return _unpack_object(path.read_bytes(), digest)
+    except (OSError, ValueError, struct.error, UnicodeDecodeError):
+        pass
+    program = assemble(source, address_bits)
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        # Ghi ra file tạm rồi đổi tên để tiến trình khác không bao giờ đọc được file ghi dở
+        temp = path.with_suffix(f".{os.getpid()}.tmp")
+        temp.write_bytes(_pack_object(program))
+        os.replace(temp, path)
+    except OSError as e:
+        print(f"Warning: could not write assembler cache: {e}", file=sys.stderr)
+    return program
+
+
+def disassemble(image, address_bits=4, labels=None):
+    """
+    Dịch ngược ảnh bộ nhớ thành nguồn hợp dịch được: assemble(disassemble(image)).image == image
+    (bỏ các byte 0 ở cuối). Byte không phải mã hóa chuẩn của một lệnh được xuất thành .data.
+    labels (tên -> địa chỉ) được dùng để đặt nhãn và hiển thị toán hạng địa chỉ.
+    """
+    span = extension_bytes(address_bits)
+    # Lượt 1: tách ảnh thành các lệnh (tên, toán hạng địa chỉ hoặc None, văn bản cố định, độ dài)
+    entries = []
+    address = 0
+    while address < len(image):
+        instruction = image[address]
+        decoded = _DECODE_TABLE[instruction]
+        length = 1 + span if decoded.operands == 'Addr' else 1
+        entry = None
+        if decoded.name != 'UNKNOWN' and address + length <= len(image):
+            if decoded.operands == 'Addr':
+                operand = decoded.operand
+                for index in range(span):
+                    operand |= image[address + 1 + index] << (4 + 8 * index)
+                if operand < (1 << address_bits):
+                    entry = (address, length, decoded.name, operand)
+            elif decoded.operands == 'Data':
+                entry = (address, length, f"{decoded.name} #{decoded.operand}", None)
+            elif instruction & 0xF == (_REGS_FIELD if decoded.operands == 'Regs' else 0):
+                entry = (address, length, decoded.name, None)
+        if entry is None:
+            entry = (address, 1, f".data {instruction}", None)
+        entries.append(entry)
+        address += entry[1]
+
+    # Lượt 2: chỉ dùng nhãn trỏ tới đầu một dòng (các nhãn khác không thể định nghĩa lại được)
+    starts = {entry[0] for entry in entries}
+    names = {}
+    for name, target in (labels or {}).items():
+        if target in starts:
+            names.setdefault(target, name)
+    lines = []
+    for address, length, text, operand in entries:
+        if operand is not None:
+            text = f"{text} {names.get(operand, operand)}"
+        raw = ' '.join(f"{value:08b}" for value in image[address:address + length])
+        label = f"{names[address]}:" if address in names else ""
+        lines.append(f"{label:<10}{text:<20}; {address}: {raw}")
+    return "\n".join(lines) + ("\n" if lines else "")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m src.assembler', description="Assemble or disassemble CPU programs.")
+    parser.add_argument('input', help="Assembly source (.asm) or, with --disassemble, a raw image")
+    parser.add_argument('--output', '-o', default=None, help="Output file (default: <input>.bin, or stdout when disassembling)")
+    parser.add_argument('--disassemble', '-d', action='store_true', help="Disassemble a raw image instead")
+    parser.add_argument('--address-bits', type=int, default=4, help="Address width (default: 4 = 16 cells)")
+    parser.add_argument('--no-cache', action='store_true', help="Always assemble, bypassing the disk cache")
+    args = parser.parse_args(argv)
+
+    if args.disassemble:
+        text = disassemble(Path(args.input).read_bytes(), args.address_bits)
+        if args.output:
+            Path(args.output).write_text(text, encoding='utf-8')
+        else:
+            sys.stdout.write(text)
+        return 0
+
+    source = Path(args.input).read_text(encoding='utf-8')
+    try:
+        program = assemble(source, args.address_bits) if args.no_cache else assemble_cached(source, args.address_bits)
+    except AssemblyError as e:
+        print(f"{args.input}: {e}", file=sys.stderr)
+        return 1
+    output = Path(args.output) if args.output else Path(args.input).with_suffix('.bin')
+    output.write_bytes(program.image)
+    print(f"Wrote {len(program.image)} bytes to {output}{' (cached)' if program.cached else ''}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
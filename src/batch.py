@@ -0,0 +1,168 @@
+"""
+Chạy hàng loạt chương trình (ảnh RAM) không cần giao diện, song song trên nhiều tiến trình.
+
+    python -m src.batch programs/ --max-cycles 10000 --output results.jsonl
+    python -m src.batch --library programs.cpl --max-cycles 10000 --output results.jsonl
+
+Mỗi chương trình tạo ra một bản ghi JSON trên một dòng. Module này không import PyQt6.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from .block_compiler import BlockEngine
+from .cpu_core import CPU, RAM_SIZE
+from .program_library import ProgramLibrary
+
+ENGINES = ('interp', 'blocks')
+
+
+def load_image_file(path):
+    """Đọc một ảnh RAM nhị phân thô (tối đa 16 byte, nạp từ địa chỉ 0)."""
+    data = Path(path).read_bytes()
+    if len(data) > RAM_SIZE:
+        raise ValueError(f"Image is {len(data)} bytes, RAM has only {RAM_SIZE} cells.")
+    return data
+
+
+def run_program(name, image, max_cycles, engine='interp', detect_loops=False):
+    """Chạy một ảnh RAM trên CPU mới và trả về bản ghi kết quả (dict, có thể ghi ra JSON)."""
+    start = time.perf_counter()
+    cpu = CPU()
+    cpu.ram[:len(image)] = image
+    if engine == 'blocks':
+        result = BlockEngine(cpu).run(max_cycles)
+    else:
+        result = cpu.run(max_cycles, detect_loops=detect_loops)
+    record = {
+        'program': name,
+        'status': result['status'],  # halted | max_cycles (timeout) | unknown_opcode | loop
+        'cycles': result['cycles'],
+        'registers': {'A': cpu.reg_a, 'B': cpu.reg_b, 'IAR': cpu.iar, 'IR': cpu.ir},
+        'flags': {'O': cpu.flag_o, 'Z': cpu.flag_z, 'N': cpu.flag_n},
+        'ram': list(cpu.ram),
+        'wall_time': time.perf_counter() - start,
+    }
+    if 'loop_period' in result:
+        record['loop_period'] = result['loop_period']
+    return record
+
+
+def run_file(path, max_cycles, engine='interp', detect_loops=False):
+    """Hàm chạy trong tiến trình con: đọc file ảnh rồi chạy. Lỗi được ghi vào bản ghi thay vì ném ra."""
+    name = os.path.basename(path)
+    try:
+        image = load_image_file(path)
+    except (OSError, ValueError) as e:
+        return {'program': name, 'status': 'error', 'error': str(e)}
+    return run_program(name, image, max_cycles, engine, detect_loops)
+
+
+def run_library_range(library_path, start, stop, max_cycles, engine='interp', detect_loops=False):
+    """
+    Hàm chạy trong tiến trình con: mở thư viện (mmap, dùng chung page cache giữa các tiến trình)
+    rồi chạy các chương trình start..stop-1. Chỉ đường dẫn và khoảng chỉ số được gửi qua IPC.
+    """
+    records = []
+    with ProgramLibrary(library_path) as library:
+        for index in range(start, stop):
+            name = library.names[index]
+            image = library.program(index)
+            if len(image) > RAM_SIZE:
+                records.append({'program': name, 'status': 'error',
+                                'error': f"Image is {len(image)} bytes, RAM has only {RAM_SIZE} cells."})
+            else:
+                records.append(run_program(name, image, max_cycles, engine, detect_loops))
+            image.release()
+    return records
+
+
+def _run_chunk(paths, max_cycles, engine, detect_loops):
+    return [run_file(path, max_cycles, engine, detect_loops) for path in paths]
+
+
+def _chunks(items, size):
+    for index in range(0, len(items), size):
+        yield items[index:index + size]
+
+
+def run_batch(paths, max_cycles, engine='interp', workers=None, chunk_size=64, detect_loops=False):
+    """
+    Chạy danh sách file trên ProcessPoolExecutor, gom nhiều file mỗi lần gửi để giảm chi phí IPC.
+    Trả về iterator các bản ghi theo đúng thứ tự paths.
+    """
+    paths = [str(path) for path in paths]
+    if workers == 1:
+        for path in paths:
+            yield run_file(path, max_cycles, engine, detect_loops)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_run_chunk, chunk, max_cycles, engine, detect_loops) for chunk in _chunks(paths, chunk_size)]
+        for future in futures:
+            yield from future.result()
+
+
+def run_library(library_path, max_cycles, engine='interp', workers=None, chunk_size=64, detect_loops=False):
+    """
+    Như run_batch nhưng đọc mọi chương trình từ một file thư viện (xem program_library).
+    Trả về iterator các bản ghi theo thứ tự trong thư viện.
+    """
+    library_path = str(library_path)
+    with ProgramLibrary(library_path) as library:
+        count = len(library)
+    if workers == 1:
+        yield from run_library_range(library_path, 0, count, max_cycles, engine, detect_loops)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_library_range, library_path, start, min(start + chunk_size, count),
+                                   max_cycles, engine, detect_loops)
+                   for start in range(0, count, chunk_size)]
+        for future in futures:
+            yield from future.result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m src.batch', description="Run CPU program images headlessly.")
+    parser.add_argument('directory', nargs='?', help="Directory containing program images")
+    parser.add_argument('--library', default=None, help="Run every program in a library file (.cpl) instead")
+    parser.add_argument('--pattern', default='*.bin', help="Glob pattern for image files (default: *.bin)")
+    parser.add_argument('--max-cycles', type=int, default=100000, help="Cycle limit per program (default: 100000)")
+    parser.add_argument('--engine', choices=ENGINES, default='interp', help="Execution engine (default: interp)")
+    parser.add_argument('--detect-loops', action='store_true',
+                        help="Stop as soon as the machine state repeats (status 'loop'); interp engine only")
+    parser.add_argument('--workers', type=int, default=None, help="Number of worker processes (default: all cores)")
+    parser.add_argument('--chunk-size', type=int, default=64, help="Programs per task sent to a worker (default: 64)")
+    parser.add_argument('--output', '-o', default='-', help="Output JSON-lines file (default: stdout)")
+    args = parser.parse_args(argv)
+    if args.detect_loops and args.engine != 'interp':
+        parser.error("--detect-loops requires --engine interp")
+    if (args.directory is None) == (args.library is None):
+        parser.error("give either a directory or --library")
+
+    if args.library is not None:
+        records = run_library(args.library, args.max_cycles, args.engine, args.workers, args.chunk_size,
+                              args.detect_loops)
+    else:
+        paths = sorted(Path(args.directory).glob(args.pattern))
+        records = run_batch(paths, args.max_cycles, args.engine, args.workers, args.chunk_size, args.detect_loops)
+    out = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    start = time.perf_counter()
+    count = 0
+    try:
+        for record in records:
+            out.write(json.dumps(record) + "\n")
+            count += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - start
+    print(f"Ran {count} programs in {elapsed:.2f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,227 @@
+import time
+
+from .alu import FLAG_Z, FLAG_N, ADD_TABLE, SUB_TABLE, ADDI_TABLE, ZN_TABLE
+from .cpu_core import RAM_SIZE, _DECODE_TABLE
+
+# Các lệnh kết thúc một basic block
+_BRANCH_OPS = ('JUMP', 'JUMP_NEG', 'JUMP_ZERO')
+_TERMINATOR_OPS = _BRANCH_OPS + ('HALT', 'UNKNOWN')
+_STORE_OPS = ('STORE_A', 'STORE_B')
+_ALU_OPS = ('ADD', 'SUB', 'ADDI')
+
+
+class BlockEngine:
+    """
+    Engine thực thi tùy chọn: chia chương trình 16 ô thành các basic block
+    (tách tại đích nhảy và lệnh rẽ nhánh), biên dịch mỗi block một lần thành
+    một hàm Python sinh từ mã nguồn, rồi chạy nguyên block trong mỗi lần dispatch.
+
+    Kết quả (số chu kỳ, trạng thái cuối) khớp chính xác với CPU.run(), nên hai
+    engine có thể được đối chiếu với nhau.
+
+    Với CPU chế độ Harvard, block được dịch từ bộ nhớ chương trình bất biến: STORE chỉ ghi
+    Data RAM, không sinh mã kiểm tra/hủy block và không cắt block vì tự sửa mã.
+    """
+
+    def __init__(self, cpu):
+        self.cpu = cpu
+        self._blocks = [None] * RAM_SIZE        # Hàm đã biên dịch theo địa chỉ bắt đầu
+        self._lengths = [0] * RAM_SIZE          # Số lệnh tối đa của mỗi block
+        self._cells = [()] * RAM_SIZE           # Các ô RAM mà block bao phủ
+        self._cell_blocks = [set() for _ in range(RAM_SIZE)]  # Ô RAM -> các block chứa nó
+        self._ram_seen = None                   # Ảnh bộ nhớ lệnh khi kết thúc lần chạy trước
+        self._harvard_seen = False              # Chế độ bộ nhớ của lần chạy trước
+        self._namespace = {
+            'ADD': ADD_TABLE,
+            'SUB': SUB_TABLE,
+            'ADDI': ADDI_TABLE,
+            'ZN': ZN_TABLE,
+            'cb': self._cell_blocks,
+            'inv': self.invalidate_cell,
+        }
+
+    def invalidate_cell(self, address):
+        """Hủy mọi block chứa ô RAM address (gọi khi ô này bị ghi)."""
+        for start in list(self._cell_blocks[address]):
+            for cell in self._cells[start]:
+                self._cell_blocks[cell].discard(start)
+            self._blocks[start] = None
+            self._cells[start] = ()
+
+    def invalidate_all(self):
+        for address in range(RAM_SIZE):
+            self.invalidate_cell(address)
+
+    def _code(self):
+        """Bộ nhớ chứa lệnh: bộ nhớ chương trình (Harvard) hoặc RAM dùng chung."""
+        cpu = self.cpu
+        return cpu.program if cpu.program is not None else cpu.ram
+
+    def _revalidate(self):
+        """Hủy các block có ô RAM bị ghi từ bên ngoài (write_ram, load_instruction...) giữa hai lần chạy."""
+        ram = self._code()
+        seen = self._ram_seen
+        if seen is None or self._harvard_seen != (self.cpu.program is not None):
+            self.invalidate_all()
+            return
+        if seen != ram:
+            for address in range(RAM_SIZE):
+                if seen[address] != ram[address]:
+                    self.invalidate_cell(address)
+
+    def _leaders(self):
+        """Tập đích nhảy của chương trình hiện tại (đầu các basic block)."""
+        targets = set()
+        for instruction in self._code():
+            decoded = _DECODE_TABLE[instruction]
+            if decoded.name in _BRANCH_OPS:
+                targets.add(decoded.operand)
+        return targets
+
+    def _collect_block(self, start):
+        """Danh sách (địa chỉ, lệnh đã giải mã) của block bắt đầu tại start."""
+        ram = self._code()
+        leaders = self._leaders()
+        block = []
+        address = start
+        while len(block) < RAM_SIZE:
+            decoded = _DECODE_TABLE[ram[address]]
+            block.append((address, decoded))
+            if decoded.name in _TERMINATOR_OPS:
+                break
+            address = (address + 1) % RAM_SIZE
+            if address in leaders or address == start:
+                break
+
+        if self.cpu.program is not None:
+            return block  # Harvard: STORE không thể sửa lệnh
+
+        # Lệnh STORE ghi vào một ô phía sau trong cùng block (tự sửa mã):
+        # cắt block ngay sau lệnh STORE để phần còn lại được giải mã lại.
+        addresses = [address for address, _ in block]
+        for index, (address, decoded) in enumerate(block):
+            if decoded.name in _STORE_OPS and decoded.operand in addresses[index + 1:]:
+                return block[:index + 1]
+        return block
+
+    def _compile(self, start):
+        block = self._collect_block(start)
+        harvard = self.cpu.program is not None
+        lines = [
+            "def block(cpu):",
+            "    ram = cpu.ram",
+            "    dc = cpu._decode_cache",
+            "    a = cpu.reg_a",
+            "    b = cpu.reg_b",
+            "    f = cpu.flag_bits",
+        ]
+        not_o = (FLAG_Z | FLAG_N)
+        o_dirty = True  # Cờ O của lệnh trước có thể đang bật
+        last_address, last = block[-1]
+        next_address = (last_address + 1) % RAM_SIZE
+        writeback = "cpu.reg_a = a; cpu.reg_b = b; cpu.flag_bits = f; cpu.ir = %d" % last.instruction
+
+        for address, decoded in block:
+            name = decoded.name
+            operand = decoded.operand
+            lines.append(f"    # RAM[{address}]: {name} {'' if operand is None else operand}")
+            if o_dirty and name not in _ALU_OPS and name != 'LOAD_A':
+                lines.append(f"    f &= {not_o}")
+            o_dirty = name in _ALU_OPS
+
+            if name == 'LOAD_A':
+                lines.append(f"    a = ram[{operand}]; f = ZN[a]")
+            elif name == 'LOAD_B':
+                lines.append(f"    b = ram[{operand}]")
+            elif name in _STORE_OPS:
+                register = 'a' if name == 'STORE_A' else 'b'
+                if harvard:
+                    lines.append(f"    ram[{operand}] = {register}")
+                else:
+                    lines.append(f"    ram[{operand}] = {register}; dc[{operand}] = None")
+                    lines.append(f"    if cb[{operand}]: inv({operand})")
+            elif name == 'ADD':
+                lines.append("    e = ADD[(a << 8) | b]; a = e & 255; f = e >> 8")
+            elif name == 'SUB':
+                lines.append("    e = SUB[(a << 8) | b]; a = e & 255; f = e >> 8")
+            elif name == 'ADDI':
+                lines.append(f"    e = ADDI[(a << 4) | {operand}]; a = e & 255; f = e >> 8")
+            elif name == 'JUMP':
+                next_address = operand
+            elif name == 'JUMP_NEG' or name == 'JUMP_ZERO':
+                flag = FLAG_N if name == 'JUMP_NEG' else FLAG_Z
+                lines.append(f"    {writeback}")
+                lines.append(f"    cpu.iar = {operand} if f & {flag} else {next_address}")
+                lines.append(f"    return {len(block)}")
+            elif name == 'HALT':
+                # IAR giữ nguyên tại lệnh HALT
+                lines.append("    cpu.is_halted = True")
+                next_address = address
+            elif name == 'UNKNOWN':
+                lines.append("    cpu.is_halted = True")
+
+        if last.name not in ('JUMP_NEG', 'JUMP_ZERO'):
+            lines.append(f"    {writeback}")
+            lines.append(f"    cpu.iar = {next_address}")
+            lines.append(f"    return {len(block)}")
+
+        namespace = dict(self._namespace)
+        exec(compile("\n".join(lines), f"<block {start}>", "exec"), namespace)
+        function = namespace['block']
+
+        cells = tuple(address for address, _ in block)
+        self._blocks[start] = function
+        self._lengths[start] = len(block)
+        self._cells[start] = cells
+        for cell in cells:
+            self._cell_blocks[cell].add(start)
+        return function
+
+    def _step(self):
+        """Thực thi một lệnh bằng trình thông dịch (dùng khi block dài hơn số chu kỳ còn lại)."""
+        cpu = self.cpu
+        cpu.run(1)
+        decoded = _DECODE_TABLE[cpu.ir]
+        if decoded.name in _STORE_OPS and cpu.program is None:
+            self.invalidate_cell(decoded.operand)
+        return 1
+
+    def run(self, max_cycles=100000):
+        """Chạy tối đa max_cycles lệnh theo từng block. Trả về dict giống CPU.run()."""
+        cpu = self.cpu
+        blocks = self._blocks
+        lengths = self._lengths
+        cycles = 0
+        was_halted = cpu.is_halted
+        start_time = time.perf_counter()
+        self._revalidate()
+
+        while cycles < max_cycles and not cpu.is_halted:
+            iar = cpu.iar
+            block = blocks[iar]
+            if block is None:
+                block = self._compile(iar)
+            if lengths[iar] <= max_cycles - cycles:
+                cycles += block(cpu)
+            else:
+                cycles += self._step()
+
+        elapsed = time.perf_counter() - start_time
+        self._ram_seen = bytes(self._code())
+        self._harvard_seen = cpu.program is not None
+        cpu.jump_occurred = False
+        cpu.last_decoded_instruction = None
+
+        if not cpu.is_halted:
+            status = 'max_cycles'
+        elif was_halted or _DECODE_TABLE[cpu.ir].name == 'HALT':
+            status = 'halted'
+        else:
+            status = 'unknown_opcode'
+        return {
+            'cycles': cycles,
+            'status': status,
+            'halted': cpu.is_halted,
+            'elapsed': elapsed,
+            'cycles_per_sec': cycles / elapsed if elapsed > 0 else 0.0,
+        }
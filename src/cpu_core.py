@@ -1,101 +1,407 @@
+import time
+from collections import namedtuple
+
+from .alu import FLAG_O, FLAG_Z, FLAG_N, FLAGS_SHIFT, RESULT_MASK, ADD_TABLE, SUB_TABLE, ADDI_TABLE, ZN_TABLE, alu_output
+
+RAM_SIZE = 16  # 16 địa chỉ, mỗi địa chỉ 8 bit
+
+# Bảng mã lệnh (Opcode definitions)
+OPCODE_MAP = {
+    '0000': {'name': 'NOP', 'description': 'No Operation', 'operands': 'None'},
+    '0001': {'name': 'LOAD_A', 'description': 'Load value from RAM[Addr] into Reg A', 'operands': 'Addr'},
+    '0010': {'name': 'LOAD_B', 'description': 'Load value from RAM[Addr] into Reg B', 'operands': 'Addr'},
+    '0011': {'name': 'STORE_A', 'description': 'Store value from Reg A to RAM[Addr]', 'operands': 'Addr'},
+    '0100': {'name': 'STORE_B', 'description': 'Store value from Reg B to RAM[Addr]', 'operands': 'Addr'},
+    '0101': {'name': 'ADD', 'description': 'Reg A = Reg A + Reg B', 'operands': 'Regs'},
+    '0110': {'name': 'SUB', 'description': 'Reg A = Reg A - Reg B', 'operands': 'Regs'},
+    '0111': {'name': 'JUMP', 'description': 'Jump to instruction at RAM[Addr]', 'operands': 'Addr'},
+    '1000': {'name': 'JUMP_NEG', 'description': 'Jump to RAM[Addr] if N flag is set', 'operands': 'Addr'},
+    '1001': {'name': 'JUMP_ZERO', 'description': 'Jump to RAM[Addr] if Z flag is set', 'operands': 'Addr'},
+    '1010': {'name': 'ADDI', 'description': 'Reg A = Reg A + Immediate_Value', 'operands': 'Data'}, # <-- Lệnh ADDI mới
+    '1111': {'name': 'HALT', 'description': 'Stop program execution', 'operands': 'None'}
+}
+
+# Ảnh chụp trạng thái (snapshot): 16 byte RAM + A, B, IAR, cờ, IR, byte trạng thái = 22 byte
+SNAPSHOT_SIZE = RAM_SIZE + 6
+_SNAP_HALTED = 0x1
+_SNAP_JUMPED = 0x2
+
+# Tập thay đổi giữa hai snapshot: các ô RAM, thanh ghi ('A', 'B', 'IAR', 'IR') và cờ ('O', 'Z', 'N') đã đổi
+ChangeSet = namedtuple('ChangeSet', ['ram', 'registers', 'flags', 'halted'])
+_REGISTER_OFFSETS = (('A', RAM_SIZE), ('B', RAM_SIZE + 1), ('IAR', RAM_SIZE + 2), ('IR', RAM_SIZE + 4))
+_FLAG_OFFSET = RAM_SIZE + 3
+_STATUS_OFFSET = RAM_SIZE + 5
+
+# Bản ghi lệnh đã giải mã (bất biến, dùng chung giữa các ô RAM có cùng byte lệnh)
+DecodedInstruction = namedtuple('DecodedInstruction', ['instruction', 'opcode', 'operand', 'name', 'operands'])
+
+
+def _build_decode_table():
+    """Giải mã trước toàn bộ 256 byte lệnh có thể có."""
+    table = []
+    for instruction in range(256):
+        opcode = instruction >> 4
+        info = OPCODE_MAP.get(f"{opcode:04b}", {'name': 'UNKNOWN', 'operands': 'None'})
+        operand = instruction & 0xF if info['operands'] in ('Addr', 'Data') else None
+        table.append(DecodedInstruction(instruction, opcode, operand, info['name'], info['operands']))
+    return tuple(table)
+
+
+_DECODE_TABLE = _build_decode_table()
+
+
+# --- Bảng xử lý lệnh (handler table), đánh chỉ số theo opcode 4 bit ---
+# Mỗi handler nhận (cpu, operand), không in gì ra màn hình.
+# Cờ O đã được xóa trước khi gọi handler.
+# Trả về True nếu IAR đã được đặt (JUMP thành công hoặc HALT), khi đó không tăng IAR.
+
+def _op_nop(cpu, operand):
+    return False
+
+
+def _op_load_a(cpu, operand):
+    value = cpu.ram[operand]
+    cpu.reg_a = value
+    cpu.flag_bits = ZN_TABLE[value]
+    return False
+
+
+def _op_load_b(cpu, operand):
+    # LOAD_B không thay đổi cờ Z/N
+    cpu.reg_b = cpu.ram[operand]
+    return False
+
+
+def _op_store_a(cpu, operand):
+    cpu.ram[operand] = cpu.reg_a
+    cpu._decode_cache[operand] = None
+    return False
+
+
+def _op_store_b(cpu, operand):
+    cpu.ram[operand] = cpu.reg_b
+    cpu._decode_cache[operand] = None
+    return False
+
+
+# Lệnh ALU tra bảng dựng sẵn trong alu.py: kết quả và cờ O/Z/N trong một lần tra
+def _op_add(cpu, operand):
+    entry = ADD_TABLE[(cpu.reg_a << 8) | cpu.reg_b]
+    cpu.reg_a = entry & RESULT_MASK
+    cpu.flag_bits = entry >> FLAGS_SHIFT
+    return False
+
+
+def _op_sub(cpu, operand):
+    entry = SUB_TABLE[(cpu.reg_a << 8) | cpu.reg_b]
+    cpu.reg_a = entry & RESULT_MASK
+    cpu.flag_bits = entry >> FLAGS_SHIFT
+    return False
+
+
+def _op_addi(cpu, operand):
+    entry = ADDI_TABLE[(cpu.reg_a << 4) | operand]
+    cpu.reg_a = entry & RESULT_MASK
+    cpu.flag_bits = entry >> FLAGS_SHIFT
+    return False
+
+
+def _op_jump(cpu, operand):
+    cpu.iar = operand
+    return True
+
+
+def _op_jump_neg(cpu, operand):
+    if cpu.flag_bits & FLAG_N:
+        cpu.iar = operand
+        return True
+    return False
+
+
+def _op_jump_zero(cpu, operand):
+    if cpu.flag_bits & FLAG_Z:
+        cpu.iar = operand
+        return True
+    return False
+
+
+def _op_halt(cpu, operand):
+    # IAR giữ nguyên tại lệnh HALT
+    cpu.is_halted = True
+    return True
+
+
+def _op_unknown(cpu, operand):
+    # Opcode không xác định: dừng CPU, IAR vẫn được tăng như các lệnh thường
+    cpu.is_halted = True
+    return False
+
+
+_HANDLERS = (
+    _op_nop,        # 0000 NOP
+    _op_load_a,     # 0001 LOAD_A
+    _op_load_b,     # 0010 LOAD_B
+    _op_store_a,    # 0011 STORE_A
+    _op_store_b,    # 0100 STORE_B
+    _op_add,        # 0101 ADD
+    _op_sub,        # 0110 SUB
+    _op_jump,       # 0111 JUMP
+    _op_jump_neg,   # 1000 JUMP_NEG
+    _op_jump_zero,  # 1001 JUMP_ZERO
+    _op_addi,       # 1010 ADDI
+    _op_unknown,    # 1011
+    _op_unknown,    # 1100
+    _op_unknown,    # 1101
+    _op_unknown,    # 1110
+    _op_halt,       # 1111 HALT
+)
+
+
+# Chế độ Harvard: bộ nhớ chương trình chỉ đọc nên STORE không bao giờ chạm tới lệnh,
+# không cần hủy cache giải mã
+def _op_store_a_data(cpu, operand):
+    cpu.ram[operand] = cpu.reg_a
+    return False
+
+
+def _op_store_b_data(cpu, operand):
+    cpu.ram[operand] = cpu.reg_b
+    return False
+
+
+_HARVARD_HANDLERS = _HANDLERS[:3] + (_op_store_a_data, _op_store_b_data) + _HANDLERS[5:]
+
+
+def diff_snapshots(old, new):
+    """So sánh hai snapshot, trả về ChangeSet. old là None nghĩa là mọi thứ đều được coi là đã đổi."""
+    if old is None:
+        return ChangeSet(tuple(range(RAM_SIZE)), frozenset(name for name, _ in _REGISTER_OFFSETS),
+                         frozenset(('O', 'Z', 'N')), True)
+    if old == new:
+        return ChangeSet((), frozenset(), frozenset(), False)
+    ram = ()
+    if old[:RAM_SIZE] != new[:RAM_SIZE]:
+        ram = tuple(address for address in range(RAM_SIZE) if old[address] != new[address])
+    registers = frozenset(name for name, offset in _REGISTER_OFFSETS if old[offset] != new[offset])
+    changed_bits = old[_FLAG_OFFSET] ^ new[_FLAG_OFFSET]
+    flags = frozenset(name for name, bit in (('O', FLAG_O), ('Z', FLAG_Z), ('N', FLAG_N)) if changed_bits & bit)
+    halted = (old[_STATUS_OFFSET] ^ new[_STATUS_OFFSET]) & _SNAP_HALTED != 0
+    return ChangeSet(ram, registers, flags, halted)
+
+
+class LoopDetector:
+    """
+    Phát hiện chu trình theo thuật toán Brent, bộ nhớ O(1).
+    Gọi update() với khóa trạng thái sau mỗi lệnh; trả về chu kỳ lặp (số lệnh) khi
+    trạng thái lặp lại, ngược lại trả về 0. Máy là tất định nên trạng thái lặp lại
+    chứng minh chương trình không bao giờ dừng.
+    """
+    __slots__ = ('tortoise', 'power', 'period')
+
+    def __init__(self, initial_key):
+        self.tortoise = initial_key
+        self.power = 1
+        self.period = 1
+
+    def update(self, key):
+        if key == self.tortoise:
+            return self.period
+        if self.power == self.period:
+            self.tortoise = key
+            self.power *= 2
+            self.period = 0
+        self.period += 1
+        return 0
+
+
 class CPU:
-    def __init__(self):
-        # Khởi tạo RAM: 16 địa chỉ, mỗi địa chỉ 8 bit (sử dụng list chứa chuỗi bit)
-        self.ram = ["00000000"] * 16  # 16 địa chỉ, mỗi địa chỉ 8 bit, khởi tạo là 0
+    # Trạng thái máy lưu dưới dạng số nguyên, không dùng chuỗi bit trong vòng lặp chính
+    __slots__ = (
+        'ram',          # bytearray 16 byte (chế độ Harvard: chỉ chứa dữ liệu)
+        'program',      # Chế độ Harvard: bộ nhớ chương trình bytes 16 byte, bất biến; None = RAM dùng chung
+        'reg_a',        # Register A (8-bit value, 0-255)
+        'reg_b',        # Register B (8-bit value, 0-255)
+        'iar',          # Instruction Address Register (Program Counter - PC) - 4 bits (0-15)
+        'ir',           # Instruction Register: byte lệnh đầy đủ (opcode = 4 bit cao, addr/data = 4 bit thấp)
+        'flag_bits',    # Các cờ O/Z/N đóng gói (FLAG_O | FLAG_Z | FLAG_N)
+        'is_halted',
+        'jump_occurred',
+        'last_decoded_instruction',
+        '_decode_cache',  # Bản ghi DecodedInstruction theo từng ô RAM (None = chưa giải mã)
+        '_handlers',      # Bảng handler theo chế độ bộ nhớ
+    )
+
+    opcode_map = OPCODE_MAP
+
+    def __init__(self, harvard=False):
+        # Khởi tạo RAM: 16 địa chỉ, mỗi địa chỉ 8 bit, khởi tạo là 0
+        self.ram = bytearray(RAM_SIZE)
+        self.program = None
+        self._handlers = _HANDLERS
 
         # Khởi tạo các thanh ghi (Registers)
-        self.registers = {
-            'A': 0,      # Register A (8-bit value, 0-255)
-            'B': 0,      # Register B (8-bit value, 0-255)
-            'IR_Opcode': '0000',  # Instruction Register - Opcode part (4 bits string)
-            'IR_AddrData': '0000',  # Instruction Register - Address/Data part (4 bits string)
-            'IAR': 0,    # Instruction Address Register (Program Counter - PC) - 4 bits (0-15)
-        }
+        self.reg_a = 0
+        self.reg_b = 0
+        self.iar = 0
+        self.ir = 0
 
         # Khởi tạo các cờ trạng thái (Flags)
-        self.flags = {
-            'O': False,  # Overflow Flag
-            'Z': False,  # Zero Flag
-            'N': False   # Negative Flag
-        }
-
-        # Bảng mã lệnh (Opcode definitions)
-        self.opcode_map = {
-            '0000': {'name': 'NOP', 'description': 'No Operation', 'operands': 'None'},
-            '0001': {'name': 'LOAD_A', 'description': 'Load value from RAM[Addr] into Reg A', 'operands': 'Addr'},
-            '0010': {'name': 'LOAD_B', 'description': 'Load value from RAM[Addr] into Reg B', 'operands': 'Addr'},
-            '0011': {'name': 'STORE_A', 'description': 'Store value from Reg A to RAM[Addr]', 'operands': 'Addr'},
-            '0100': {'name': 'STORE_B', 'description': 'Store value from Reg B to RAM[Addr]', 'operands': 'Addr'},
-            '0101': {'name': 'ADD', 'description': 'Reg A = Reg A + Reg B', 'operands': 'Regs'},
-            '0110': {'name': 'SUB', 'description': 'Reg A = Reg A - Reg B', 'operands': 'Regs'},
-            '0111': {'name': 'JUMP', 'description': 'Jump to instruction at RAM[Addr]', 'operands': 'Addr'},
-            '1000': {'name': 'JUMP_NEG', 'description': 'Jump to RAM[Addr] if N flag is set', 'operands': 'Addr'},
-            '1001': {'name': 'JUMP_ZERO', 'description': 'Jump to RAM[Addr] if Z flag is set', 'operands': 'Addr'},
-            '1010': {'name': 'ADDI', 'description': 'Reg A = Reg A + Immediate_Value', 'operands': 'Data'}, # <-- Lệnh ADDI mới
-            '1111': {'name': 'HALT', 'description': 'Stop program execution', 'operands': 'None'}
-        }
+        self.flag_bits = 0
 
         self.is_halted = False  # Cờ báo hiệu CPU đã dừng
+        self.jump_occurred = False
         self.last_decoded_instruction = None  # Lưu trữ lệnh đã giải mã
+        self._decode_cache = [None] * RAM_SIZE
+        if harvard:
+            self.load_program(bytes(RAM_SIZE))
+
+    @property
+    def harvard(self):
+        """True nếu CPU có bộ nhớ chương trình riêng (Program RAM) tách khỏi Data RAM."""
+        return self.program is not None
+
+    def load_program(self, image):
+        """
+        Chuyển sang chế độ Harvard (nếu chưa) và đặt bộ nhớ chương trình bằng image (tối đa 16 byte).
+        Chương trình được giải mã trước toàn bộ một lần; khi chạy không còn bước kiểm tra hủy cache nào.
+        """
+        if len(image) > RAM_SIZE:
+            raise ValueError(f"Program is {len(image)} bytes, Program RAM has only {RAM_SIZE} cells.")
+        self.program = bytes(image) + bytes(RAM_SIZE - len(image))
+        self._decode_cache = [_DECODE_TABLE[instruction] for instruction in self.program]
+        self._handlers = _HARVARD_HANDLERS
+
+    def unload_program(self):
+        """Trở về chế độ RAM dùng chung (von Neumann); RAM giữ nội dung Data RAM hiện tại."""
+        self.program = None
+        self._decode_cache = [None] * RAM_SIZE
+        self._handlers = _HANDLERS
+
+    # --- Các view dạng chuỗi bit / bool dành cho GUI ---
+
+    @property
+    def ram_bits(self):
+        """Danh sách chuỗi bit 8 ký tự của từng ô RAM (dùng cho bảng RAM)."""
+        return [f"{value:08b}" for value in self.ram]
+
+    @property
+    def program_bits(self):
+        """Chuỗi bit của từng ô bộ nhớ chương trình (chế độ Harvard), None nếu RAM dùng chung."""
+        if self.program is None:
+            return None
+        return [f"{value:08b}" for value in self.program]
+
+    @property
+    def ir_opcode_bits(self):
+        return f"{self.ir >> 4:04b}"
+
+    @property
+    def ir_addrdata_bits(self):
+        return f"{self.ir & 0xF:04b}"
+
+    @property
+    def flag_o(self):
+        return (self.flag_bits & FLAG_O) != 0
+
+    @property
+    def flag_z(self):
+        return (self.flag_bits & FLAG_Z) != 0
+
+    @property
+    def flag_n(self):
+        return (self.flag_bits & FLAG_N) != 0
 
     def read_ram(self, address):
-        """Đọc giá trị 8-bit từ địa chỉ RAM."""
+        """Đọc giá trị 8-bit (0-255) từ địa chỉ RAM."""
         if 0 <= address < len(self.ram):
             return self.ram[address]
         else:
             print(f"Error: Invalid RAM address on read: {address}")
-            return "00000000"
-
-    def write_ram(self, address, data_str):
-        """Ghi giá trị 8-bit vào địa chỉ RAM."""
-        if not isinstance(data_str, str) or len(data_str) != 8 or not all(c in '01' for c in data_str):
-            raise ValueError(f"RAM data must be an 8-bit string. Received: {data_str}")
+            return 0
+
+    def write_ram(self, address, value):
+        """Ghi giá trị 8-bit vào địa chỉ RAM. Nhận số nguyên 0-255 hoặc chuỗi 8 bit."""
+        if isinstance(value, str):
+            # strip('01') trả về chuỗi rỗng khi và chỉ khi mọi ký tự là '0' hoặc '1'
+            if len(value) != 8 or value.strip('01'):
+                raise ValueError(f"RAM data must be an 8-bit string. Received: {value}")
+            value = int(value, 2)
+        elif not isinstance(value, int) or not 0 <= value <= 0xFF:
+            raise ValueError(f"RAM data must be an 8-bit value (0-255). Received: {value}")
         if 0 <= address < len(self.ram):
-            self.ram[address] = data_str
+            self.ram[address] = value
+            if self.program is None:
+                self._decode_cache[address] = None
         else:
             print(f"Error: Invalid RAM address while writing: {address}")
-            
-    def load_instruction(self, address, full_instruction_str):
+
+    def load_image(self, image, offset=0):
         """
-        Nạp một lệnh 8-bit (chuỗi nhị phân) vào RAM.
+        Nạp cả một ảnh bộ nhớ (bytes) từ offset bằng một lần chép, không in gì ra màn hình.
+        Chế độ Harvard: ảnh vào Program RAM và cũng là giá trị ban đầu của Data RAM (như khi bật chế độ).
         """
-        self.write_ram(address, full_instruction_str)
-        
-        opcode_str = full_instruction_str[:4]
-        operand_str = full_instruction_str[4:]
-        op_info = self.opcode_map.get(opcode_str, {'name': 'UNKNOWN', 'operands': 'None'})
-
-        operand_display = ''
-        if op_info['operands'] == 'Addr':
-            operand_display = f" {int(operand_str, 2)}"
-        elif op_info['operands'] == 'Data': # Cập nhật để hiển thị hằng số
-            operand_display = f" #{int(operand_str, 2)}" # Dùng '#' để ký hiệu hằng số
-        elif op_info['operands'] == 'Regs':
-            operand_display = " RegA, RegB"
+        if not 0 <= offset <= RAM_SIZE - len(image):
+            raise ValueError(f"Image of {len(image)} bytes at offset {offset} does not fit in {RAM_SIZE} RAM cells.")
+        end = offset + len(image)
+        self.ram[offset:end] = image
+        if self.program is not None:
+            program = bytearray(self.program)
+            program[offset:end] = image
+            self.load_program(program)
         else:
-            operand_display = ''
-        
-        print(f"Load instruction: RAM[{address}] = {full_instruction_str} ({op_info['name']}{operand_display})")
+            self._decode_cache[offset:end] = [None] * len(image)
+        self.last_decoded_instruction = None
 
-    def _update_flags_ZN(self, result):
+    def load_instruction(self, address, instruction):
         """
-        Cập nhật cờ Zero (Z) và Negative (N) dựa trên kết quả của phép toán.
-        Lưu ý: Cờ Overflow (O) phải được xử lý riêng trong các phép toán.
+        Nạp một lệnh 8-bit (số nguyên hoặc chuỗi nhị phân) vào RAM
+        (chế độ Harvard: vào bộ nhớ chương trình).
         """
-        # Cờ Zero (Z): Bật nếu kết quả bằng 0
-        self.flags['Z'] = (result == 0)
+        if self.program is not None:
+            if not 0 <= address < RAM_SIZE:
+                print(f"Error: Invalid program address while writing: {address}")
+                return
+            if isinstance(instruction, str):
+                if len(instruction) != 8 or instruction.strip('01'):
+                    raise ValueError(f"Instruction must be an 8-bit string. Received: {instruction}")
+                instruction = int(instruction, 2)
+            elif not isinstance(instruction, int) or not 0 <= instruction <= 0xFF:
+                raise ValueError(f"Instruction must be an 8-bit value (0-255). Received: {instruction}")
+            program = bytearray(self.program)
+            program[address] = instruction
+            self.load_program(program)
+            decoded = self._decode_cache[address]
+            location = "Program RAM"
+        else:
+            self.write_ram(address, instruction)
+            decoded = _DECODE_TABLE[self.read_ram(address)]
+            location = "RAM"
+
+        operand_display = ''
+        if decoded.operands == 'Addr':
+            operand_display = f" {decoded.operand}"
+        elif decoded.operands == 'Data': # Cập nhật để hiển thị hằng số
+            operand_display = f" #{decoded.operand}" # Dùng '#' để ký hiệu hằng số
+        elif decoded.operands == 'Regs':
+            operand_display = " RegA, RegB"
 
-        # Cờ Negative (N): Bật nếu bit cao nhất (bit thứ 7) của kết quả là 1.
-        # Sử dụng & 0x80 (nhị phân 10000000) để kiểm tra bit thứ 7.
-        self.flags['N'] = (result & 0x80) != 0
-        print(f"Flags Z: {self.flags['Z']}, N: {self.flags['N']}")
+        print(f"Load instruction: {location}[{address}] = {decoded.instruction:08b} ({decoded.name}{operand_display})")
 
+    def invalidate_decode_cache(self, address=None):
+        """
+        Xóa bản ghi giải mã của một ô RAM (hoặc toàn bộ nếu address là None).
+        Cần gọi hàm này nếu ghi trực tiếp vào cpu.ram thay vì qua write_ram().
+        Ở chế độ Harvard lệnh nằm trong bộ nhớ chương trình bất biến nên không có gì để hủy.
+        """
+        if self.program is not None:
+            return
+        if address is None:
+            self._decode_cache[:] = [None] * len(self._decode_cache)
+        else:
+            self._decode_cache[address] = None
 
-    def _to_signed_8bit(self, value):
-        """Chuyển đổi giá trị không dấu 8-bit (0-255) sang có dấu (-128 đến 127)."""
-        if value > 127:
-            return value - 256
-        return value
+    def _trace_flags(self):
+        print(f"Flags Z: {self.flag_z}, N: {self.flag_n}")
 
     def fetch_instruction(self):
         """
@@ -104,221 +410,266 @@ class CPU:
         if self.is_halted:
             return None
 
-        current_address = self.registers['IAR']
-        instruction_bits = self.read_ram(current_address)
+        current_address = self.iar
+        if self.program is not None:
+            instruction = self.program[current_address]  # Đường Fetch riêng của bộ nhớ chương trình
+        else:
+            instruction = self.read_ram(current_address)
 
-        self.registers['IR_Opcode'] = instruction_bits[:4]
-        self.registers['IR_AddrData'] = instruction_bits[4:]
+        self.ir = instruction
 
-        print(f"Fetch: RAM[{current_address}] -> IR ({self.registers['IR_Opcode']} {self.registers['IR_AddrData']})")
+        print(f"Fetch: RAM[{current_address}] -> IR ({self.ir_opcode_bits} {self.ir_addrdata_bits})")
 
-        return instruction_bits
+        return instruction
 
     def decode_instruction(self):
         """
         Pha Decode: Giải mã lệnh từ IR để xác định Opcode và Operand.
         """
-        opcode_str = self.registers['IR_Opcode']
-        operand_str = self.registers['IR_AddrData']
-
-        instruction_info = self.opcode_map.get(opcode_str)
+        decoded = _DECODE_TABLE[self.ir]
+        self.last_decoded_instruction = decoded
 
-        if not instruction_info:
-            print(f"Decode: Unknown command: {opcode_str}")
-            self.last_decoded_instruction = {'name': 'UNKNOWN', 'operands': 'None', 'opcode_str': opcode_str, 'operand_val': None}
-            return self.last_decoded_instruction
+        if decoded.name == 'UNKNOWN':
+            print(f"Decode: Unknown command: {self.ir_opcode_bits}")
+            return decoded
 
         operand_display = 'N/A'
-        operand_value = None
-        if instruction_info['operands'] in ['Addr', 'Data']: # Cập nhật để xử lý cả Addr và Data
-            operand_value = int(operand_str, 2)
-            if instruction_info['operands'] == 'Data':
-                operand_display = f"#{operand_value}" # Dùng '#' cho hằng số
-            else:
-                operand_display = operand_value
-        elif instruction_info['operands'] == 'Regs':
+        if decoded.operands == 'Data':
+            operand_display = f"#{decoded.operand}" # Dùng '#' cho hằng số
+        elif decoded.operands == 'Addr':
+            operand_display = decoded.operand
+        elif decoded.operands == 'Regs':
             operand_display = "RegA, RegB"
-            
-        print(f"Decode: Opcode: {instruction_info['name']} (Operand: {operand_display})")
-
-        self.last_decoded_instruction = {
-            'name': instruction_info['name'],
-            'operands': instruction_info['operands'],
-            'opcode_str': opcode_str,
-            'operand_val': operand_value
-        }
-        return self.last_decoded_instruction
-            
+
+        print(f"Decode: Opcode: {decoded.name} (Operand: {operand_display})")
+        return decoded
+
     def execute_instruction(self):
         """
-        Pha Execute: Thực thi lệnh đã giải mã, sử dụng last_decoded_instruction.
+        Pha Execute: Thực thi lệnh đã giải mã qua bảng handler, sau đó in diễn giải.
         """
-        if not self.last_decoded_instruction:
+        decoded = self.last_decoded_instruction
+        if not decoded:
             print("Execute: No instruction to execute.")
             return
 
-        decoded_instruction = self.last_decoded_instruction
-        op_name = decoded_instruction['name']
-        operand_val = decoded_instruction['operand_val']
+        op_name = decoded.name
+        operand_val = decoded.operand
+        val_a_before = self.reg_a
+        val_b_before = self.reg_b
 
         print(f"Execute: {op_name}")
 
-        # Sửa: Trước khi thực hiện lệnh, reset cờ Overflow vì nó chỉ liên quan đến ALU
-        self.flags['O'] = False
-
-        if op_name == 'LOAD_A':
-            data_from_ram = self.read_ram(operand_val)
-            self.registers['A'] = int(data_from_ram, 2)
-            print(f"   Reg A = RAM[{operand_val}] = {self.registers['A']}")
-            self._update_flags_ZN(self.registers['A']) # Sửa: cập nhật cờ sau lệnh LOAD/STORE
-        elif op_name == 'LOAD_B':
-            data_from_ram = self.read_ram(operand_val)
-            self.registers['B'] = int(data_from_ram, 2)
-            print(f"   Reg B = RAM[{operand_val}] = {self.registers['B']}")
-            # Sửa: Không cập nhật cờ sau lệnh LOAD/STORE (theo nguyên tắc chung, LOAD/STORE không thay đổi cờ)
-            # Nếu bạn muốn cập nhật cờ cho LOAD/STORE, hãy gọi _update_flags_ZN ở đây
-            # self._update_flags_ZN(self.registers['B']) 
-        elif op_name == 'STORE_A':
-            data_to_store = f"{self.registers['A']:08b}"
-            self.write_ram(operand_val, data_to_store)
-            print(f"   RAM[{operand_val}] = Reg A ({self.registers['A']})")
-        elif op_name == 'STORE_B':
-            data_to_store = f"{self.registers['B']:08b}"
-            self.write_ram(operand_val, data_to_store)
-            print(f"   RAM[{operand_val}] = Reg B ({self.registers['B']})")
-        elif op_name == 'ADD':
-            val_a_before = self.registers['A']
-            val_b_before = self.registers['B']
-
-            result = val_a_before + val_b_before
-            
-            signed_a = self._to_signed_8bit(val_a_before)
-            signed_b = self._to_signed_8bit(val_b_before)
-            
-            # Kiểm tra overflow cho phép cộng có dấu
-            if (signed_a > 0 and signed_b > 0 and self._to_signed_8bit(result) < 0) or \
-               (signed_a < 0 and signed_b < 0 and self._to_signed_8bit(result) > 0):
-                self.flags['O'] = True
-            else:
-                self.flags['O'] = False
-
-            self.registers['A'] = result & 0xFF # Cập nhật thanh ghi A với kết quả 8-bit
-            
-            print(f"   Reg A = {val_a_before} + {val_b_before} = {self.registers['A']}")
-            self._update_flags_ZN(self.registers['A'])
-            print(f"   Flags updated: O={self.flags['O']}")
-
-        elif op_name == 'SUB':
-            val_a_before = self.registers['A']
-            val_b_before = self.registers['B']
-
-            result = val_a_before - val_b_before
-            
-            signed_a = self._to_signed_8bit(val_a_before)
-            signed_b = self._to_signed_8bit(val_b_before)
-
-            # Kiểm tra overflow cho phép trừ có dấu
-            if (signed_a > 0 and signed_b < 0 and self._to_signed_8bit(result) < 0) or \
-               (signed_a < 0 and signed_b > 0 and self._to_signed_8bit(result) > 0):
-                self.flags['O'] = True
-            else:
-                self.flags['O'] = False
-
-            self.registers['A'] = result & 0xFF # Cập nhật thanh ghi A với kết quả 8-bit
-            
-            print(f"   Reg A = {val_a_before} - {val_b_before} = {self.registers['A']}")
-            self._update_flags_ZN(self.registers['A'])
-            print(f"   Flags updated: O={self.flags['O']}")
-        
-        # --- Lệnh ADDI mới ---
-        elif op_name == 'ADDI':
-            val_a_before = self.registers['A']
-            immediate_value = operand_val # operand_val là giá trị hằng số 4-bit
-
-            result = val_a_before + immediate_value
-            
-            # Kiểm tra cờ Overflow
-            signed_a = self._to_signed_8bit(val_a_before)
-            # Coi immediate_value là số dương có dấu 8-bit (vì nó từ 0-15)
-            signed_immediate = immediate_value 
-
-            if signed_a > 0 and signed_immediate > 0 and self._to_signed_8bit(result) < 0:
-                self.flags['O'] = True
-            # Không cần trường hợp hai số âm kết quả dương vì immediate_value luôn dương
-            else:
-                self.flags['O'] = False
-
-            self.registers['A'] = result & 0xFF
-            
-            print(f"   Reg A = {val_a_before} + #{immediate_value} = {self.registers['A']}")
-            self._update_flags_ZN(self.registers['A'])
-            print(f"   Flags updated: O={self.flags['O']}")
-        # --- Kết thúc lệnh ADDI mới ---
-
-        elif op_name == 'JUMP':
-            self.registers['IAR'] = operand_val
-            print(f"   JUMP to address {operand_val}")
-            # Đánh dấu là đã nhảy, để không tăng IAR sau khi thực thi
-            self.jump_occurred = True 
-
-        elif op_name == 'JUMP_NEG':
-            if self.flags['N']:
-                self.registers['IAR'] = operand_val
-                print(f"   N flag set, JUMP to address {operand_val}")
-                self.jump_occurred = True
-            else:
-                print("   N flag not set, JUMP_NEG skipped.")
-
-        elif op_name == 'JUMP_ZERO':
-            if self.flags['Z']:
-                self.registers['IAR'] = operand_val
-                print(f"   Z flag set, JUMP to address {operand_val}")
-                self.jump_occurred = True
-            else:
-                print("   Z flag not set, JUMP_ZERO skipped.")
-
-        elif op_name == 'HALT':
-            self.is_halted = True
-            print("CPU Halted.")
-
-        elif op_name == 'UNKNOWN':
-            print("   Error: Unknown command. Stopping execution.")
-            self.is_halted = True
-            
+        # Trước khi thực hiện lệnh, reset cờ Overflow vì nó chỉ liên quan đến ALU
+        self.flag_bits &= ~FLAG_O
+        jumped = self._handlers[decoded.opcode](self, operand_val)
+        # Đánh dấu là đã nhảy, để không tăng IAR sau khi thực thi
+        self.jump_occurred = jumped and not self.is_halted
+
+        trace = _EXECUTE_TRACE.get(op_name)
+        if trace:
+            trace(self, operand_val, val_a_before, val_b_before, jumped)
+
     def increment_iar(self):
         """Tăng giá trị của thanh ghi IAR lên 1, trừ khi một lệnh nhảy đã xảy ra."""
-        if not hasattr(self, 'jump_occurred') or not self.jump_occurred:
-            self.registers['IAR'] = (self.registers['IAR'] + 1) % 16 # Đảm bảo IAR không vượt quá 15
-            print(f"IAR incremented to {self.registers['IAR']}")
+        if not self.jump_occurred:
+            self.iar = (self.iar + 1) % RAM_SIZE # Đảm bảo IAR không vượt quá 15
+            print(f"IAR incremented to {self.iar}")
         else:
             print(f"JUMP_DONE") # Để nhất quán với output trước đó
         self.jump_occurred = False # Reset cờ jump cho chu kỳ tiếp theo
 
+    def state_key(self):
+        """
+        Khóa bytes của toàn bộ trạng thái quyết định tương lai của máy:
+        16 byte RAM + A, B, IAR, cờ. Hai thời điểm có cùng khóa nghĩa là chương trình lặp vô hạn.
+        """
+        return bytes(self.ram) + bytes((self.reg_a, self.reg_b, self.iar, self.flag_bits))
+
+    def snapshot(self):
+        """
+        Chụp toàn bộ trạng thái máy thành một blob bytes bất biến 22 byte
+        (bố cục của state_key() + IR + byte trạng thái halted/jump).
+        Chi phí thấp nên có thể chụp sau mỗi chu kỳ; nhiều bên có thể dùng chung một snapshot.
+        Ở chế độ Harvard phần RAM là Data RAM; bộ nhớ chương trình bất biến không nằm trong snapshot.
+        """
+        status = (_SNAP_HALTED if self.is_halted else 0) | (_SNAP_JUMPED if self.jump_occurred else 0)
+        return bytes(self.ram) + bytes((self.reg_a, self.reg_b, self.iar, self.flag_bits, self.ir, status))
+
+    def restore(self, snap):
+        """Khôi phục trạng thái từ snapshot(). Chỉ các ô RAM khác snapshot mới bị hủy cache giải mã."""
+        if len(snap) != SNAPSHOT_SIZE:
+            raise ValueError(f"Snapshot must be {SNAPSHOT_SIZE} bytes. Received: {len(snap)}")
+        ram = self.ram
+        if self.program is not None:
+            ram[:] = snap[:RAM_SIZE]  # Data RAM không chứa lệnh: không có cache nào phải hủy
+        elif ram != snap[:RAM_SIZE]:
+            decode_cache = self._decode_cache
+            for address in range(RAM_SIZE):
+                if ram[address] != snap[address]:
+                    ram[address] = snap[address]
+                    decode_cache[address] = None
+        self.reg_a, self.reg_b, self.iar, self.flag_bits, self.ir, status = snap[RAM_SIZE:]
+        self.is_halted = bool(status & _SNAP_HALTED)
+        self.jump_occurred = bool(status & _SNAP_JUMPED)
+        self.last_decoded_instruction = None
+
+    def changes_since(self, snap):
+        """ChangeSet giữa snapshot snap (None = mọi thứ đều đổi) và trạng thái hiện tại."""
+        return diff_snapshots(snap, self.snapshot())
+
+    @classmethod
+    def from_snapshot(cls, snap, program=None):
+        """
+        Tạo CPU mới từ snapshot (rẽ nhánh một lần chạy). Snapshot chỉ chứa Data RAM:
+        với CPU chế độ Harvard phải truyền kèm program (bộ nhớ chương trình bất biến).
+        """
+        cpu = cls()
+        if program is not None:
+            cpu.load_program(program)
+        cpu.restore(snap)
+        return cpu
+
+    def run(self, max_cycles=100000, observer=None, detect_loops=False):
+        """
+        Chạy headless: lặp Fetch/Decode/Execute liên tục, không in gì ra màn hình.
+        Lệnh được lấy từ cache giải mã theo ô RAM và thực thi qua bảng handler.
+        observer (tùy chọn) được gọi sau mỗi lệnh: observer(cycle, address, instruction, cpu).
+        detect_loops=True: dừng ngay khi trạng thái lặp lại (status 'loop', kèm 'loop_period').
+        Trả về dict gồm số chu kỳ, trạng thái dừng và tốc độ (cycles/sec).
+        """
+        ram = self.ram
+        # Chế độ Harvard: cache đã được giải mã trước đầy đủ từ bộ nhớ chương trình
+        code = self.program if self.program is not None else ram
+        decode_cache = self._decode_cache
+        handlers = self._handlers
+        decode_table = _DECODE_TABLE
+        not_o = ~FLAG_O
+        cycles = 0
+        status = 'halted' if self.is_halted else 'max_cycles'
+        loop_detector = LoopDetector(self.state_key()) if detect_loops else None
+        loop_period = 0
+        start = time.perf_counter()
+
+        while cycles < max_cycles and not self.is_halted:
+            address = self.iar
+            decoded = decode_cache[address]
+            if decoded is None:
+                decoded = decode_cache[address] = decode_table[code[address]]
+            self.ir = decoded.instruction
+            self.flag_bits &= not_o
+            cycles += 1
+
+            if not handlers[decoded.opcode](self, decoded.operand):
+                self.iar = (address + 1) % RAM_SIZE
+
+            if observer is not None:
+                observer(cycles, address, decoded.instruction, self)
+
+            if self.is_halted:
+                status = 'halted' if decoded.name == 'HALT' else 'unknown_opcode'
+            elif loop_detector is not None:
+                loop_period = loop_detector.update(self.state_key())
+                if loop_period:
+                    status = 'loop'
+                    break
+
+        elapsed = time.perf_counter() - start
+        self.jump_occurred = False
+        self.last_decoded_instruction = None
+        result = {
+            'cycles': cycles,
+            'status': status,
+            'halted': self.is_halted,
+            'elapsed': elapsed,
+            'cycles_per_sec': cycles / elapsed if elapsed > 0 else 0.0,
+        }
+        if loop_period:
+            result['loop_period'] = loop_period
+        return result
 
     def calculate_alu_output(self):
         """Tính toán giá trị đầu ra của ALU mà không thực thi lệnh."""
-        if self.last_decoded_instruction:
-            op_name = self.last_decoded_instruction.get('name')
-            operand_val = self.last_decoded_instruction.get('operand_val') # Lấy operand_val
-            if op_name == 'ADD':
-                return (self.registers['A'] + self.registers['B']) & 0xFF
-            elif op_name == 'SUB':
-                return (self.registers['A'] - self.registers['B']) & 0xFF
-            elif op_name == 'ADDI': # Thêm cho ADDI
-                return (self.registers['A'] + operand_val) & 0xFF
+        decoded = self.last_decoded_instruction
+        if decoded:
+            value = alu_output(decoded.name, self.reg_a, self.reg_b, decoded.operand)
+            if value is not None:
+                return value
         return 0
-    
+
     def reset(self):
         """Đặt lại trạng thái CPU về ban đầu (trừ RAM)."""
-        self.registers['A'] = 0
-        self.registers['B'] = 0
-        self.registers['IR_Opcode'] = '0000'
-        self.registers['IR_AddrData'] = '0000'
-        self.registers['IAR'] = 0
-        self.flags['O'] = False
-        self.flags['Z'] = False
-        self.flags['N'] = False
+        self.reg_a = 0
+        self.reg_b = 0
+        self.ir = 0
+        self.iar = 0
+        self.flag_bits = 0
         self.is_halted = False
         self.last_decoded_instruction = None
         self.jump_occurred = False # Đặt lại cờ jump
         print("CPU has been reset (registers and flags only).")
+
+
+# --- Diễn giải pha Execute cho chế độ từng bước (chỉ dùng bởi execute_instruction) ---
+
+def _trace_load_a(cpu, operand, a_before, b_before, jumped):
+    print(f"   Reg A = RAM[{operand}] = {cpu.reg_a}")
+    cpu._trace_flags()
+
+
+def _trace_load_b(cpu, operand, a_before, b_before, jumped):
+    print(f"   Reg B = RAM[{operand}] = {cpu.reg_b}")
+
+
+def _trace_store_a(cpu, operand, a_before, b_before, jumped):
+    print(f"   RAM[{operand}] = Reg A ({cpu.reg_a})")
+
+
+def _trace_store_b(cpu, operand, a_before, b_before, jumped):
+    print(f"   RAM[{operand}] = Reg B ({cpu.reg_b})")
+
+
+def _trace_alu(symbol):
+    def trace(cpu, operand, a_before, b_before, jumped):
+        rhs = f"#{operand}" if symbol == '+#' else b_before
+        print(f"   Reg A = {a_before} {symbol[0]} {rhs} = {cpu.reg_a}")
+        cpu._trace_flags()
+        print(f"   Flags updated: O={cpu.flag_o}")
+    return trace
+
+
+def _trace_jump(cpu, operand, a_before, b_before, jumped):
+    print(f"   JUMP to address {operand}")
+
+
+def _trace_conditional_jump(flag_name, op_name):
+    def trace(cpu, operand, a_before, b_before, jumped):
+        if jumped:
+            print(f"   {flag_name} flag set, JUMP to address {operand}")
+        else:
+            print(f"   {flag_name} flag not set, {op_name} skipped.")
+    return trace
+
+
+def _trace_halt(cpu, operand, a_before, b_before, jumped):
+    print("CPU Halted.")
+
+
+def _trace_unknown(cpu, operand, a_before, b_before, jumped):
+    print("   Error: Unknown command. Stopping execution.")
+
+
+_EXECUTE_TRACE = {
+    'LOAD_A': _trace_load_a,
+    'LOAD_B': _trace_load_b,
+    'STORE_A': _trace_store_a,
+    'STORE_B': _trace_store_b,
+    'ADD': _trace_alu('+'),
+    'SUB': _trace_alu('-'),
+    'ADDI': _trace_alu('+#'),
+    'JUMP': _trace_jump,
+    'JUMP_NEG': _trace_conditional_jump('N', 'JUMP_NEG'),
+    'JUMP_ZERO': _trace_conditional_jump('Z', 'JUMP_ZERO'),
+    'HALT': _trace_halt,
+    'UNKNOWN': _trace_unknown,
+}
@@ -0,0 +1,172 @@
+# src/cpu_worker.py
+
+import time
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal, pyqtSlot
+
+from .cpu_core import CPU, LoopDetector
+
+# Số chu kỳ mỗi lần gọi CPU.run, độ dài một lát thời gian và tần số công bố trạng thái
+CHUNK_CYCLES = 2000
+# Bộ phát hiện vòng lặp chỉ nhận trạng thái ở mỗi mốc LOOP_CHECK_CYCLES chu kỳ (thay vì sau mọi lệnh)
+LOOP_CHECK_CYCLES = 1024
+SLICE_SECONDS = 0.012
+PUBLISH_HZ = 30
+
+
+class CPUWorker(QObject):
+    """
+    Đối tượng chạy CPU trên một QThread riêng (dùng moveToThread).
+
+    Khi chạy, worker sở hữu một đối tượng CPU của riêng nó và chỉ công bố ra ngoài
+    các snapshot bất biến (bytes) qua tín hiệu queued, nên luồng giao diện không bao giờ
+    đọc trạng thái đang bị ghi. Việc thực thi được chia thành các lát thời gian trên
+    vòng lặp sự kiện của luồng worker, vì vậy lệnh pause/step/stop được xử lý
+    chậm nhất sau một lát (SLICE_SECONDS).
+    """
+
+    # snapshot, thông tin {'run_id', 'cycles', 'cycles_per_sec'}
+    state_published = pyqtSignal(bytes, dict)
+    # snapshot cuối, kết quả {'run_id', 'status', 'cycles', ['loop_period']}
+    stopped = pyqtSignal(bytes, dict)
+
+    def __init__(self, chunk_cycles=CHUNK_CYCLES, slice_seconds=SLICE_SECONDS, publish_hz=PUBLISH_HZ):
+        super().__init__()
+        self.chunk_cycles = chunk_cycles
+        self.slice_seconds = slice_seconds
+        self.publish_interval = 1.0 / publish_hz
+        self.cpu = None
+        # Các observer (journal, bộ ghi trace...) chỉ được worker dùng trong lúc chạy
+        self.observers = ()
+        self.journal = None  # ExecutionJournal chỉ nhận keyframe (advance) trong lúc chạy
+        self.run_id = 0  # Do bên gọi đặt, dùng để bỏ qua tín hiệu còn tồn của lần chạy trước
+        self.cycles = 0
+        self.loop_detector = None
+        self._last_publish_time = 0.0
+        self._last_publish_cycles = 0
+        # Timer là con của worker nên chuyển sang luồng worker cùng với nó
+        self._timer = QTimer(self)
+        self._timer.setInterval(0)
+        self._timer.timeout.connect(self._run_slice)
+
+    @pyqtSlot(bytes, object, int, object, object)
+    def start(self, snapshot, observers=(), run_id=0, program=None, journal=None):
+        """
+        Bắt đầu chạy từ snapshot. observers: các hàm observer của CPU.run() (ví dụ trace_recorder.observe),
+        được gọi sau mỗi lệnh; luồng giao diện không được chạm vào đối tượng của chúng khi worker đang chạy.
+        program: bộ nhớ chương trình (bytes) khi CPU ở chế độ Harvard, None nếu RAM dùng chung.
+        journal: ExecutionJournal (tùy chọn), chỉ được ghi keyframe mỗi K lệnh thay vì delta từng lệnh;
+        cùng quy tắc như observers.
+        """
+        self.cpu = CPU.from_snapshot(snapshot, program)
+        self.observers = tuple(observers)
+        self.journal = journal
+        self.run_id = run_id
+        self.cycles = 0
+        # Một bộ phát hiện cho cả lần chạy: vòng lặp dài hơn một lượt chạy vẫn được phát hiện
+        self.loop_detector = LoopDetector(self.cpu.state_key())
+        self._last_publish_time = time.perf_counter()
+        self._last_publish_cycles = 0
+        self._timer.start()
+
+    @pyqtSlot()
+    def pause(self):
+        if self.cpu is None:
+            return
+        self._timer.stop()
+        self._publish()
+
+    @pyqtSlot()
+    def resume(self):
+        if self.cpu is not None and not self.cpu.is_halted:
+            # Không tính thời gian tạm dừng vào tốc độ
+            self._last_publish_time = time.perf_counter()
+            self._last_publish_cycles = self.cycles
+            self._timer.start()
+
+    @pyqtSlot()
+    def step(self):
+        """Thực thi đúng một lệnh khi đang tạm dừng."""
+        if self.cpu is None or self._timer.isActive():
+            return
+        if self._execute(1):
+            self._publish()
+
+    @pyqtSlot()
+    def stop(self):
+        """Dừng hẳn và trả trạng thái cuối về cho giao diện."""
+        if self.cpu is None:
+            return
+        self._finish({'status': 'stopped', 'cycles': self.cycles})
+
+    def _execute(self, max_cycles):
+        """
+        Chạy tối đa max_cycles lệnh. Trả về False nếu CPU đã dừng (HALT, opcode lạ, vòng lặp).
+
+        Lượt chạy được cắt để kết thúc đúng tại mốc LOOP_CHECK_CYCLES; tại mỗi mốc trạng thái được
+        đưa vào loop_detector (Brent trên dãy trạng thái lấy mẫu với bước cố định). Dãy lấy mẫu lặp lại
+        khi và chỉ khi máy đã vào vòng lặp, nên việc kiểm tra không tốn chi phí cho từng lệnh.
+        """
+        max_cycles = min(max_cycles, LOOP_CHECK_CYCLES - self.cycles % LOOP_CHECK_CYCLES)
+        journal = self.journal
+        if journal is not None:
+            max_cycles = min(max_cycles, journal.cycles_to_keyframe())
+        observer = None
+        if len(self.observers) == 1:
+            observer = self.observers[0]
+        elif self.observers:
+            observers = self.observers
+            def observer(cycle, address, instruction, cpu):
+                for notify in observers:
+                    notify(cycle, address, instruction, cpu)
+        result = self.cpu.run(max_cycles, observer=observer)
+        self.cycles += result['cycles']
+        if journal is not None:
+            journal.advance(self.cpu, result['cycles'])
+        if result['status'] == 'max_cycles':
+            if self.cycles % LOOP_CHECK_CYCLES:
+                return True
+            samples = self.loop_detector.update(self.cpu.state_key())
+            if not samples:
+                return True
+            result = {'status': 'loop', 'loop_period': self._loop_period(samples)}
+        result['cycles'] = self.cycles
+        self._finish(result)
+        return False
+
+    def _loop_period(self, samples):
+        """
+        Chu kỳ lặp chính xác (số lệnh) khi dãy lấy mẫu lặp lại sau samples mốc: chu kỳ thật chia hết
+        samples * LOOP_CHECK_CYCLES, nên chạy Brent từng lệnh trên một bản sao là đủ và không đổi trạng thái.
+        """
+        probe = CPU.from_snapshot(self.cpu.snapshot(), self.cpu.program)
+        result = probe.run(4 * samples * LOOP_CHECK_CYCLES, detect_loops=True)
+        return result.get('loop_period', samples * LOOP_CHECK_CYCLES)
+
+    @pyqtSlot()
+    def _run_slice(self):
+        deadline = time.perf_counter() + self.slice_seconds
+        while time.perf_counter() < deadline:
+            if not self._execute(self.chunk_cycles):
+                return
+        if time.perf_counter() - self._last_publish_time >= self.publish_interval:
+            self._publish()
+
+    def _publish(self):
+        now = time.perf_counter()
+        elapsed = now - self._last_publish_time
+        speed = (self.cycles - self._last_publish_cycles) / elapsed if elapsed > 0 else 0.0
+        self._last_publish_time = now
+        self._last_publish_cycles = self.cycles
+        self.state_published.emit(self.cpu.snapshot(), {'run_id': self.run_id, 'cycles': self.cycles, 'cycles_per_sec': speed})
+
+    def _finish(self, result):
+        self._timer.stop()
+        self._publish()
+        snapshot = self.cpu.snapshot()
+        result['run_id'] = self.run_id
+        self.cpu = None
+        self.observers = ()
+        self.journal = None
+        self.loop_detector = None
+        self.stopped.emit(snapshot, result)
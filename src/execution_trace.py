@@ -0,0 +1,148 @@
+"""
+Ghi/đọc trace thực thi dạng nhị phân theo cột.
+
+Mỗi lệnh đã thực thi là một bản ghi độ dài cố định: cycle, IAR, opcode, operand, A, B,
+cờ (sau lệnh) và ô RAM bị ghi. Mỗi cột được lưu thành một file .npy riêng trong một thư mục:
+bộ ghi không cần NumPy (tự viết header .npy), còn bộ đọc dùng np.load(mmap_mode='r')
+nên mở trace hàng triệu chu kỳ mà không sao chép dữ liệu.
+"""
+import os
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # NumPy chỉ cần cho TraceReader
+    np = None
+
+from .alu import FLAG_O, FLAG_Z, FLAG_N
+from .cpu_core import _DECODE_TABLE
+
+# (tên cột, mã kiểu của array, dtype .npy)
+COLUMNS = (
+    ('cycle', 'Q', '<u8'),
+    ('iar', 'B', '|u1'),
+    ('opcode', 'B', '|u1'),
+    ('operand', 'B', '|u1'),
+    ('a', 'B', '|u1'),
+    ('b', 'B', '|u1'),
+    ('flags', 'B', '|u1'),
+    ('ram_addr', 'B', '|u1'),
+    ('ram_value', 'B', '|u1'),
+)
+NO_RAM_WRITE = 0xFF  # Giá trị ram_addr khi lệnh không ghi RAM
+_FLAG_BITS = {'O': FLAG_O, 'Z': FLAG_Z, 'N': FLAG_N}
+_STORE_OPS = ('STORE_A', 'STORE_B')
+_NPY_HEADER_SIZE = 128  # Header .npy được giữ chỗ trước, ghi lại khi đóng trace
+
+
+def _npy_header(dtype, length):
+    """Header định dạng .npy v1.0 có độ dài cố định _NPY_HEADER_SIZE byte."""
+    header = f"{{'descr': '{dtype}', 'fortran_order': False, 'shape': ({length},), }}"
+    header = header.ljust(_NPY_HEADER_SIZE - 10 - 1) + "\n"
+    return b"\x93NUMPY\x01\x00" + len(header).to_bytes(2, 'little') + header.encode('latin1')
+
+
+class TraceRecorder:
+    """
+    Ghi trace vào thư mục directory. Bản ghi được gom vào các chunk cấp phát trước
+    (chunk_size bản ghi mỗi cột) và ghi nối tiếp ra file khi chunk đầy.
+    Dùng observe() làm observer của CPU.run(), hoặc gọi record(cpu, address) sau mỗi lệnh.
+    """
+
+    def __init__(self, directory, chunk_size=65536):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.cycle = 0  # Số bản ghi đã nhận (cũng là cycle của bản ghi kế tiếp)
+        self._fill = 0
+        self._chunks = [array(code, bytes(array(code).itemsize * chunk_size)) for _, code, _ in COLUMNS]
+        self._files = []
+        for name, _, dtype in COLUMNS:
+            handle = open(os.path.join(directory, f"{name}.npy"), 'wb')
+            handle.write(_npy_header(dtype, 0))
+            self._files.append(handle)
+
+    def record(self, cpu, address):
+        """Ghi lệnh vừa thực thi xong: address là địa chỉ của lệnh, cpu mang trạng thái sau lệnh."""
+        decoded = _DECODE_TABLE[cpu.ir]
+        if decoded.name in _STORE_OPS:
+            ram_addr, ram_value = decoded.operand, cpu.ram[decoded.operand]
+        else:
+            ram_addr, ram_value = NO_RAM_WRITE, 0
+        index = self._fill
+        cycle, iar, opcode, operand, a, b, flags, addr_column, value_column = self._chunks
+        cycle[index] = self.cycle
+        iar[index] = address
+        opcode[index] = decoded.opcode
+        operand[index] = decoded.instruction & 0x0F
+        a[index] = cpu.reg_a
+        b[index] = cpu.reg_b
+        flags[index] = cpu.flag_bits
+        addr_column[index] = ram_addr
+        value_column[index] = ram_value
+        self.cycle += 1
+        self._fill = index + 1
+        if self._fill == self.chunk_size:
+            self._write_chunks()
+
+    def observe(self, cycle, address, instruction, cpu):
+        """Observer cho CPU.run()."""
+        self.record(cpu, address)
+
+    def _write_chunks(self):
+        fill = self._fill
+        for chunk, handle in zip(self._chunks, self._files):
+            handle.write(memoryview(chunk)[:fill].cast('B'))
+        self._fill = 0
+
+    def close(self):
+        """Ghi phần còn lại và cập nhật header .npy với số bản ghi cuối cùng."""
+        if not self._files:
+            return
+        self._write_chunks()
+        for (_, _, dtype), handle in zip(COLUMNS, self._files):
+            handle.seek(0)
+            handle.write(_npy_header(dtype, self.cycle))
+            handle.close()
+        self._files = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class TraceReader:
+    """Đọc trace theo cột bằng memory map (không sao chép) và trả lời truy vấn bằng bộ lọc vector."""
+
+    def __init__(self, directory):
+        if np is None:
+            raise ImportError("TraceReader requires NumPy (pip install numpy).")
+        self.directory = directory
+        self.columns = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r')
+                        for name, _, _ in COLUMNS}
+
+    def __len__(self):
+        return len(self.columns['cycle'])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def flag_flips(self, flag):
+        """Các cycle mà cờ flag ('O', 'Z', 'N') đổi giá trị so với lệnh trước đó."""
+        bits = (self.columns['flags'] & _FLAG_BITS[flag]) != 0
+        return self.columns['cycle'][1:][bits[1:] != bits[:-1]]
+
+    def cycles_where(self, **conditions):
+        """Các cycle thỏa mọi điều kiện cột == giá trị, ví dụ cycles_where(opcode=3, operand=13)."""
+        mask = np.ones(len(self), dtype=bool)
+        for name, value in conditions.items():
+            mask &= self.columns[name] == value
+        return self.columns['cycle'][mask]
+
+    def ram_writes(self, address=None):
+        """Các cycle có ghi RAM (chỉ tại address nếu được chỉ định)."""
+        if address is None:
+            return self.columns['cycle'][self.columns['ram_addr'] != NO_RAM_WRITE]
+        return self.cycles_where(ram_addr=address)
@@ -1,8 +1,24 @@
 # src/gui_elements.py
 
-from PyQt6.QtWidgets import QGraphicsEllipseItem
+import heapq
+import itertools
+import math
+import time
+from bisect import bisect_right
+from collections import deque
+
+from PyQt6.QtWidgets import QGraphicsEllipseItem, QGraphicsRectItem, QGraphicsView, QGraphicsItem
 from PyQt6.QtGui import QColor, QBrush, QPen
-from PyQt6.QtCore import QPropertyAnimation, QPointF, QEasingCurve, Qt, QObject, QSequentialAnimationGroup
+from PyQt6.QtCore import (
+    QPointF, QRectF, Qt, QObject, QTimer, pyqtSignal, QAbstractTableModel, QAbstractListModel, QModelIndex, QEvent
+)
+
+from .memory import PAGE_SIZE
+
+# Chu kỳ của đồng hồ khung hình dùng chung cho mọi chấm tín hiệu (~60 khung hình/giây)
+FRAME_INTERVAL_MS = 16
+# Số khung hình gần nhất được giữ lại để tính thời gian vẽ trung bình/lớn nhất
+FRAME_STATS_WINDOW = 120
 
 class AnimatableEllipseItem(QGraphicsEllipseItem):
     """
@@ -13,92 +29,459 @@ class AnimatableEllipseItem(QGraphicsEllipseItem):
         super().__init__(x, y, w, h)
 
 
+class HighlightOverlay(QGraphicsRectItem):
+    """
+    Khung highlight trên sơ đồ. Bút/chổi chỉ được đặt lại khi đổi màu; bật/tắt highlight
+    chỉ là đổi opacity. Item dùng DeviceCoordinateCache nên được vẽ một lần cho mỗi mức zoom
+    rồi Qt chỉ việc blit pixmap đã cache.
+    """
+    def __init__(self, rect, parent=None):
+        super().__init__(rect, parent)
+        self._color = None
+        self.setCacheMode(QGraphicsItem.CacheMode.DeviceCoordinateCache)
+        self.setOpacity(0.0)
+
+    def show_highlight(self, color=Qt.GlobalColor.yellow):
+        color = QColor(color)
+        if color != self._color:
+            self._color = color
+            fill = QColor(color)
+            fill.setAlpha(50)
+            self.setPen(QPen(color, 2))
+            self.setBrush(QBrush(fill))
+        self.setOpacity(1.0)
+
+    def hide_highlight(self):
+        self.setOpacity(0.0)
+
+
+class DiagramView(QGraphicsView):
+    """
+    QGraphicsView cho sơ đồ CPU: ảnh nền được vẽ trong drawBackground và cache theo mức zoom
+    (CacheBackground) thay vì là một item của scene, nên mỗi lần vẽ lại chỉ phải vẽ các
+    item thay đổi phía trên. Thời gian vẽ từng khung hình được đo để báo cáo ở chế độ Run/Turbo.
+    """
+    def __init__(self, scene, parent=None):
+        super().__init__(scene, parent)
+        self.background_pixmap = None
+        self._frame_times = deque(maxlen=FRAME_STATS_WINDOW)
+        self._frame_count = 0
+        self.setCacheMode(QGraphicsView.CacheModeFlag.CacheBackground)
+
+    def set_background(self, pixmap):
+        """Đặt ảnh nền sơ đồ; scene rect khớp với kích thước ảnh."""
+        self.background_pixmap = pixmap
+        self.scene().setSceneRect(QRectF(pixmap.rect()))
+        self.resetCachedContent()
+
+    def drawBackground(self, painter, rect):
+        super().drawBackground(painter, rect)
+        if self.background_pixmap is not None:
+            painter.drawPixmap(QPointF(0, 0), self.background_pixmap)
+
+    def paintEvent(self, event):
+        start = time.perf_counter()
+        super().paintEvent(event)
+        self._frame_times.append(time.perf_counter() - start)
+        self._frame_count += 1
+
+    def frame_stats(self):
+        """Thời gian vẽ (ms) trung bình và lớn nhất của các khung hình gần đây, cùng tổng số khung hình."""
+        times = self._frame_times
+        if not times:
+            return {'frames': self._frame_count, 'avg_ms': 0.0, 'max_ms': 0.0}
+        return {
+            'frames': self._frame_count,
+            'avg_ms': sum(times) / len(times) * 1000.0,
+            'max_ms': max(times) * 1000.0,
+        }
+
+    def reset_frame_stats(self):
+        self._frame_times.clear()
+        self._frame_count = 0
+
+
+class RamTableModel(QAbstractTableModel):
+    """
+    Model cho bảng RAM (cột địa chỉ + cột giá trị 8 bit), chỉ đọc.
+    update_cells() chỉ phát dataChanged cho các ô thực sự đổi thay vì dựng lại cả bảng.
+    """
+    HEADERS = ("Addr", "Data (8-bit)")
+
+    def __init__(self, size, parent=None):
+        super().__init__(parent)
+        self._values = bytearray(size)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._values)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole or not index.isValid():
+            return None
+        if index.column() == 0:
+            return str(index.row())
+        return f"{self._values[index.row()]:08b}"
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def update_cells(self, ram, addresses):
+        """
+        Chép giá trị của các ô addresses từ ram rồi phát một dataChanged duy nhất cho
+        khoảng ô thực sự đổi (nạp cả ảnh bộ nhớ chỉ tốn một lần vẽ lại).
+        """
+        values = self._values
+        changed = [address for address in addresses if values[address] != ram[address]]
+        if not changed:
+            return
+        for address in changed:
+            values[address] = ram[address]
+        self.dataChanged.emit(self.index(min(changed), 1), self.index(max(changed), 1), [Qt.ItemDataRole.DisplayRole])
+
+
+class FileDropFilter(QObject):
+    """
+    Bộ lọc sự kiện cho phép thả file (kéo từ trình quản lý file) lên một widget bất kỳ:
+    install(widget) bật nhận thả, files_dropped phát danh sách đường dẫn cục bộ.
+    """
+    files_dropped = pyqtSignal(list)
+
+    def install(self, widget):
+        widget.setAcceptDrops(True)
+        widget.installEventFilter(self)
+
+    @staticmethod
+    def _local_paths(event):
+        mime = event.mimeData()
+        if not mime.hasUrls():
+            return []
+        return [url.toLocalFile() for url in mime.urls() if url.isLocalFile()]
+
+    def eventFilter(self, watched, event):
+        event_type = event.type()
+        if event_type in (QEvent.Type.DragEnter, QEvent.Type.DragMove):
+            if self._local_paths(event):
+                event.acceptProposedAction()
+                return True
+        elif event_type == QEvent.Type.Drop:
+            paths = self._local_paths(event)
+            if paths:
+                event.acceptProposedAction()
+                self.files_dropped.emit(paths)
+                return True
+        return super().eventFilter(watched, event)
+
+
+class PagedMemoryModel(QAbstractTableModel):
+    """
+    Model ảo hóa cho bộ nhớ PagedMemory (tới 65.536 ô): không giữ bản sao nào, data() đọc
+    thẳng từ bộ nhớ nên view chỉ hỏi các hàng đang hiển thị. refresh_pages() báo thay đổi
+    theo từng trang 256 byte.
+    """
+    HEADERS = ("Addr", "Hex", "Data (8-bit)")
+
+    def __init__(self, memory, parent=None):
+        super().__init__(parent)
+        self._memory = memory
+        self._address_digits = (memory.address_bits + 3) // 4
+
+    def set_memory(self, memory):
+        """Đổi sang bộ nhớ khác (ví dụ khi đổi độ rộng địa chỉ)."""
+        self.beginResetModel()
+        self._memory = memory
+        self._address_digits = (memory.address_bits + 3) // 4
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._memory)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole or not index.isValid():
+            return None
+        address = index.row()
+        if index.column() == 0:
+            return f"{address:0{self._address_digits}X}"
+        value = self._memory[address]
+        if index.column() == 1:
+            return f"{value:02X}"
+        return f"{value:08b}"
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def refresh_pages(self, pages, page_size=PAGE_SIZE):
+        """Báo cho view vẽ lại các trang đã bị ghi (chỉ các hàng đang hiển thị thực sự được vẽ)."""
+        last_row = len(self._memory) - 1
+        for page in sorted(pages):
+            first = page * page_size
+            self.dataChanged.emit(self.index(first, 1), self.index(min(first + page_size - 1, last_row), 2),
+                                  [Qt.ItemDataRole.DisplayRole])
+
+
+class LibraryListModel(QAbstractListModel):
+    """
+    Model danh sách cho ProgramLibrary (có thể hàng chục nghìn chương trình): chỉ giữ danh sách
+    chỉ số khớp bộ lọc, tên được đọc từ thư viện khi view hỏi các hàng đang hiển thị.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._library = None
+        self._rows = []
+
+    def set_library(self, library, text=""):
+        self.beginResetModel()
+        self._library = library
+        self._rows = library.search(text) if library is not None else []
+        self.endResetModel()
+
+    def set_filter(self, text):
+        """Lọc theo tên (chứa text) hoặc tiền tố mã băm."""
+        self.set_library(self._library, text)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        program = self._rows[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self._library.names[program]
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return self._library.digest(program)
+        return None
+
+    def program_index(self, row):
+        """Chỉ số trong thư viện của hàng row."""
+        return self._rows[row]
+
+
+class FrameScheduler(QObject):
+    """
+    Bộ lập lịch hiệu ứng giao diện dùng chung: một heap các hạn chót và một QTimer duy nhất
+    được hẹn tới hạn chót sớm nhất (thay cho nhiều QTimer.singleShot rời rạc).
+
+    Mỗi việc có một khóa: lập lịch lại cùng khóa sẽ thay thế việc cũ (gộp việc trùng lặp),
+    các việc đến hạn trong cùng một khung hình được chạy chung một lần timer kích hoạt,
+    và cancel_all() hủy sạch mọi việc còn chờ (ví dụ khi Reset).
+    """
+    def __init__(self, frame_interval_ms=FRAME_INTERVAL_MS, parent=None):
+        super().__init__(parent)
+        self.frame_seconds = frame_interval_ms / 1000.0
+        self._heap = []      # (hạn chót, số thứ tự, khóa); phần tử cũ bị bỏ qua khi lấy ra
+        self._pending = {}   # khóa -> (số thứ tự, callback)
+        self._counter = itertools.count()
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._timer.timeout.connect(self._run_due)
+
+    def schedule(self, key, delay_ms, callback):
+        """Chạy callback sau delay_ms; thay thế việc đang chờ có cùng khóa."""
+        sequence = next(self._counter)
+        self._pending[key] = (sequence, callback)
+        heapq.heappush(self._heap, (time.perf_counter() + delay_ms / 1000.0, sequence, key))
+        if len(self._heap) > 4 * len(self._pending) + 64:
+            self._compact()
+        self._arm()
+
+    def cancel(self, key):
+        self._pending.pop(key, None)
+
+    def cancel_all(self):
+        self._pending.clear()
+        self._heap.clear()
+        self._timer.stop()
+
+    def is_pending(self, key):
+        return key in self._pending
+
+    def _is_stale(self, entry):
+        pending = self._pending.get(entry[2])
+        return pending is None or pending[0] != entry[1]
+
+    def _compact(self):
+        self._heap = [entry for entry in self._heap if not self._is_stale(entry)]
+        heapq.heapify(self._heap)
+
+    def _arm(self):
+        """Hẹn timer tới hạn chót sớm nhất còn hiệu lực."""
+        heap = self._heap
+        while heap and self._is_stale(heap[0]):
+            heapq.heappop(heap)
+        if not heap:
+            self._timer.stop()
+            return
+        delay = max(0.0, heap[0][0] - time.perf_counter())
+        self._timer.start(math.ceil(delay * 1000))
+
+    def _run_due(self):
+        """
+        Chạy mọi việc đến hạn trong khung hình hiện tại rồi hẹn lại timer.
+        Mỗi việc được kiểm tra lại ngay trước khi chạy: nếu một callback trước đó trong cùng lượt
+        đã hủy (cancel/cancel_all) hoặc lập lịch lại khóa của nó thì việc đó bị bỏ qua.
+        """
+        horizon = time.perf_counter() + self.frame_seconds / 2
+        due = []
+        heap = self._heap
+        while heap and heap[0][0] <= horizon:
+            entry = heapq.heappop(heap)
+            if not self._is_stale(entry):
+                due.append((entry[2], entry[1]))
+        for key, sequence in due:
+            pending = self._pending.get(key)
+            if pending is None or pending[0] != sequence:
+                continue
+            del self._pending[key]
+            pending[1]()
+        self._arm()
+
+
+class SignalRoute:
+    """
+    Một đường tín hiệu được tính trước một lần: các điểm gấp khúc và bảng
+    độ dài cung tích lũy, để point_at(t) trả về điểm tại đúng t * chiều dài đường
+    (chấm chạy với tốc độ đều dù các đoạn dài ngắn khác nhau).
+    bus là nhãn bus mà đường tín hiệu thuộc về ('instruction', 'data' hoặc 'internal').
+    """
+    __slots__ = ('points', 'lengths', 'length', 'bus')
+
+    def __init__(self, points, bus=None):
+        if len(points) < 2:
+            raise ValueError("A signal route requires at least 2 points.")
+        self.points = tuple(QPointF(point) for point in points)
+        self.bus = bus
+        lengths = [0.0]
+        for previous, point in zip(self.points, self.points[1:]):
+            lengths.append(lengths[-1] + math.hypot(point.x() - previous.x(), point.y() - previous.y()))
+        self.lengths = lengths
+        self.length = lengths[-1]
+
+    def point_at(self, fraction):
+        """Điểm nằm ở vị trí fraction (0..1) tính theo độ dài cung."""
+        if fraction <= 0 or self.length == 0:
+            return self.points[0]
+        if fraction >= 1:
+            return self.points[-1]
+        distance = fraction * self.length
+        index = bisect_right(self.lengths, distance)
+        start, end = self.points[index - 1], self.points[index]
+        segment = self.lengths[index] - self.lengths[index - 1]
+        ratio = (distance - self.lengths[index - 1]) / segment if segment else 0.0
+        return start + (end - start) * ratio
+
+
+class _SignalDot:
+    """Một phần tử của pool: chấm tín hiệu và lịch chạy hiện tại của nó trên một đường."""
+    __slots__ = ('item', 'route', 'start', 'duration', 'in_use')
+
+    def __init__(self, item):
+        self.item = item
+        self.route = None
+        self.start = 0.0     # Thời điểm bắt đầu chạy, tính từ lúc start_animation()
+        self.duration = 0.0
+        self.in_use = False
+
+
 class SignalAnimator(QObject):
     """
     Quản lý các hiệu ứng di chuyển tín hiệu trên sơ đồ.
-    Sử dụng một đối tượng QObject phụ để làm mục tiêu animation.
+
+    Mọi chấm được điều khiển bởi một đồng hồ khung hình chung (một QTimer): mỗi khung
+    lấy mẫu SignalRoute.point_at() cho tất cả chấm đang chạy. Các tín hiệu được xếp hàng
+    bằng animate_path() sẽ chạy nối tiếp nhau; finished được phát khi chấm cuối cùng tới đích.
+    Chấm được lấy từ một pool dùng lại giữa các pha (chỉ ẩn/hiện, không tạo/xóa item).
     """
-    def __init__(self, scene):
+    finished = pyqtSignal()
+
+    def __init__(self, scene, frame_interval_ms=FRAME_INTERVAL_MS):
         super().__init__()
         self.scene = scene
-        self.animation_group = QSequentialAnimationGroup()
-        self.active_animations = []
+        self._pool = []        # Mọi _SignalDot đã tạo
+        self._free = []        # Các _SignalDot đang rảnh
+        self._active = []      # Các _SignalDot đã được xếp hàng, theo thứ tự chạy
+        self._queued_duration = 0.0  # Tổng thời lượng các tín hiệu đã xếp hàng (giây)
+        self._clock_start = 0.0
+        self._frame_timer = QTimer(self)
+        self._frame_timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._frame_timer.setInterval(frame_interval_ms)
+        self._frame_timer.timeout.connect(self._on_frame)
 
-        # Thêm một list để lưu trữ các item cần dọn dẹp
-        self.items_to_clean_up = []
-        
-        # Sửa: Kết nối tín hiệu finished của QSequentialAnimationGroup
-        self.animation_group.finished.connect(self._on_group_finished)
+    def _create_dot(self):
+        item = AnimatableEllipseItem(0, 0, 0, 0)
+        item.setPen(QPen(Qt.GlobalColor.black, 0.5))
+        item.setZValue(100)
+        item.setVisible(False)
+        self.scene.addItem(item)
+        slot = _SignalDot(item)
+        self._pool.append(slot)
+        return slot
 
-    def animate_path(self, path_points, color=Qt.GlobalColor.blue, dot_size=8, duration=500):
-        if not path_points or len(path_points) < 2:
-            print("Error: Invalid animation path (requires at least 2 points).")
-            return
+    def animate_path(self, route, color=Qt.GlobalColor.blue, dot_size=8, duration=500):
+        """Xếp hàng một tín hiệu chạy trên route (SignalRoute hoặc danh sách điểm) trong duration ms."""
+        if not isinstance(route, SignalRoute):
+            if not route or len(route) < 2:
+                print("Error: Invalid animation path (requires at least 2 points).")
+                return
+            route = SignalRoute(route)
 
-        # Tạo đối tượng hình elip để hiển thị trên màn hình.
-        dot = AnimatableEllipseItem(path_points[0].x() - dot_size / 2, path_points[0].y() - dot_size / 2, dot_size, dot_size)
-        dot.setBrush(QBrush(color))
-        dot.setPen(QPen(Qt.GlobalColor.black, 0.5))
-        dot.setZValue(100)
-        self.scene.addItem(dot)
-        self.items_to_clean_up.append(dot)
-
-        # Tạo một đối tượng QObject "rỗng" để làm mục tiêu cho animation.
-        dummy_target = QObject()
-        dummy_target.setProperty(b"pos", QPointF(0, 0))
-        
-        # Khởi tạo animation trên đối tượng "rỗng" này.
-        animation = QPropertyAnimation(dummy_target, b"pos", self)
-        animation.setDuration(duration)
-        
-        # Kết nối sự thay đổi vị trí của animation với vị trí của hình elip.
-        # Sử dụng weak reference để tránh reference cycle
-        animation.valueChanged.connect(lambda p: dot.setPos(p - QPointF(dot_size / 2, dot_size / 2)))
-        
-        # Tải các điểm đường đi vào animation
-        for i, point in enumerate(path_points):
-            progress = i / (len(path_points) - 1.0)
-            animation.setKeyValueAt(progress, point)
+        slot = self._free.pop() if self._free else self._create_dot()
+        slot.in_use = True
+        slot.route = route
+        slot.start = self._queued_duration
+        slot.duration = duration / 1000.0
+        self._queued_duration += slot.duration
 
-        animation.setEasingCurve(QEasingCurve.Type.Linear)
-        
-        # Kết nối tín hiệu finished của animation để dọn dẹp
-        animation.finished.connect(lambda: self._cleanup_single_animation(dot, animation))
-        
-        self.active_animations.append(animation)
-        self.animation_group.addAnimation(animation)
-        
-        return animation
-
-    def _cleanup_single_animation(self, dot_item, animation_object):
-        """Dọn dẹp một animation và item tương ứng sau khi nó kết thúc."""
-        if dot_item in self.scene.items():
-            self.scene.removeItem(dot_item)
-            
-        if dot_item in self.items_to_clean_up:
-            self.items_to_clean_up.remove(dot_item)
-
-        if animation_object in self.active_animations:
-            self.active_animations.remove(animation_object)
-        
-        # Note: Không gọi animation_object.deleteLater() ở đây, để group quản lý.
-    
-    def _on_group_finished(self):
-        """Dọn dẹp sau khi toàn bộ nhóm animation đã kết thúc."""
-        self.clear_animations()
+        # Chấm được vẽ quanh gốc tọa độ của nó, vị trí item chính là điểm trên đường đi
+        item = slot.item
+        item.setRect(-dot_size / 2, -dot_size / 2, dot_size, dot_size)
+        item.setBrush(QBrush(color))
+        item.setPos(route.points[0])
+        item.setVisible(True)
+
+        self._active.append(slot)
+        return slot
 
     def start_animation(self):
-        self.animation_group.start()
+        self._clock_start = time.perf_counter()
+        self._frame_timer.start()
+        self._on_frame()
+
+    def _on_frame(self):
+        """Một nhịp của đồng hồ khung hình: cập nhật vị trí mọi chấm đang chạy."""
+        elapsed = time.perf_counter() - self._clock_start
+        for slot in self._active:
+            if not slot.in_use:
+                continue
+            progress = (elapsed - slot.start) / slot.duration if slot.duration else 1.0
+            if progress >= 1.0:
+                # Chấm biến mất khi tới đích (vẫn thuộc hàng đợi cho tới khi cả nhóm xong)
+                slot.in_use = False
+                slot.item.setVisible(False)
+            elif progress > 0.0:
+                slot.item.setPos(slot.route.point_at(progress))
+        if elapsed >= self._queued_duration:
+            self.clear_animations()
+            self.finished.emit()
         
     def clear_animations(self):
-        """Dừng tất cả animation và dọn dẹp các item trên scene."""
-        self.animation_group.stop()
-        self.animation_group.clear()
-        
-        # Sửa: Vòng lặp an toàn hơn để dọn dẹp các item còn lại
-        for item in list(self.items_to_clean_up):
-            if item in self.scene.items():
-                self.scene.removeItem(item)
-        
-        self.items_to_clean_up.clear()
-        self.active_animations.clear()
\ No newline at end of file
+        """Dừng đồng hồ, ẩn các chấm và trả chúng về pool (không xóa đối tượng nào)."""
+        self._frame_timer.stop()
+        for slot in self._active:
+            slot.item.setVisible(False)
+            slot.in_use = False
+            slot.route = None
+            self._free.append(slot)
+        self._active.clear()
+        self._queued_duration = 0.0
@@ -0,0 +1,175 @@
+"""
+Đọc/ghi ảnh bộ nhớ (chương trình + dữ liệu) ra file ở ba định dạng:
+
+    raw   (.bin)        các byte thô, ô 0 trước
+    ihex  (.hex, .ihx)  Intel HEX (bản ghi dữ liệu 00 và kết thúc 01)
+    text  (.txt, .mem)  mỗi giá trị một token: 8 chữ số nhị phân (như bảng RAM), 0x hex
+                        hoặc thập phân; chú thích sau ';' hoặc '#'
+
+Mọi hàm đọc kiểm tra toàn bộ file trong một lượt và trả về (offset, image) hoặc ném
+ImageFormatError; không có gì được ghi vào CPU trước khi cả ảnh hợp lệ.
+Module này không import PyQt6.
+"""
+import os
+import re
+
+FORMATS = ('raw', 'ihex', 'text')
+_EXTENSIONS = {
+    '.bin': 'raw',
+    '.img': 'raw',
+    '.hex': 'ihex',
+    '.ihx': 'ihex',
+    '.txt': 'text',
+    '.mem': 'text',
+}
+FILE_FILTER = ("Memory images (*.bin *.img *.hex *.ihx *.txt *.mem);;Raw binary (*.bin *.img);;"
+               "Intel HEX (*.hex *.ihx);;Text (*.txt *.mem);;All files (*)")
+
+_TEXT_COMMENT = re.compile(r'[;#][^\n]*')
+# Một token hợp lệ: 8 bit nhị phân, 0x hex hoặc thập phân (phạm vi 0-255 kiểm tra sau)
+_TEXT_TOKEN = re.compile(r'[01]{8}|0[xX][0-9A-Fa-f]{1,2}|[0-9]{1,3}')
+_IHEX_RECORD = re.compile(r':([0-9A-Fa-f]{2})+')
+_IHEX_RECORD_SIZE = 16  # Số byte dữ liệu mỗi bản ghi khi ghi file
+
+
+class ImageFormatError(ValueError):
+    """File ảnh bộ nhớ không hợp lệ (kèm số dòng nếu xác định được)."""
+
+
+def detect_format(path, data=None):
+    """Đoán định dạng theo phần mở rộng; nếu không rõ thì theo nội dung (data)."""
+    fmt = _EXTENSIONS.get(os.path.splitext(str(path))[1].lower())
+    if fmt is not None or data is None:
+        return fmt or 'raw'
+    stripped = data.lstrip()
+    if stripped.startswith(b':'):
+        return 'ihex'
+    try:
+        text = data.decode('ascii')
+    except UnicodeDecodeError:
+        return 'raw'
+    tokens = _TEXT_COMMENT.sub('', text).split()
+    return 'text' if tokens and all(_TEXT_TOKEN.fullmatch(token) for token in tokens) else 'raw'
+
+
+def _check_fits(offset, image, size):
+    if len(image) == 0:
+        raise ImageFormatError("Image is empty.")
+    if offset + len(image) > size:
+        raise ImageFormatError(f"Image of {len(image)} bytes at offset {offset} does not fit in {size} memory cells.")
+
+
+def parse_raw(data, size):
+    _check_fits(0, data, size)
+    return 0, bytes(data)
+
+
+def parse_text(data, size):
+    """Mỗi token là một ô liên tiếp từ ô 0."""
+    try:
+        text = data.decode('ascii')
+    except UnicodeDecodeError as e:
+        raise ImageFormatError(f"Text image must be ASCII (byte {e.start}).") from None
+    values = bytearray()
+    for number, line in enumerate(text.splitlines(), 1):
+        for token in _TEXT_COMMENT.sub('', line).split():
+            if not _TEXT_TOKEN.fullmatch(token):
+                raise ImageFormatError(f"Line {number}: invalid value '{token}'.")
+            if len(token) == 8:
+                value = int(token, 2)
+            elif token[:2] in ('0x', '0X'):
+                value = int(token[2:], 16)
+            else:
+                value = int(token)
+            if value > 0xFF:
+                raise ImageFormatError(f"Line {number}: value {value} does not fit in 8 bits.")
+            values.append(value)
+    _check_fits(0, values, size)
+    return 0, bytes(values)
+
+
+def parse_ihex(data, size):
+    """
+    Đọc các bản ghi 00 (dữ liệu) tới bản ghi 01 (kết thúc). Trả về đoạn liên tục từ địa chỉ
+    nhỏ nhất tới địa chỉ lớn nhất được ghi; chỗ trống giữa các bản ghi là 0.
+    """
+    try:
+        text = data.decode('ascii')
+    except UnicodeDecodeError as e:
+        raise ImageFormatError(f"Intel HEX must be ASCII (byte {e.start}).") from None
+    chunks = []
+    ended = False
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line:
+            continue
+        if ended:
+            raise ImageFormatError(f"Line {number}: data after end-of-file record.")
+        if not _IHEX_RECORD.fullmatch(line):
+            raise ImageFormatError(f"Line {number}: not an Intel HEX record.")
+        record = bytes.fromhex(line[1:])
+        if len(record) < 5 or record[0] != len(record) - 5:
+            raise ImageFormatError(f"Line {number}: record length does not match its byte count.")
+        if sum(record) & 0xFF:
+            raise ImageFormatError(f"Line {number}: checksum mismatch.")
+        record_type = record[3]
+        if record_type == 0x00:
+            chunks.append(((record[1] << 8) | record[2], record[4:-1]))
+        elif record_type == 0x01:
+            ended = True
+        else:
+            raise ImageFormatError(f"Line {number}: unsupported record type {record_type:02X}.")
+    if not ended:
+        raise ImageFormatError("Missing end-of-file record.")
+    if not chunks:
+        raise ImageFormatError("Image is empty.")
+    start = min(address for address, _ in chunks)
+    end = max(address + len(chunk) for address, chunk in chunks)
+    if end > size:
+        raise ImageFormatError(f"Record at address {end - 1} is outside the {size} memory cells.")
+    image = bytearray(end - start)
+    for address, chunk in chunks:
+        image[address - start:address - start + len(chunk)] = chunk
+    return start, bytes(image)
+
+
+_PARSERS = {'raw': parse_raw, 'ihex': parse_ihex, 'text': parse_text}
+
+
+def parse_image(data, fmt, size):
+    """Kiểm tra và chuyển nội dung file thành (offset, image) cho bộ nhớ size ô."""
+    if fmt not in _PARSERS:
+        raise ValueError(f"Unknown image format: {fmt}")
+    return _PARSERS[fmt](data, size)
+
+
+def format_image(image, fmt, offset=0):
+    """Chuyển ảnh bộ nhớ thành nội dung file (bytes) ở định dạng fmt."""
+    if fmt == 'raw':
+        return bytes(image)
+    if fmt == 'text':
+        return ''.join(f"{value:08b}  ; {offset + index}\n" for index, value in enumerate(image)).encode('ascii')
+    if fmt == 'ihex':
+        lines = []
+        for start in range(0, len(image), _IHEX_RECORD_SIZE):
+            chunk = image[start:start + _IHEX_RECORD_SIZE]
+            address = offset + start
+            record = bytes((len(chunk), address >> 8, address & 0xFF, 0x00)) + bytes(chunk)
+            lines.append(f":{(record + bytes(((-sum(record)) & 0xFF,))).hex().upper()}")
+        lines.append(":00000001FF")
+        return ('\n'.join(lines) + '\n').encode('ascii')
+    raise ValueError(f"Unknown image format: {fmt}")
+
+
+def read_image(path, size, fmt=None):
+    """Đọc file ảnh bộ nhớ; fmt None nghĩa là tự nhận dạng. Trả về (offset, image)."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    return parse_image(data, fmt or detect_format(path, data), size)
+
+
+def write_image(path, image, fmt=None):
+    """Ghi ảnh bộ nhớ ra file; fmt None nghĩa là chọn theo phần mở rộng."""
+    data = format_image(image, fmt or detect_format(path))
+    with open(path, 'wb') as f:
+        f.write(data)
@@ -0,0 +1,145 @@
+from collections import deque
+
+from .cpu_core import RAM_SIZE, SNAPSHOT_SIZE, _DECODE_TABLE
+
+# Mỗi delta 8 byte: A, B, IAR, cờ, IR, byte trạng thái (sau lệnh) + địa chỉ/giá trị ô RAM bị ghi
+_DELTA_SIZE = 8
+_NO_WRITE = 0xFF  # Địa chỉ RAM giả: lệnh không ghi bộ nhớ
+_STORE_OPS = ('STORE_A', 'STORE_B')
+
+
+class ExecutionJournal:
+    """
+    Nhật ký thực thi cho phép tua lại (Step Back) và nhảy tới một chu kỳ bất kỳ.
+
+    Mỗi lệnh chỉ ghi một delta 8 byte: các thanh ghi/cờ sau lệnh và tối đa một ô RAM
+    (chỉ STORE ghi bộ nhớ). Cứ mỗi keyframe_interval (K) chu kỳ lưu một snapshot đầy đủ,
+    nên seek tới chu kỳ bất kỳ chỉ cần khôi phục một keyframe rồi áp dụng tối đa K delta.
+    Bộ nhớ bị chặn bởi capacity (số chu kỳ giữ lại): khi đầy, đoạn K chu kỳ cũ nhất bị bỏ.
+
+    Khi chạy nhanh (Turbo) có thể bỏ delta và chỉ ghi keyframe qua advance(): các đoạn đó
+    được dựng lại khi cần bằng cách chạy lại tối đa K lệnh từ keyframe (máy là tất định).
+    """
+
+    def __init__(self, cpu, keyframe_interval=256, capacity=1_000_000):
+        if keyframe_interval <= 0:
+            raise ValueError(f"Keyframe interval must be positive. Received: {keyframe_interval}")
+        self.cpu = cpu
+        self.keyframe_interval = keyframe_interval
+        # Làm tròn lên bội số của K để mỗi đoạn bị bỏ luôn bắt đầu bằng một keyframe
+        self.capacity = max(1, -(-capacity // keyframe_interval)) * keyframe_interval
+        self._deltas = bytearray(self.capacity * _DELTA_SIZE)
+        self._keyframes = deque()
+        self._replay = deque()  # Song song với _keyframes: True = đoạn K chu kỳ thiếu delta, phải chạy lại
+        self.base_cycle = 0   # Chu kỳ cũ nhất còn có thể seek tới (luôn có keyframe)
+        self.cycle = 0        # Chu kỳ mới nhất đã ghi
+        self.position = 0     # Chu kỳ mà CPU đang ở (nhỏ hơn cycle sau khi Step Back)
+        self.start()
+
+    def start(self):
+        """Bắt đầu nhật ký mới từ trạng thái hiện tại của CPU (chu kỳ 0)."""
+        self._keyframes.clear()
+        self._keyframes.append(self.cpu.snapshot())
+        self._replay.clear()
+        self._replay.append(False)
+        self.base_cycle = self.cycle = self.position = 0
+
+    def __len__(self):
+        """Số chu kỳ đang được giữ trong nhật ký."""
+        return self.cycle - self.base_cycle
+
+    def _truncate(self):
+        """Bỏ phần tương lai sau position (CPU đã rẽ sang nhánh thực thi khác)."""
+        keep = (self.position - self.base_cycle) // self.keyframe_interval + 1
+        while len(self._keyframes) > keep:
+            self._keyframes.pop()
+            self._replay.pop()
+        self.cycle = self.position
+
+    def record(self, cpu=None):
+        """
+        Ghi delta của lệnh vừa thực thi xong (gọi tại ranh giới giữa hai lệnh).
+        cpu mặc định là self.cpu; truyền CPU khác khi lệnh được chạy trên bản sao (ví dụ ở luồng worker).
+        """
+        if self.position != self.cycle:
+            self._truncate()
+        if cpu is None:
+            cpu = self.cpu
+        interval = self.keyframe_interval
+        if self.cycle - self.base_cycle >= self.capacity:
+            self._drop_oldest()
+
+        decoded = _DECODE_TABLE[cpu.ir]
+        if decoded.name in _STORE_OPS:
+            address = decoded.operand
+            value = cpu.ram[address]
+        else:
+            address, value = _NO_WRITE, 0
+        offset = (self.cycle % self.capacity) * _DELTA_SIZE
+        self._deltas[offset:offset + _DELTA_SIZE] = cpu.snapshot()[RAM_SIZE:] + bytes((address, value))
+
+        self.cycle += 1
+        self.position = self.cycle
+        if (self.cycle - self.base_cycle) % interval == 0:
+            self._keyframes.append(cpu.snapshot())
+            self._replay.append(False)
+
+    def _drop_oldest(self):
+        self._keyframes.popleft()
+        self._replay.popleft()
+        self.base_cycle += self.keyframe_interval
+
+    def cycles_to_keyframe(self):
+        """Số lệnh còn lại tới keyframe kế tiếp (advance() không được vượt quá mốc này)."""
+        return self.keyframe_interval - (self.position - self.base_cycle) % self.keyframe_interval
+
+    def advance(self, cpu, count):
+        """
+        Ghi count lệnh vừa chạy mà không có delta (chế độ chạy nhanh); cpu là trạng thái sau count lệnh.
+        count không được vượt quá cycles_to_keyframe(), để keyframe luôn rơi đúng mốc K chu kỳ.
+        """
+        if count <= 0:
+            return
+        if self.position != self.cycle:
+            self._truncate()
+        if self.cycle - self.base_cycle >= self.capacity:
+            self._drop_oldest()
+        self._replay[-1] = True
+        self.cycle += count
+        self.position = self.cycle
+        if (self.cycle - self.base_cycle) % self.keyframe_interval == 0:
+            self._keyframes.append(cpu.snapshot())
+            self._replay.append(False)
+
+    def observe(self, cycle, address, instruction, cpu):
+        """Dùng làm observer của CPU.run() để ghi nhật ký khi chạy headless."""
+        self.record(cpu)
+
+    def seek(self, target):
+        """Đưa CPU về trạng thái sau đúng target chu kỳ, chi phí O(K)."""
+        if not self.base_cycle <= target <= self.cycle:
+            raise ValueError(f"Cycle must be between {self.base_cycle} and {self.cycle}. Received: {target}")
+        index = (target - self.base_cycle) // self.keyframe_interval
+        if self._replay[index]:
+            # Đoạn chạy nhanh: dựng lại bằng cách chạy tiếp từ keyframe (tối đa K lệnh)
+            self.cpu.restore(self._keyframes[index])
+            self.cpu.run(target - self.base_cycle - index * self.keyframe_interval)
+            self.position = target
+            return
+        state = bytearray(self._keyframes[index])
+        deltas = self._deltas
+        for cycle in range(self.base_cycle + index * self.keyframe_interval, target):
+            offset = (cycle % self.capacity) * _DELTA_SIZE
+            state[RAM_SIZE:SNAPSHOT_SIZE] = deltas[offset:offset + SNAPSHOT_SIZE - RAM_SIZE]
+            address = deltas[offset + _DELTA_SIZE - 2]
+            if address != _NO_WRITE:
+                state[address] = deltas[offset + _DELTA_SIZE - 1]
+        self.cpu.restore(bytes(state))
+        self.position = target
+
+    def step_back(self):
+        """Lùi một lệnh. Trả về False nếu không còn lịch sử."""
+        if self.position <= self.base_cycle:
+            return False
+        self.seek(self.position - 1)
+        return True
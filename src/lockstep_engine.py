@@ -0,0 +1,172 @@
+import time
+
+import numpy as np
+
+from .alu import FLAG_Z, FLAG_N, FLAGS_SHIFT, RESULT_MASK, ADD_TABLE, SUB_TABLE, ADDI_TABLE, ZN_TABLE
+from .cpu_core import CPU, OPCODE_MAP, RAM_SIZE
+
+# Tên lệnh -> opcode 4 bit, lấy từ bảng mã lệnh của CPU
+OPCODES = {info['name']: int(bits, 2) for bits, info in OPCODE_MAP.items()}
+
+# Mã trạng thái của từng làn (lane)
+STATUS_RUNNING = 0
+STATUS_HALTED = 1
+STATUS_UNKNOWN_OPCODE = 2
+STATUS_NAMES = {STATUS_RUNNING: 'max_cycles', STATUS_HALTED: 'halted', STATUS_UNKNOWN_OPCODE: 'unknown_opcode'}
+
+_ADD = np.frombuffer(ADD_TABLE, dtype=np.uint16)
+_SUB = np.frombuffer(SUB_TABLE, dtype=np.uint16)
+_ADDI = np.frombuffer(ADDI_TABLE, dtype=np.uint16)
+_ZN = np.frombuffer(ZN_TABLE, dtype=np.uint8)
+_KNOWN_OPCODE = np.zeros(16, dtype=bool)
+_KNOWN_OPCODE[list(OPCODES.values())] = True
+
+
+class LockstepEngine:
+    """
+    Mô phỏng N máy CPU song song bằng mảng NumPy: RAM (N, 16) uint8 cùng các
+    vector A, B, IAR, IR, cờ. Mỗi step tiến tất cả các làn chưa dừng thêm đúng
+    một lệnh (IAR của từng làn có thể khác nhau), với ngữ nghĩa giống hệt CPU.
+    """
+
+    def __init__(self, rams):
+        rams = np.array(rams, dtype=np.uint8, copy=True)
+        if rams.ndim != 2 or rams.shape[1] != RAM_SIZE:
+            raise ValueError(f"RAM array must have shape (N, {RAM_SIZE}). Received: {rams.shape}")
+        count = rams.shape[0]
+        self.ram = rams
+        self.reg_a = np.zeros(count, dtype=np.uint8)
+        self.reg_b = np.zeros(count, dtype=np.uint8)
+        self.iar = np.zeros(count, dtype=np.uint8)
+        self.ir = np.zeros(count, dtype=np.uint8)
+        self.flag_bits = np.zeros(count, dtype=np.uint8)
+        self.status = np.full(count, STATUS_RUNNING, dtype=np.uint8)
+        self.cycles = np.zeros(count, dtype=np.int64)
+
+    @classmethod
+    def from_program(cls, program, data, cells):
+        """
+        Cùng một chương trình cho mọi làn, chỉ khác dữ liệu khởi tạo.
+        data có shape (N, len(cells)): data[i, j] được ghi vào RAM[cells[j]] của làn i.
+        """
+        image = np.zeros(RAM_SIZE, dtype=np.uint8)
+        image[:len(program)] = np.frombuffer(bytes(program), dtype=np.uint8)
+        data = np.asarray(data, dtype=np.uint8).reshape(-1, len(cells))
+        rams = np.repeat(image[np.newaxis, :], data.shape[0], axis=0)
+        rams[:, list(cells)] = data
+        return cls(rams)
+
+    def __len__(self):
+        return self.ram.shape[0]
+
+    @property
+    def halted(self):
+        return self.status != STATUS_RUNNING
+
+    def step(self):
+        """Thực thi một lệnh trên mọi làn còn chạy. Trả về số làn đã thực thi."""
+        lanes = np.flatnonzero(self.status == STATUS_RUNNING)
+        if lanes.size == 0:
+            return 0
+
+        ram = self.ram
+        address = self.iar[lanes]
+        instruction = ram[lanes, address]
+        opcode = instruction >> 4
+        operand = instruction & 0xF
+        reg_a = self.reg_a[lanes]
+        reg_b = self.reg_b[lanes]
+        # Cờ O luôn được xóa trước khi thực thi lệnh
+        flag_bits = self.flag_bits[lanes] & np.uint8(FLAG_Z | FLAG_N)
+        next_iar = (address + 1) & 0xF
+        status = np.full(lanes.size, STATUS_RUNNING, dtype=np.uint8)
+
+        mask = opcode == OPCODES['LOAD_A']
+        if mask.any():
+            value = ram[lanes[mask], operand[mask]]
+            reg_a[mask] = value
+            flag_bits[mask] = _ZN[value]
+
+        mask = opcode == OPCODES['LOAD_B']
+        if mask.any():
+            # LOAD_B không thay đổi cờ Z/N
+            reg_b[mask] = ram[lanes[mask], operand[mask]]
+
+        mask = opcode == OPCODES['STORE_A']
+        if mask.any():
+            ram[lanes[mask], operand[mask]] = reg_a[mask]
+
+        mask = opcode == OPCODES['STORE_B']
+        if mask.any():
+            ram[lanes[mask], operand[mask]] = reg_b[mask]
+
+        for name, table in (('ADD', _ADD), ('SUB', _SUB)):
+            mask = opcode == OPCODES[name]
+            if mask.any():
+                entry = table[(reg_a[mask].astype(np.intp) << 8) | reg_b[mask]]
+                reg_a[mask] = entry & RESULT_MASK
+                flag_bits[mask] = entry >> FLAGS_SHIFT
+
+        mask = opcode == OPCODES['ADDI']
+        if mask.any():
+            entry = _ADDI[(reg_a[mask].astype(np.intp) << 4) | operand[mask]]
+            reg_a[mask] = entry & RESULT_MASK
+            flag_bits[mask] = entry >> FLAGS_SHIFT
+
+        mask = (opcode == OPCODES['JUMP']) | \
+               ((opcode == OPCODES['JUMP_NEG']) & ((flag_bits & FLAG_N) != 0)) | \
+               ((opcode == OPCODES['JUMP_ZERO']) & ((flag_bits & FLAG_Z) != 0))
+        next_iar[mask] = operand[mask]
+
+        # HALT: IAR giữ nguyên tại lệnh HALT
+        mask = opcode == OPCODES['HALT']
+        next_iar[mask] = address[mask]
+        status[mask] = STATUS_HALTED
+
+        # Opcode không xác định: dừng, IAR vẫn được tăng
+        status[~_KNOWN_OPCODE[opcode]] = STATUS_UNKNOWN_OPCODE
+
+        self.reg_a[lanes] = reg_a
+        self.reg_b[lanes] = reg_b
+        self.flag_bits[lanes] = flag_bits
+        self.iar[lanes] = next_iar
+        self.ir[lanes] = instruction
+        self.status[lanes] = status
+        self.cycles[lanes] += 1
+        return lanes.size
+
+    def run(self, max_cycles=100000):
+        """Chạy tới khi mọi làn dừng hoặc đạt max_cycles bước. Trả về dict tổng hợp."""
+        start = time.perf_counter()
+        steps = 0
+        executed = 0
+        while steps < max_cycles:
+            lanes = self.step()
+            if lanes == 0:
+                break
+            executed += lanes
+            steps += 1
+        elapsed = time.perf_counter() - start
+        return {
+            'steps': steps,
+            'cycles': executed,
+            'lanes': len(self),
+            'halted': int(np.count_nonzero(self.halted)),
+            'elapsed': elapsed,
+            'cycles_per_sec': executed / elapsed if elapsed > 0 else 0.0,
+        }
+
+    def lane_status(self, index):
+        return STATUS_NAMES[int(self.status[index])]
+
+    def to_cpu(self, index):
+        """Tạo một đối tượng CPU mang trạng thái của làn index (để hiển thị hoặc đối chiếu)."""
+        cpu = CPU()
+        cpu.ram[:] = self.ram[index].tobytes()
+        cpu.reg_a = int(self.reg_a[index])
+        cpu.reg_b = int(self.reg_b[index])
+        cpu.iar = int(self.iar[index])
+        cpu.ir = int(self.ir[index])
+        cpu.flag_bits = int(self.flag_bits[index])
+        cpu.is_halted = bool(self.status[index] != STATUS_RUNNING)
+        return cpu
@@ -1,29 +1,43 @@
 import sys
+import threading
+import time
 
 # Import từ PyQt6.QtWidgets
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QLabel, QPushButton, QTableWidget, QTableWidgetItem, QGraphicsView,
+    QLabel, QPushButton, QTableView,
     QGraphicsScene, QComboBox, QLineEdit, QFormLayout, QMessageBox,
     QGraphicsRectItem, QGroupBox, QGraphicsPathItem, QGraphicsProxyWidget,
-    QScrollArea, QTabWidget, QTextEdit
+    QScrollArea, QTabWidget, QPlainTextEdit, QSpinBox, QFileDialog, QHeaderView, QCheckBox,
+    QListView
 )
 
 # Import từ PyQt6.QtGui
 from PyQt6.QtGui import (
     QPixmap, QColor, QPen, QFont, QBrush, QTransform, QResizeEvent,
-    QPainterPath, QPalette # Thêm QPalette
+    QPainterPath, QPalette, QTextCursor, QAction, QKeySequence # Thêm QPalette
 )
 
 # Import từ PyQt6.QtCore
 from PyQt6.QtCore import (
     Qt, QTimer, QPointF, QRectF, QPropertyAnimation, QSequentialAnimationGroup,
-    QObject, pyqtSignal, QCoreApplication, QSize
+    QObject, pyqtSignal, QSize, QThread
 )
 
 # Import các file của bạn từ cùng một gói (package)
-from .cpu_core import CPU
-from .gui_elements import SignalAnimator
+from .cpu_core import CPU, LoopDetector, RAM_SIZE
+from .journal import ExecutionJournal
+from .cpu_worker import CPUWorker
+from .execution_trace import TraceRecorder
+from .gui_elements import (
+    SignalAnimator, SignalRoute, RamTableModel, FrameScheduler, DiagramView, HighlightOverlay, PagedMemoryModel,
+    FileDropFilter, LibraryListModel
+)
+from .memory import ADDRESS_WIDTHS
+from .wide_cpu import WideCPU, encode_instruction
+from .assembler import AssemblyError, assemble_cached, disassemble
+from .image_io import FILE_FILTER, ImageFormatError, read_image, write_image
+from .program_library import LIBRARY_FILE_FILTER, ProgramLibrary
 # Định nghĩa TỌA ĐỘ đã cập nhật cho các thành phần trên sơ đồ
 # Các tọa độ này đã được điều chỉnh để khớp với hình ảnh
 DIAGRAM_COORDS_ORIGINAL = {
@@ -49,6 +63,7 @@ DIAGRAM_COORDS_ORIGINAL = {
     'REG_B_RECT': QRectF(189, 108, 112, 44),
     'ALU_RECT': QRectF(70, 370, 90, 60),
     'CONTROL_UNIT_RECT': QRectF(292, 280, 265, 200),
+    'RAM_TABLE_RECT': QRectF(695, 67, 180, 440),
 }
 SIGNAL_PATHS_ORIGINAL = {
     'IAR_TO_RAM_ADDR_BUS': [QPointF(430, 450), QPointF(695, 450)],
@@ -64,17 +79,98 @@ SIGNAL_PATHS_ORIGINAL = {
     'ADDR_TO_IAR_JUMP': [ QPointF(500, 330), QPointF(690, 120), QPointF(430, 400)],
 }
 
-class EmittingStream(QObject):
+# Bus của từng đường tín hiệu. Ở chế độ Harvard bus lệnh (Program RAM -> IR) và bus dữ liệu
+# (Data RAM <-> thanh ghi) là hai đường vật lý riêng; ở chế độ RAM dùng chung chúng là một.
+SIGNAL_PATH_BUSES = {
+    'IAR_TO_RAM_ADDR_BUS': 'instruction',
+    'RAM_DATA_TO_IR': 'instruction',
+    'IR_TO_CONTROL_UNIT': 'internal',
+    'RAM_DATA_TO_REG_A': 'data',
+    'RAM_DATA_TO_REG_B': 'data',
+    'REG_A_TO_RAM_DATA_BUS': 'data',
+    'REG_B_TO_RAM_DATA_BUS': 'data',
+    'REG_A_TO_ALU': 'internal',
+    'REG_B_TO_ALU': 'internal',
+    'ALU_TO_REG_A': 'internal',
+    'ADDR_TO_IAR_JUMP': 'internal',
+}
+# Màu tín hiệu theo bus ở chế độ Harvard, để phân biệt hai bus bộ nhớ
+HARVARD_BUS_COLORS = {'instruction': QColor("darkorange"), 'data': QColor("royalblue")}
+
+# Các đường tín hiệu được dựng sẵn một lần (điểm gấp khúc + bảng độ dài cung)
+SIGNAL_ROUTES = {name: SignalRoute(points, SIGNAL_PATH_BUSES[name]) for name, points in SIGNAL_PATHS_ORIGINAL.items()}
+
+# Output Terminal: chu kỳ đẩy log ra giao diện và số dòng tối đa được giữ lại
+LOG_FLUSH_INTERVAL_MS = 50
+TERMINAL_MAX_LINES = 5000
+# Thời gian hiển thị thông báo trên thanh trạng thái (thay cho hộp thoại "Success")
+STATUS_MESSAGE_MS = 4000
+# Tab Wide Memory: chạy theo lát thời gian trên luồng giao diện để cửa sổ không bị treo
+WIDE_RUN_LIMIT = 1_000_000   # số lệnh tối đa mỗi lần bấm Run
+WIDE_SLICE_MS = 8            # thời gian chạy tối đa của một lát, sau đó làm mới bảng và trả quyền cho event loop
+WIDE_SLICE_CYCLES = 1024     # số lệnh mỗi lần gọi WideCPU.run() trong một lát
+
+class BufferedLogSink(QObject):
+    """
+    Thay thế sys.stdout: gom các lần print vào bộ đệm và phát textWritten theo lô
+    mỗi LOG_FLUSH_INTERVAL_MS, thay vì phát tín hiệu và gọi processEvents cho từng mảnh text.
+    Tùy chọn ghi song song toàn bộ log ra file (spill) để giữ trace đầy đủ.
+    """
     textWritten = pyqtSignal(str)
 
+    def __init__(self, interval_ms=LOG_FLUSH_INTERVAL_MS, parent=None):
+        super().__init__(parent)
+        self._buffer = []
+        self._lock = threading.Lock()  # print có thể đến từ luồng khác luồng giao diện
+        self.spill_file = None
+        self._timer = QTimer(self)
+        self._timer.setInterval(interval_ms)
+        self._timer.timeout.connect(self.emit_pending)
+        self._timer.start()
+
     def write(self, text):
-        self.textWritten.emit(str(text))
-        QCoreApplication.processEvents() # Cần thiết để cập nhật ngay lập tức
+        text = str(text)
+        with self._lock:
+            self._buffer.append(text)
+            if self.spill_file is not None:
+                self.spill_file.write(text)
+        return len(text)
 
     def flush(self):
-        pass
+        with self._lock:
+            if self.spill_file is not None:
+                self.spill_file.flush()
+
+    def emit_pending(self):
+        """Phát toàn bộ text đang chờ trong một tín hiệu duy nhất."""
+        with self._lock:
+            if not self._buffer:
+                return
+            text = "".join(self._buffer)
+            self._buffer.clear()
+        self.textWritten.emit(text)
+
+    def start_spill(self, path):
+        """Bắt đầu ghi toàn bộ log ra file path (ngoài terminal bị giới hạn số dòng)."""
+        self.stop_spill()
+        spill_file = open(path, 'w', encoding='utf-8')
+        with self._lock:
+            self.spill_file = spill_file
+
+    def stop_spill(self):
+        with self._lock:
+            spill_file, self.spill_file = self.spill_file, None
+        if spill_file is not None:
+            spill_file.close()
 
 class CPUVisualizerApp(QMainWindow):
+    # Lệnh gửi sang luồng worker (kết nối queued vì worker sống ở luồng khác)
+    turbo_start_requested = pyqtSignal(bytes, object, int, object, object)
+    turbo_stop_requested = pyqtSignal()
+    turbo_pause_requested = pyqtSignal()
+    turbo_resume_requested = pyqtSignal()
+    turbo_step_requested = pyqtSignal()
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("CPU Execution Visualizer")
@@ -84,8 +180,8 @@ class CPUVisualizerApp(QMainWindow):
         self.scene = QGraphicsScene()
         # Sửa: Khởi tạo SignalAnimator trong main.py
         self.signal_animator = SignalAnimator(self.scene)
-        # Sửa: Kết nối tín hiệu finished của animation group với một hàm callback
-        self.signal_animator.animation_group.finished.connect(self._on_animation_finished)
+        # Sửa: Kết nối tín hiệu finished của SignalAnimator với một hàm callback
+        self.signal_animator.finished.connect(self._on_animation_finished)
 
         self.central_widget = QWidget()
         self.setCentralWidget(self.central_widget)
@@ -97,24 +193,47 @@ class CPUVisualizerApp(QMainWindow):
         self.flags_display_labels = {}
         
         self.ram_proxy_widget = None
+        self.displayed_snapshot = None # Snapshot đang hiển thị, dùng để chỉ cập nhật phần đã đổi
+        self.displayed_alu_out = None
 
         self.cpu_current_phase = 'IDLE'
         self.is_running_mode = False
         self.is_animating = False
+        self.loop_detector = None # Phát hiện vòng lặp vô hạn trong chế độ Run
+        self.run_start_snapshot = None # Trạng thái máy ngay trước lệnh đầu tiên, dùng cho Reset
+        self.journal = None # Nhật ký thực thi cho Step Back / nhảy tới chu kỳ
+        self.trace_recorder = None # Bộ ghi trace nhị phân (bật bằng nút Record Trace)
+        self.instruction_address = 0 # Địa chỉ của lệnh đang thực thi (IAR lúc Fetch)
 
         self.animation_step_duration = 500
         self.current_diagram_scale = 1.0
         
-        self.cpu_phase_timer = QTimer(self)
-        self.cpu_phase_timer.setSingleShot(True)
-        self.cpu_phase_timer.timeout.connect(self._advance_cpu_phase)
+        # Mọi hiệu ứng hẹn giờ (tiến pha, hết hạn highlight, co giãn sơ đồ) đi qua một bộ lập lịch
+        self.frame_scheduler = FrameScheduler(parent=self)
+
+        # Chế độ Turbo: CPUWorker chạy trên QThread riêng, công bố snapshot qua tín hiệu queued
+        self.is_turbo_mode = False
+        self.is_turbo_paused = False
+        self.turbo_run_id = 0
+        self.cpu_thread = QThread(self)
+        self.cpu_worker = CPUWorker()
+        self.cpu_worker.moveToThread(self.cpu_thread)
+        self.turbo_start_requested.connect(self.cpu_worker.start)
+        self.turbo_stop_requested.connect(self.cpu_worker.stop)
+        # Worker nằm trên luồng khác nên các kết nối này là queued
+        self.turbo_pause_requested.connect(self.cpu_worker.pause)
+        self.turbo_resume_requested.connect(self.cpu_worker.resume)
+        self.turbo_step_requested.connect(self.cpu_worker.step)
+        self.cpu_worker.state_published.connect(self._on_worker_state)
+        self.cpu_worker.stopped.connect(self._on_worker_stopped)
+        self.cpu_thread.start()
 
         self.init_ui()
         self.update_gui_cpu_status()
 
     def resizeEvent(self, event: QResizeEvent):
         super().resizeEvent(event)
-        QTimer.singleShot(10, self.adjust_diagram_scale)
+        self.frame_scheduler.schedule('adjust_scale', 10, self.adjust_diagram_scale)
 
     def adjust_diagram_scale(self):
         if not hasattr(self, 'cpu_diagram_pixmap') or self.cpu_diagram_pixmap.isNull():
@@ -144,6 +263,17 @@ class CPUVisualizerApp(QMainWindow):
         # Thiết lập bố cục tổng thể cho widget trung tâm
         self.main_layout = QHBoxLayout(central_widget)
 
+        # Menu File: mở/lưu cả ảnh bộ nhớ (raw, Intel HEX, text)
+        file_menu = self.menuBar().addMenu("&File")
+        self.open_image_action = QAction("&Open Memory Image...", self)
+        self.open_image_action.setShortcut(QKeySequence.StandardKey.Open)
+        self.open_image_action.triggered.connect(self.open_image_gui)
+        file_menu.addAction(self.open_image_action)
+        self.save_image_action = QAction("&Save Memory Image...", self)
+        self.save_image_action.setShortcut(QKeySequence.StandardKey.Save)
+        self.save_image_action.triggered.connect(self.save_image_gui)
+        file_menu.addAction(self.save_image_action)
+
         # 1. Cột trái: Loaders và Registers/Flags
         self.left_panel_layout = QVBoxLayout()
         self.main_layout.addLayout(self.left_panel_layout, 1)
@@ -212,6 +342,10 @@ class CPUVisualizerApp(QMainWindow):
         
         self.left_panel_layout.addWidget(self.data_loader_group_box)
 
+        self.harvard_checkbox = QCheckBox("Harvard mode (separate Program/Data RAM)")
+        self.harvard_checkbox.toggled.connect(self.toggle_harvard_mode)
+        self.left_panel_layout.addWidget(self.harvard_checkbox)
+
         # Registers and Flags - Sắp xếp theo chiều dọc
         self.reg_group_box = QGroupBox("CPU Registers")
         self.reg_layout = QVBoxLayout(self.reg_group_box)
@@ -235,24 +369,50 @@ class CPUVisualizerApp(QMainWindow):
         self.run_button = QPushButton("Run")
         self.step_button = QPushButton("Step")
         self.reset_button = QPushButton("Reset")
+        self.step_back_button = QPushButton("Step Back")
+        self.turbo_button = QPushButton("Turbo")
+        self.turbo_pause_button = QPushButton("Pause")
+        self.turbo_pause_button.setEnabled(False)
+        self.speed_label = QLabel("Speed: -")
+        self.frame_time_label = QLabel("Frame: -")
+        self.seek_cycle_input = QSpinBox()
+        self.seek_cycle_input.setPrefix("Cycle ")
+        self.seek_cycle_input.setRange(0, 0)
+        self.seek_button = QPushButton("Go")
         
         # Điều chỉnh chiều cao của các nút điều khiển
         button_height = 35
         self.run_button.setFixedSize(QSize(70, button_height))
         self.step_button.setFixedSize(QSize(70, button_height))
         self.reset_button.setFixedSize(QSize(70, button_height))
+        self.step_back_button.setFixedSize(QSize(90, button_height))
+        self.turbo_button.setFixedSize(QSize(70, button_height))
+        self.turbo_pause_button.setFixedSize(QSize(70, button_height))
+        self.seek_cycle_input.setFixedSize(QSize(120, button_height))
+        self.seek_button.setFixedSize(QSize(50, button_height))
         
         self.run_button.clicked.connect(self.run_cpu)
         self.step_button.clicked.connect(self.step_cpu)
         self.reset_button.clicked.connect(self.reset_cpu)
+        self.step_back_button.clicked.connect(self.step_back_cpu)
+        self.turbo_button.clicked.connect(self.turbo_run_cpu)
+        self.turbo_pause_button.clicked.connect(self.toggle_turbo_pause)
+        self.seek_button.clicked.connect(self.seek_cycle_gui)
 
         self.top_buttons_layout.addWidget(self.run_button)
         self.top_buttons_layout.addWidget(self.step_button)
         self.top_buttons_layout.addWidget(self.reset_button)
+        self.top_buttons_layout.addWidget(self.step_back_button)
+        self.top_buttons_layout.addWidget(self.seek_cycle_input)
+        self.top_buttons_layout.addWidget(self.seek_button)
+        self.top_buttons_layout.addWidget(self.turbo_button)
+        self.top_buttons_layout.addWidget(self.turbo_pause_button)
+        self.top_buttons_layout.addWidget(self.speed_label)
+        self.top_buttons_layout.addWidget(self.frame_time_label)
         self.diagram_layout.addLayout(self.top_buttons_layout)
         
-        # Vùng hiển thị sơ đồ
-        self.view = QGraphicsView(self.scene)
+        # Vùng hiển thị sơ đồ (ảnh nền được cache, đo thời gian vẽ từng khung hình)
+        self.view = DiagramView(self.scene)
         self.diagram_layout.addWidget(self.view)
         
         # Tải sơ đồ CPU
@@ -262,8 +422,7 @@ class CPUVisualizerApp(QMainWindow):
                 QMessageBox.critical(self, "Error loading image", "Could not load CPU diagram image. Check path 'assets/cpu-diagram01.PNG'.")
                 self.scene.addRect(0, 0, 1000, 600, QPen(QColor("red")), QBrush(QColor("lightgray")))
             else:
-                self.scene.addPixmap(self.cpu_diagram_pixmap)
-                self.scene.setSceneRect(QRectF(self.cpu_diagram_pixmap.rect()))
+                self.view.set_background(self.cpu_diagram_pixmap)
         except Exception as e:
             QMessageBox.critical(self, "Error loading image", f"An error occurred while loading image: {e}")
             self.scene.addRect(0, 0, 1000, 600, QPen(QColor("red")), QBrush(QColor("lightgray")))
@@ -272,21 +431,40 @@ class CPUVisualizerApp(QMainWindow):
         self.ram_group_box = QGroupBox("RAM (Instruction/Data)")
         self.ram_group_box_layout = QVBoxLayout(self.ram_group_box)
         self.ram_group_box.setFixedSize(180, 440) 
-        self.ram_table = QTableWidget(16, 2)
-        self.ram_table.setHorizontalHeaderLabels(["Addr", "Data (8-bit)"])
-        for i in range(16):
-            self.ram_table.setItem(i, 0, QTableWidgetItem(str(i)))
-            self.ram_table.setItem(i, 1, QTableWidgetItem("00000000"))
+        self.ram_model = RamTableModel(RAM_SIZE, self)
+        self.ram_table = QTableView()
+        self.ram_table.setModel(self.ram_model)
         self.ram_table.setColumnWidth(0, 50)
         self.ram_table.setColumnWidth(1, 85)
         self.ram_table.verticalHeader().setDefaultSectionSize(20)
         self.ram_table.verticalHeader().setVisible(False)
+        # Chế độ Harvard: bảng Program RAM riêng, cập nhật độc lập với bảng Data RAM
+        self.program_label = QLabel("Program RAM")
+        self.data_label = QLabel("Data RAM")
+        self.program_model = RamTableModel(RAM_SIZE, self)
+        self.program_table = QTableView()
+        self.program_table.setModel(self.program_model)
+        self.program_table.setColumnWidth(0, 50)
+        self.program_table.setColumnWidth(1, 85)
+        self.program_table.verticalHeader().setDefaultSectionSize(20)
+        self.program_table.verticalHeader().setVisible(False)
+        self.ram_group_box_layout.addWidget(self.program_label)
+        self.ram_group_box_layout.addWidget(self.program_table)
+        self.ram_group_box_layout.addWidget(self.data_label)
         self.ram_group_box_layout.addWidget(self.ram_table)
+        for widget in (self.program_label, self.program_table, self.data_label):
+            widget.setVisible(False)
+        self.displayed_program = None
+        # Thả file ảnh bộ nhớ lên bảng RAM để nạp
+        self.image_drop_filter = FileDropFilter(self)
+        self.image_drop_filter.files_dropped.connect(self._on_image_files_dropped)
+        for widget in (self.ram_group_box, self.ram_table.viewport(), self.program_table.viewport()):
+            self.image_drop_filter.install(widget)
         
         self.ram_proxy_widget = self.scene.addWidget(self.ram_group_box)
         
         self.setup_diagram_elements()
-        QTimer.singleShot(0, self.adjust_diagram_scale)
+        self.frame_scheduler.schedule('adjust_scale', 0, self.adjust_diagram_scale)
 
         # 3. Cột phải: Tab Widget
         self.right_panel_layout = QVBoxLayout()
@@ -299,8 +477,9 @@ class CPUVisualizerApp(QMainWindow):
         # Tab 1: Output Terminal
         self.terminal_tab = QWidget()
         self.terminal_layout = QVBoxLayout(self.terminal_tab)
-        self.terminal_output = QTextEdit()
+        self.terminal_output = QPlainTextEdit()
         self.terminal_output.setReadOnly(True)
+        self.terminal_output.setMaximumBlockCount(TERMINAL_MAX_LINES)
         self.terminal_output.setStyleSheet("background-color: black; color: #00FF00;")
         
         self.terminal_layout.addWidget(self.terminal_output)
@@ -309,18 +488,25 @@ class CPUVisualizerApp(QMainWindow):
         self.terminal_buttons_layout = QHBoxLayout()
         self.clear_terminal_button = QPushButton("Clear Terminal")
         self.clear_terminal_button.clicked.connect(self.terminal_output.clear)
+        self.log_to_file_button = QPushButton("Log to File...")
+        self.log_to_file_button.clicked.connect(self.toggle_log_file)
+        self.record_trace_button = QPushButton("Record Trace...")
+        self.record_trace_button.clicked.connect(self.toggle_trace_recording)
         
         self.terminal_buttons_layout.addStretch()
         self.terminal_buttons_layout.addWidget(self.clear_terminal_button)
+        self.terminal_buttons_layout.addWidget(self.log_to_file_button)
+        self.terminal_buttons_layout.addWidget(self.record_trace_button)
         self.terminal_buttons_layout.addStretch()
         
         self.terminal_layout.addLayout(self.terminal_buttons_layout)
         
         self.tab_widget.addTab(self.terminal_tab, "Output Terminal")
         
-        # Chuyển hướng stdout
-        sys.stdout = EmittingStream()
-        sys.stdout.textWritten.connect(self.terminal_output.insertPlainText)
+        # Chuyển hướng stdout qua bộ đệm, đẩy ra terminal theo lô
+        self.log_sink = BufferedLogSink(parent=self)
+        self.log_sink.textWritten.connect(self._append_terminal_text)
+        sys.stdout = self.log_sink
         
         # Tab 2: Instruction Guide
         self.guide_tab = QWidget()
@@ -446,6 +632,123 @@ class CPUVisualizerApp(QMainWindow):
         self.guide_layout.addWidget(self.instruction_guide_box)
         self.tab_widget.addTab(self.guide_tab, "Instruction Guide")
 
+        # Tab 3: Wide Memory - CPU có địa chỉ rộng trên bộ nhớ thưa, chạy headless
+        self.wide_cpu = WideCPU(ADDRESS_WIDTHS[-1])
+        self.wide_tab = QWidget()
+        self.wide_layout = QVBoxLayout(self.wide_tab)
+        self.wide_form = QFormLayout()
+
+        self.wide_width_combo = QComboBox()
+        for bits in ADDRESS_WIDTHS:
+            self.wide_width_combo.addItem(f"{bits}-bit ({1 << bits:,} cells)", bits)
+        self.wide_width_combo.setCurrentIndex(len(ADDRESS_WIDTHS) - 1)
+        self.wide_width_combo.currentIndexChanged.connect(self.change_wide_address_width)
+
+        self.wide_address_input = QLineEdit("0")
+        self.wide_address_input.setPlaceholderText("Decimal or 0x hex")
+        self.wide_opcode_combo = QComboBox()
+        for opcode_bits, info in self.cpu.opcode_map.items():
+            self.wide_opcode_combo.addItem(f"{info['name']} ({opcode_bits})", info['name'])
+        self.wide_operand_input = QLineEdit("0")
+        self.wide_operand_input.setPlaceholderText("Address or 4-bit value")
+        self.wide_value_input = QLineEdit("0")
+        self.wide_value_input.setPlaceholderText("0-255")
+
+        self.wide_form.addRow(QLabel("Address width:"), self.wide_width_combo)
+        self.wide_form.addRow(QLabel("Address:"), self.wide_address_input)
+        self.wide_form.addRow(QLabel("Opcode:"), self.wide_opcode_combo)
+        self.wide_form.addRow(QLabel("Operand/Addr:"), self.wide_operand_input)
+        self.wide_form.addRow(QLabel("Value (Dec):"), self.wide_value_input)
+        self.wide_layout.addLayout(self.wide_form)
+
+        self.wide_buttons_layout = QHBoxLayout()
+        self.wide_load_instr_button = QPushButton("Load Instruction")
+        self.wide_load_instr_button.clicked.connect(self.load_wide_instruction_gui)
+        self.wide_load_data_button = QPushButton("Load Data")
+        self.wide_load_data_button.clicked.connect(self.load_wide_data_gui)
+        self.wide_run_button = QPushButton("Run")
+        self.wide_run_button.clicked.connect(self.run_wide_cpu)
+        self.wide_reset_button = QPushButton("Reset")
+        self.wide_reset_button.clicked.connect(self.reset_wide_cpu)
+        self.wide_goto_button = QPushButton("Go to Address")
+        self.wide_goto_button.clicked.connect(self.goto_wide_address)
+        for button in (self.wide_load_instr_button, self.wide_load_data_button, self.wide_run_button,
+                       self.wide_reset_button, self.wide_goto_button):
+            self.wide_buttons_layout.addWidget(button)
+        self.wide_layout.addLayout(self.wide_buttons_layout)
+
+        self.wide_status_label = QLabel()
+        self.wide_layout.addWidget(self.wide_status_label)
+
+        # Bảng ảo hóa: model đọc thẳng từ bộ nhớ, hàng cố định chiều cao nên view không phải đo 65.536 hàng
+        self.wide_memory_model = PagedMemoryModel(self.wide_cpu.memory, self)
+        self.wide_memory_table = QTableView()
+        self.wide_memory_table.setModel(self.wide_memory_model)
+        self.wide_memory_table.verticalHeader().setVisible(False)
+        self.wide_memory_table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.wide_memory_table.verticalHeader().setDefaultSectionSize(20)
+        self.wide_memory_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.wide_layout.addWidget(self.wide_memory_table)
+
+        # Mỗi lần timer chạy một lát tối đa WIDE_SLICE_MS rồi làm mới bảng
+        self.wide_run_timer = QTimer(self)
+        self.wide_run_timer.setInterval(0)
+        self.wide_run_timer.timeout.connect(self._run_wide_slice)
+        self.wide_run_cycles = 0
+        self.wide_run_elapsed = 0.0
+
+        self.tab_widget.addTab(self.wide_tab, "Wide Memory")
+        self._update_wide_status()
+
+        # Tab 4: Assembler - hợp dịch cả chương trình rồi nạp vào RAM bằng một lần chép
+        self.asm_tab = QWidget()
+        self.asm_layout = QVBoxLayout(self.asm_tab)
+        self.asm_editor = QPlainTextEdit()
+        self.asm_editor.setFont(QFont("Courier New", 10))
+        self.asm_editor.setPlaceholderText(
+            "start:  LOAD_A a\n        LOAD_B b\n        ADD\n        STORE_A out\n        HALT\n"
+            ".org 13\nout:    .data 0\na:      .data 5\nb:      .data 7")
+        self.asm_layout.addWidget(self.asm_editor)
+        self.asm_buttons_layout = QHBoxLayout()
+        self.assemble_button = QPushButton("Assemble && Load")
+        self.assemble_button.clicked.connect(self.assemble_and_load_gui)
+        self.disassemble_button = QPushButton("Disassemble RAM")
+        self.disassemble_button.clicked.connect(self.disassemble_ram_gui)
+        self.asm_buttons_layout.addStretch()
+        self.asm_buttons_layout.addWidget(self.assemble_button)
+        self.asm_buttons_layout.addWidget(self.disassemble_button)
+        self.asm_buttons_layout.addStretch()
+        self.asm_layout.addLayout(self.asm_buttons_layout)
+        self.asm_status_label = QLabel("")
+        self.asm_layout.addWidget(self.asm_status_label)
+        self.tab_widget.addTab(self.asm_tab, "Assembler")
+
+        # Tab 5: Library - duyệt/tìm trong thư viện chương trình (mmap), nhấp đúp để nạp
+        self.program_library = None
+        self.library_tab = QWidget()
+        self.library_layout = QVBoxLayout(self.library_tab)
+        self.library_top_layout = QHBoxLayout()
+        self.open_library_button = QPushButton("Open Library...")
+        self.open_library_button.clicked.connect(self.open_library_gui)
+        self.library_search_input = QLineEdit()
+        self.library_search_input.setPlaceholderText("Search name or hash")
+        self.library_search_input.textChanged.connect(self.filter_library_gui)
+        self.library_top_layout.addWidget(self.open_library_button)
+        self.library_top_layout.addWidget(self.library_search_input)
+        self.library_layout.addLayout(self.library_top_layout)
+        self.library_model = LibraryListModel(self)
+        self.library_list = QListView()
+        self.library_list.setModel(self.library_model)
+        self.library_list.setUniformItemSizes(True)  # Không phải đo từng hàng khi có hàng chục nghìn tên
+        self.library_list.activated.connect(self.load_library_program_gui)
+        self.library_layout.addWidget(self.library_list)
+        self.library_load_button = QPushButton("Load Selected")
+        self.library_load_button.clicked.connect(lambda: self.load_library_program_gui(self.library_list.currentIndex()))
+        self.library_layout.addWidget(self.library_load_button)
+        self.library_status_label = QLabel("No library open.")
+        self.library_layout.addWidget(self.library_status_label)
+        self.tab_widget.addTab(self.library_tab, "Library")
+
         # Gọi hàm xử lý thay đổi opcode lần đầu tiên
         self._handle_opcode_change(0)
             
@@ -492,17 +795,17 @@ class CPUVisualizerApp(QMainWindow):
         font = QFont("Arial", 10, QFont.Weight.Bold)
 
         self.diagram_text_items['IAR'] = self.scene.addText("00000000", font)
-        self.diagram_rect_highlights['IAR'] = self.scene.addRect(DIAGRAM_COORDS_ORIGINAL['IAR_RECT'], QPen(Qt.GlobalColor.transparent), QBrush(Qt.GlobalColor.transparent))
+        self._add_highlight_overlay('IAR', 'IAR_RECT')
 
         self.diagram_text_items['IR_Opcode'] = self.scene.addText("0000", font)
         self.diagram_text_items['IR_AddrData'] = self.scene.addText("0000", font)
-        self.diagram_rect_highlights['IR'] = self.scene.addRect(DIAGRAM_COORDS_ORIGINAL['IR_RECT'], QPen(Qt.GlobalColor.transparent), QBrush(Qt.GlobalColor.transparent))
+        self._add_highlight_overlay('IR', 'IR_RECT')
 
         self.diagram_text_items['A'] = self.scene.addText("00000000", font)
-        self.diagram_rect_highlights['A'] = self.scene.addRect(DIAGRAM_COORDS_ORIGINAL['REG_A_RECT'], QPen(Qt.GlobalColor.transparent), QBrush(Qt.GlobalColor.transparent))
+        self._add_highlight_overlay('A', 'REG_A_RECT')
 
         self.diagram_text_items['B'] = self.scene.addText("00000000", font)
-        self.diagram_rect_highlights['B'] = self.scene.addRect(DIAGRAM_COORDS_ORIGINAL['REG_B_RECT'], QPen(Qt.GlobalColor.transparent), QBrush(Qt.GlobalColor.transparent))
+        self._add_highlight_overlay('B', 'REG_B_RECT')
         
         self.diagram_text_items['ALU_OUT'] = self.scene.addText("0", font)
         
@@ -510,10 +813,18 @@ class CPUVisualizerApp(QMainWindow):
         self.diagram_text_items['N_flag'] = self.scene.addText("F", font)
         self.diagram_text_items['O_flag'] = self.scene.addText("F", font)
         
-        self.diagram_rect_highlights['ALU'] = self.scene.addRect(DIAGRAM_COORDS_ORIGINAL['ALU_RECT'], QPen(Qt.GlobalColor.transparent), QBrush(Qt.GlobalColor.transparent))
-        self.diagram_rect_highlights['CONTROL_UNIT'] = self.scene.addRect(DIAGRAM_COORDS_ORIGINAL['CONTROL_UNIT_RECT'], QPen(Qt.GlobalColor.transparent), QBrush(Qt.GlobalColor.transparent))
+        self._add_highlight_overlay('ALU', 'ALU_RECT')
+        self._add_highlight_overlay('CONTROL_UNIT', 'CONTROL_UNIT_RECT')
+        # Khung nháy của bảng RAM cũng là một overlay (không đổi stylesheet của widget nhúng)
+        self._add_highlight_overlay('RAM', 'RAM_TABLE_RECT')
 
         self.update_diagram_element_positions()
+
+    def _add_highlight_overlay(self, key, coord_key):
+        overlay = HighlightOverlay(DIAGRAM_COORDS_ORIGINAL[coord_key])
+        overlay.setZValue(10)  # Nằm trên bảng RAM và chữ, dưới các chấm tín hiệu
+        self.scene.addItem(overlay)
+        self.diagram_rect_highlights[key] = overlay
         
     def update_diagram_element_positions(self):
         if not hasattr(self, 'current_diagram_scale') or self.current_diagram_scale == 0:
@@ -550,55 +861,62 @@ class CPUVisualizerApp(QMainWindow):
         self.diagram_text_items['O_flag'].setPos(DIAGRAM_COORDS_ORIGINAL['FLAG_O_VALUE_POS'])
         self.diagram_text_items['O_flag'].setFont(font)
 
-        # Cập nhật vị trí cho các khung highlight
-        for key, item in self.diagram_rect_highlights.items():
-            if key in DIAGRAM_COORDS_ORIGINAL:
-                item.setRect(DIAGRAM_COORDS_ORIGINAL[key])
-        
         if self.ram_proxy_widget:
             self.ram_proxy_widget.setPos(DIAGRAM_COORDS_ORIGINAL['RAM_TABLE_POS'])
 
     def update_gui_cpu_status(self):
-        # Cập nhật RAM table
-        for i in range(16):
-            self.ram_table.setItem(i, 1, QTableWidgetItem(self.cpu.ram[i]))
-
-        # Cập nhật các label trong control panel
-        self.register_display_labels['A'].setText(f"Reg A: {self.cpu.registers['A']} ({self.cpu.registers['A']:08b})")
-        self.register_display_labels['B'].setText(f"Reg B: {self.cpu.registers['B']} ({self.cpu.registers['B']:08b})")
-        self.register_display_labels['IAR'].setText(f"IAR: {self.cpu.registers['IAR']} ({self.cpu.registers['IAR']:04b})")
-        self.register_display_labels['IR_Opcode'].setText(f"IR (Opcode): {self.cpu.registers['IR_Opcode']}")
-        self.register_display_labels['IR_AddrData'].setText(f"IR (Addr/Data): {self.cpu.registers['IR_AddrData']}")
-
-        z_flag_status = 'T' if self.cpu.flags['Z'] else 'F'
-        n_flag_status = 'T' if self.cpu.flags['N'] else 'F'
-        o_flag_status = 'T' if self.cpu.flags['O'] else 'F'
-        
-        self.flags_display_labels['Z'].setText(f"Z: {z_flag_status}")
-        self.flags_display_labels['N'].setText(f"N: {n_flag_status}")
-        self.flags_display_labels['O'].setText(f"O: {o_flag_status}")
-
-        # Cập nhật các text item trên sơ đồ
-        self.diagram_text_items['IAR'].setPlainText(f"IAR: {self.cpu.registers['IAR']:04b}")
-        self.diagram_text_items['IR_Opcode'].setPlainText(f"{self.cpu.registers['IR_Opcode']}")
-        self.diagram_text_items['IR_AddrData'].setPlainText(f"{self.cpu.registers['IR_AddrData']}")
-        self.diagram_text_items['A'].setPlainText(f"A: {self.cpu.registers['A']:08b}")
-        self.diagram_text_items['B'].setPlainText(f"B: {self.cpu.registers['B']:08b}")
-        
-        # Chỉ cập nhật ALU_OUT khi có ALU ops
-        if self.cpu.last_decoded_instruction and self.cpu.last_decoded_instruction['name'] in ['ADD', 'SUB', 'ADDI']: # Cập nhật ở đây
-            alu_out_value = self.cpu.calculate_alu_output()
-            self.diagram_text_items['ALU_OUT'].setPlainText(f"{alu_out_value}")
+        """
+        Làm mới giao diện theo tập thay đổi so với lần hiển thị trước (CPU.changes_since):
+        chỉ các ô RAM, thanh ghi và cờ đã đổi mới được cập nhật.
+        """
+        changes = self.cpu.changes_since(self.displayed_snapshot)
+        self.displayed_snapshot = self.cpu.snapshot()
+
+        # Cập nhật RAM table: chỉ các ô đã đổi
+        if changes.ram:
+            self.ram_model.update_cells(self.cpu.ram, changes.ram)
+        # Bảng Program RAM chỉ đổi khi nạp lệnh (chương trình bất biến khi chạy)
+        program = self.cpu.program
+        if program is not None and program != self.displayed_program:
+            self.program_model.update_cells(program, range(RAM_SIZE))
+        self.displayed_program = program
+        if program is not None and 'IAR' in changes.registers:
+            self.program_table.selectRow(self.cpu.iar)
+
+        # Cập nhật các label trong control panel và text item trên sơ đồ
+        registers = changes.registers
+        if 'A' in registers:
+            self.register_display_labels['A'].setText(f"Reg A: {self.cpu.reg_a} ({self.cpu.reg_a:08b})")
+            self.diagram_text_items['A'].setPlainText(f"A: {self.cpu.reg_a:08b}")
+        if 'B' in registers:
+            self.register_display_labels['B'].setText(f"Reg B: {self.cpu.reg_b} ({self.cpu.reg_b:08b})")
+            self.diagram_text_items['B'].setPlainText(f"B: {self.cpu.reg_b:08b}")
+        if 'IAR' in registers:
+            self.register_display_labels['IAR'].setText(f"IAR: {self.cpu.iar} ({self.cpu.iar:04b})")
+            self.diagram_text_items['IAR'].setPlainText(f"IAR: {self.cpu.iar:04b}")
+        if 'IR' in registers:
+            self.register_display_labels['IR_Opcode'].setText(f"IR (Opcode): {self.cpu.ir_opcode_bits}")
+            self.register_display_labels['IR_AddrData'].setText(f"IR (Addr/Data): {self.cpu.ir_addrdata_bits}")
+            self.diagram_text_items['IR_Opcode'].setPlainText(f"{self.cpu.ir_opcode_bits}")
+            self.diagram_text_items['IR_AddrData'].setPlainText(f"{self.cpu.ir_addrdata_bits}")
+
+        for flag_name, value in (('Z', self.cpu.flag_z), ('N', self.cpu.flag_n), ('O', self.cpu.flag_o)):
+            if flag_name in changes.flags:
+                flag_status = 'T' if value else 'F'
+                self.flags_display_labels[flag_name].setText(f"{flag_name}: {flag_status}")
+                self.diagram_text_items[f'{flag_name}_flag'].setPlainText(f"{flag_name}: {flag_status}")
+
+        # Chỉ cập nhật ALU_OUT khi có ALU ops (phụ thuộc lệnh đã giải mã, không nằm trong snapshot)
+        if self.cpu.last_decoded_instruction and self.cpu.last_decoded_instruction.name in ['ADD', 'SUB', 'ADDI']: # Cập nhật ở đây
+            alu_out_text = f"{self.cpu.calculate_alu_output()}"
         else:
-            self.diagram_text_items['ALU_OUT'].setPlainText("N/A")
-
-        self.diagram_text_items['Z_flag'].setPlainText(f"Z: {z_flag_status}")
-        self.diagram_text_items['N_flag'].setPlainText(f"N: {n_flag_status}")
-        self.diagram_text_items['O_flag'].setPlainText(f"O: {o_flag_status}")
+            alu_out_text = "N/A"
+        if alu_out_text != self.displayed_alu_out:
+            self.displayed_alu_out = alu_out_text
+            self.diagram_text_items['ALU_OUT'].setPlainText(alu_out_text)
         
-        for rect_item in self.diagram_rect_highlights.values():
-            rect_item.setPen(QPen(Qt.GlobalColor.transparent))
-            rect_item.setBrush(QBrush(Qt.GlobalColor.transparent))
+        for overlay in self.diagram_rect_highlights.values():
+            overlay.hide_highlight()
 
     def load_instruction_gui(self):
         try:
@@ -635,14 +953,136 @@ class CPUVisualizerApp(QMainWindow):
             
             # Sửa: Gọi hàm tải lệnh chuyên biệt để in ra output đúng
             self.cpu.load_instruction(address, full_instruction)
+            self.run_start_snapshot = None
+            self._clear_journal()
             self.update_gui_cpu_status()
-            QMessageBox.information(self, "Success", f"Loaded instruction '{full_instruction}' into RAM[{address}].")
+            self.statusBar().showMessage(f"Loaded instruction '{full_instruction}' into RAM[{address}].", STATUS_MESSAGE_MS)
 
         except ValueError as ve:
             QMessageBox.critical(self, "Input error", f"An error occurred: {ve}")
         except Exception as e:
             QMessageBox.critical(self, "Error", f"An unexpected error occurred: {e}")
 
+    def _parse_wide_address(self, text):
+        """Đọc địa chỉ (thập phân hoặc 0x hex) trong không gian địa chỉ của wide_cpu."""
+        address = int(text.strip(), 0)
+        size = len(self.wide_cpu.memory)
+        if not 0 <= address < size:
+            raise ValueError(f"Address must be between 0 and {size - 1}.")
+        return address
+
+    def change_wide_address_width(self, index):
+        self._stop_wide_run()
+        bits = self.wide_width_combo.currentData()
+        self.wide_cpu = WideCPU(bits)
+        self.wide_memory_model.set_memory(self.wide_cpu.memory)
+        self._update_wide_status()
+        print(f"Wide memory: {bits}-bit addresses, {len(self.wide_cpu.memory):,} cells.")
+
+    def load_wide_instruction_gui(self):
+        try:
+            address = self._parse_wide_address(self.wide_address_input.text())
+            name = self.wide_opcode_combo.currentData()
+            operand_text = self.wide_operand_input.text().strip() or "0"
+            encoded = encode_instruction(name, int(operand_text, 0), self.wide_cpu.address_bits)
+            if address + len(encoded) > len(self.wide_cpu.memory):
+                raise ValueError("Instruction does not fit before the end of memory.")
+            self.wide_cpu.load_program(encoded, address)
+        except ValueError as ve:
+            QMessageBox.warning(self, "Input error", f"{ve}")
+            return
+        print(f"Wide memory: loaded {name} ({encoded.hex(' ').upper()}) at {address:#x}.")
+        # Gợi ý địa chỉ kế tiếp để nạp chương trình liên tiếp
+        self.wide_address_input.setText(f"{address + len(encoded):#x}")
+        self._refresh_wide_view()
+
+    def load_wide_data_gui(self):
+        try:
+            address = self._parse_wide_address(self.wide_address_input.text())
+            value = int(self.wide_value_input.text().strip(), 0)
+            if not 0 <= value <= 255:
+                raise ValueError("Data value must be between 0 and 255.")
+        except ValueError as ve:
+            QMessageBox.warning(self, "Input error", f"{ve}")
+            return
+        self.wide_cpu.write_ram(address, value)
+        self._refresh_wide_view()
+
+    def run_wide_cpu(self):
+        """Bắt đầu (hoặc dừng) chạy wide_cpu theo lát thời gian, tối đa WIDE_RUN_LIMIT lệnh."""
+        if self.wide_run_timer.isActive():
+            self._finish_wide_run('stopped')
+            return
+        if self.wide_cpu.is_halted:
+            QMessageBox.information(self, "CPU Halted", "CPU is in a halted state. Please press 'Reset' to restart.")
+            return
+        self.wide_run_cycles = 0
+        self.wide_run_elapsed = 0.0
+        self.wide_run_button.setText("Stop")
+        for widget in (self.wide_load_instr_button, self.wide_load_data_button, self.wide_width_combo):
+            widget.setEnabled(False)
+        self.wide_run_timer.start()
+
+    def _run_wide_slice(self):
+        """Chạy các khối WIDE_SLICE_CYCLES lệnh tới khi hết WIDE_SLICE_MS, rồi làm mới bảng."""
+        deadline = time.perf_counter() + WIDE_SLICE_MS / 1000
+        while True:
+            result = self.wide_cpu.run(min(WIDE_SLICE_CYCLES, WIDE_RUN_LIMIT - self.wide_run_cycles))
+            self.wide_run_cycles += result['cycles']
+            self.wide_run_elapsed += result['elapsed']
+            if result['halted'] or self.wide_run_cycles >= WIDE_RUN_LIMIT:
+                self._finish_wide_run(result['status'])
+                return
+            if time.perf_counter() >= deadline:
+                break
+        self._refresh_wide_view()
+
+    def _finish_wide_run(self, status):
+        self._stop_wide_run()
+        cycles_per_sec = self.wide_run_cycles / self.wide_run_elapsed if self.wide_run_elapsed > 0 else 0.0
+        print(f"Wide CPU: {status} after {self.wide_run_cycles} cycles ({cycles_per_sec:,.0f} cycles/s).")
+        if status == 'max_cycles':
+            QMessageBox.information(self, "Cycle limit", f"The program did not halt within {WIDE_RUN_LIMIT:,} cycles. Press 'Run' to continue.")
+
+    def _stop_wide_run(self):
+        """Dừng timer chạy wide_cpu (nếu đang chạy) và trả các nút về trạng thái ban đầu."""
+        if not self.wide_run_timer.isActive():
+            return
+        self.wide_run_timer.stop()
+        self.wide_run_button.setText("Run")
+        for widget in (self.wide_load_instr_button, self.wide_load_data_button, self.wide_width_combo):
+            widget.setEnabled(True)
+        self._refresh_wide_view()
+
+    def reset_wide_cpu(self):
+        self._stop_wide_run()
+        self.wide_cpu.reset()
+        self._update_wide_status()
+
+    def goto_wide_address(self):
+        try:
+            address = self._parse_wide_address(self.wide_address_input.text())
+        except ValueError as ve:
+            QMessageBox.warning(self, "Input error", f"{ve}")
+            return
+        index = self.wide_memory_model.index(address, 0)
+        self.wide_memory_table.scrollTo(index, QTableView.ScrollHint.PositionAtTop)
+        self.wide_memory_table.selectRow(address)
+
+    def _refresh_wide_view(self):
+        """Chỉ làm mới các trang bộ nhớ đã bị ghi, rồi cập nhật dòng trạng thái."""
+        self.wide_memory_model.refresh_pages(self.wide_cpu.memory.take_dirty_pages())
+        self._update_wide_status()
+
+    def _update_wide_status(self):
+        cpu = self.wide_cpu
+        digits = (cpu.address_bits + 3) // 4
+        flags = ' '.join(f"{name}:{'T' if value else 'F'}" for name, value in
+                         (('Z', cpu.flag_z), ('N', cpu.flag_n), ('O', cpu.flag_o)))
+        self.wide_status_label.setText(
+            f"IAR: {cpu.iar:0{digits}X}  A: {cpu.reg_a}  B: {cpu.reg_b}  {flags}  "
+            f"Pages allocated: {len(cpu.memory.allocated_pages())}")
+
     def load_data_gui(self):
         try:
             address_str = self.data_address_input.text()
@@ -660,63 +1100,53 @@ class CPUVisualizerApp(QMainWindow):
             binary_value = f"{value:08b}"
             
         
-            self.cpu.write_ram(address, binary_value)
+            self.cpu.write_ram(address, value)
             print(f"Loaded data: RAM[{address}] = {binary_value} (Decimal: {value})")
+            self.run_start_snapshot = None
+            self._clear_journal()
             self.update_gui_cpu_status()
-            QMessageBox.information(self, "Success", f"Loaded data '{binary_value}' (Dec: {value}) into RAM[{address}].")
+            self.statusBar().showMessage(f"Loaded data '{binary_value}' (Dec: {value}) into RAM[{address}].", STATUS_MESSAGE_MS)
         except ValueError:
             QMessageBox.critical(self, "Input error", "Please enter valid address and value.")
         except Exception as e:
             QMessageBox.critical(self, "Error", f"An error occurred: {e}")
             
     def _clear_all_highlights_and_animations(self):
-        # Sửa: Trước hết dừng timer để không gọi _advance_cpu_phase
-        self.cpu_phase_timer.stop()
+        # Sửa: Trước hết hủy lần tiến pha đang chờ để không gọi _advance_cpu_phase hai lần
+        self.frame_scheduler.cancel('advance_phase')
         
         # Sửa: Gọi clear_animations để xóa các item animation, điều này sẽ trigger finished signal
         self.signal_animator.clear_animations()
         
         # Sửa: Clear highlights sau khi animations đã kết thúc
-        for rect_item in self.diagram_rect_highlights.values():
-            rect_item.setPen(QPen(Qt.GlobalColor.transparent))
-            rect_item.setBrush(QBrush(Qt.GlobalColor.transparent))
+        for component_key, overlay in self.diagram_rect_highlights.items():
+            self.frame_scheduler.cancel(('highlight', component_key))
+            overlay.hide_highlight()
 
     def highlight_component(self, component_key, color=Qt.GlobalColor.yellow, duration=200):
         if component_key in self.diagram_rect_highlights:
-            rect_item = self.diagram_rect_highlights[component_key]
-            
-            pen = QPen(color, 2)
-            brush_color = QColor(color)
-            brush_color.setAlpha(50)
-            brush = QBrush(brush_color)
-
-            rect_item.setPen(pen)
-            rect_item.setBrush(brush)
-            
-            QTimer.singleShot(duration, lambda: self._reset_single_highlight(component_key))
-        # Thêm xử lý highlight cho RAM table
-        elif component_key == 'RAM_TABLE_POS':
-            self.ram_group_box.setStyleSheet("QGroupBox { border: 2px solid red; }")
-            QTimer.singleShot(duration, lambda: self.ram_group_box.setStyleSheet("QGroupBox {}"))
-
+            # Overlay chỉ đổi opacity (và bút/chổi khi đổi màu), không phải vẽ lại widget nào
+            self.diagram_rect_highlights[component_key].show_highlight(color)
+            self.frame_scheduler.schedule(('highlight', component_key), duration,
+                                          lambda: self._reset_single_highlight(component_key))
 
     def _reset_single_highlight(self, component_key):
         if component_key in self.diagram_rect_highlights:
-            self.diagram_rect_highlights[component_key].setPen(QPen(Qt.GlobalColor.transparent))
-            self.diagram_rect_highlights[component_key].setBrush(QBrush(Qt.GlobalColor.transparent))
+            self.diagram_rect_highlights[component_key].hide_highlight()
 
     def _animate_signal(self, path_name, color=Qt.GlobalColor.red):
-        if path_name in SIGNAL_PATHS_ORIGINAL:
-            scaled_path = [p for p in SIGNAL_PATHS_ORIGINAL[path_name]]
+        if path_name in SIGNAL_ROUTES:
+            if self.cpu.harvard:
+                color = HARVARD_BUS_COLORS.get(SIGNAL_ROUTES[path_name].bus, color)
             # Sửa: gọi animate_path nhưng không gọi start_animation ở đây nữa
             # Việc start sẽ được thực hiện sau đó một cách có chủ đích
-            self.signal_animator.animate_path(scaled_path, color, duration=self.animation_step_duration)
+            self.signal_animator.animate_path(SIGNAL_ROUTES[path_name], color, duration=self.animation_step_duration)
         else:
             print(f"Error: Signal path '{path_name}' is not defined.")
             
     def _run_next_phase_after_delay(self, delay=50):
         # Thêm một chút delay để UI có thời gian cập nhật
-        QTimer.singleShot(delay, self._advance_cpu_phase)
+        self.frame_scheduler.schedule('advance_phase', delay, self._advance_cpu_phase)
 
     def _on_animation_finished(self):
         # Đây là callback được gọi khi animation kết thúc
@@ -738,15 +1168,23 @@ class CPUVisualizerApp(QMainWindow):
         if self.is_running_mode:
             # Nếu đang ở chế độ chạy, bấm nút để tạm dừng
             self.is_running_mode = False
+            self.loop_detector = None
             self.run_button.setText("Run")
+            self._report_frame_time(summary=True)
         else:
             # Nếu đang tạm dừng, bấm nút để chạy
+            self.view.reset_frame_stats()
             self.is_running_mode = True
             self.run_button.setText("Pause")
             self.step_button.setEnabled(False) # Vô hiệu hóa nút Step khi chạy
             self._advance_cpu_phase()
 
     def step_cpu(self):
+        if self.is_turbo_mode:
+            # Turbo đang tạm dừng: worker thực thi đúng một lệnh rồi công bố trạng thái
+            if self.is_turbo_paused:
+                self.turbo_step_requested.emit()
+            return
         if self.cpu.is_halted:
             QMessageBox.information(self, "CPU Halted", "CPU has halted. Please press 'Reset' to restart.")
             self.cpu_current_phase = 'IDLE'
@@ -779,11 +1217,16 @@ class CPUVisualizerApp(QMainWindow):
         print(f"Current Phase: {self.cpu_current_phase}")
 
         if self.cpu_current_phase == 'IDLE':
+            # Ranh giới giữa hai lệnh: kiểm tra trạng thái máy có lặp lại không
+            if self.is_running_mode and self._check_infinite_loop():
+                return
+            self._ensure_run_baseline()
             self.cpu_current_phase = 'FETCH'
             self._run_next_phase_after_delay()
             
         elif self.cpu_current_phase == 'FETCH':
             # 1. Fetch: Lấy lệnh từ RAM vào IR
+            self.instruction_address = self.cpu.iar
             self.cpu.fetch_instruction()
             self.update_gui_cpu_status()
             self.highlight_component('IAR', Qt.GlobalColor.red)
@@ -805,7 +1248,7 @@ class CPUVisualizerApp(QMainWindow):
         elif self.cpu_current_phase == 'EXECUTE':
             # 3. Execute: Thực thi lệnh
             decoded_instruction = self.cpu.last_decoded_instruction
-            op_name = decoded_instruction['name']
+            op_name = decoded_instruction.name
             
             # Thực thi lệnh ngay lập tức, trước khi chuyển pha
             self.cpu.execute_instruction()
@@ -833,7 +1276,7 @@ class CPUVisualizerApp(QMainWindow):
 
             elif op_name in ['LOAD_A', 'LOAD_B', 'STORE_A', 'STORE_B']:
                 self.highlight_component('IR', Qt.GlobalColor.green)
-                self.highlight_component('RAM_TABLE_POS', Qt.GlobalColor.red)
+                self.highlight_component('RAM', Qt.GlobalColor.red)
                 # Animation từ IAR_TO_RAM_ADDR_BUS đã diễn ra ở FETCH
                 # Animate đường data từ/đến RAM
                 if op_name in ['LOAD_A', 'LOAD_B']:
@@ -856,10 +1299,10 @@ class CPUVisualizerApp(QMainWindow):
                 # Kiểm tra điều kiện JUMP sau khi lệnh đã được thực thi
                 # (Lệnh execute_instruction() đã thay đổi IAR nếu điều kiện thỏa mãn)
                 self.highlight_component('IR', Qt.GlobalColor.yellow)
-                if (op_name == 'JUMP_NEG' and self.cpu.flags['N']) or \
-                   (op_name == 'JUMP_ZERO' and self.cpu.flags['Z']):
+                if (op_name == 'JUMP_NEG' and self.cpu.flag_n) or \
+                   (op_name == 'JUMP_ZERO' and self.cpu.flag_z):
                     # Nếu JUMP thành công, thực hiện animation và chuyển pha
-                    print(f"JUMP_NEG/ZERO: Condition met, jumping to {self.cpu.registers['IAR']}")
+                    print(f"JUMP_NEG/ZERO: Condition met, jumping to {self.cpu.iar}")
                     self._animate_signal('ADDR_TO_IAR_JUMP', Qt.GlobalColor.red)
                     self.is_animating = True
                     self.signal_animator.start_animation()
@@ -872,6 +1315,9 @@ class CPUVisualizerApp(QMainWindow):
 
             elif op_name == 'HALT':
                 self.highlight_component('CONTROL_UNIT', Qt.GlobalColor.red)
+                self._record_instruction()
+                if self.is_running_mode:
+                    self._report_frame_time(summary=True)
                 self.is_running_mode = False
                 self.run_button.setEnabled(True)
                 self.step_button.setEnabled(True)
@@ -879,6 +1325,13 @@ class CPUVisualizerApp(QMainWindow):
                 QMessageBox.information(self, "CPU Halted", "CPU has stopped. Please press 'Reset' to restart.")
                 return
 
+            elif op_name == 'UNKNOWN':
+                # Opcode lạ đã dừng CPU: lần gọi sau dừng ở kiểm tra is_halted, không tới INCREMENT_IAR,
+                # nên ghi lệnh vào nhật ký/trace ngay tại đây
+                self._record_instruction()
+                self.cpu_current_phase = 'INCREMENT_IAR'
+                self._run_next_phase_after_delay()
+
             else: # NOP, hoặc các lệnh không cần animation đặc biệt
                 self.cpu_current_phase = 'INCREMENT_IAR'
                 self._run_next_phase_after_delay()
@@ -893,6 +1346,9 @@ class CPUVisualizerApp(QMainWindow):
 
         # SỬA CHỮA LỖI NÀY: Pha JUMP_DONE không cần thực thi lại lệnh
         elif self.cpu_current_phase == 'JUMP_DONE':
+            # Hoàn tất chu kỳ nhảy: xóa cờ jump_occurred để lệnh kế tiếp tăng IAR bình thường
+            self.cpu.increment_iar()
+            self._record_instruction()
             self.update_gui_cpu_status()
             self.highlight_component('IAR', Qt.GlobalColor.blue)
             self.is_animating = True
@@ -901,14 +1357,15 @@ class CPUVisualizerApp(QMainWindow):
 
         elif self.cpu_current_phase == 'INCREMENT_IAR':
             # Tăng IAR nếu cần
-            op_name = self.cpu.last_decoded_instruction['name']
+            op_name = self.cpu.last_decoded_instruction.name
             
             # SỬA CHỮA LỖI NÀY: Kiểm tra điều kiện chính xác để tăng IAR
             # Chỉ tăng IAR nếu IAR chưa bị thay đổi bởi lệnh JUMP thành công
             if not (op_name == 'JUMP' or \
-                    (op_name == 'JUMP_NEG' and self.cpu.flags['N']) or \
-                    (op_name == 'JUMP_ZERO' and self.cpu.flags['Z'])):
+                    (op_name == 'JUMP_NEG' and self.cpu.flag_n) or \
+                    (op_name == 'JUMP_ZERO' and self.cpu.flag_z)):
                 self.cpu.increment_iar()
+            self._record_instruction()
             
             self.update_gui_cpu_status()
             self.highlight_component('IAR', Qt.GlobalColor.yellow)
@@ -917,8 +1374,396 @@ class CPUVisualizerApp(QMainWindow):
             self.cpu_current_phase = 'IDLE'
 
 
+    def _check_infinite_loop(self):
+        """Dừng chế độ Run nếu trạng thái máy lặp lại (chương trình không bao giờ HALT)."""
+        if self.loop_detector is None:
+            self.loop_detector = LoopDetector(self.cpu.state_key())
+            return False
+        period = self.loop_detector.update(self.cpu.state_key())
+        if not period:
+            return False
+        self.loop_detector = None
+        self.is_running_mode = False
+        self.run_button.setText("Run")
+        self.run_button.setEnabled(True)
+        self.step_button.setEnabled(True)
+        print(f"Infinite loop detected: machine state repeats every {period} instruction(s).")
+        QMessageBox.information(self, "Infinite Loop", f"The program never halts: the machine state repeats every {period} instruction(s).")
+        return True
+
+    def _ensure_run_baseline(self):
+        """Chụp trạng thái ban đầu (cho Reset) và mở nhật ký trước lệnh đầu tiên."""
+        if self.run_start_snapshot is None:
+            self.run_start_snapshot = self.cpu.snapshot()
+        if self.journal is None:
+            self.journal = ExecutionJournal(self.cpu)
+
+    def turbo_run_cpu(self):
+        """Bật/tắt chế độ Turbo: CPU chạy với tốc độ tối đa trên luồng worker, bỏ qua animation."""
+        if self.is_turbo_mode:
+            self.turbo_stop_requested.emit()
+            return
+        if self.cpu.is_halted:
+            QMessageBox.information(self, "CPU Halted", "CPU is in a halted state. Please press 'Reset' to restart.")
+            return
+        # Dừng chế độ Run thường và bỏ phần dang dở của lệnh hiện tại
+        self.is_running_mode = False
+        self.loop_detector = None
+        self._clear_all_highlights_and_animations()
+        self.is_animating = False
+        if self.cpu_current_phase != 'IDLE' and self.journal is not None:
+            self.journal.seek(self.journal.position)
+        self.cpu_current_phase = 'IDLE'
+        self._ensure_run_baseline()
+
+        self.is_turbo_mode = True
+        self.turbo_run_id += 1
+        self.turbo_button.setText("Stop")
+        self.run_button.setText("Run")
+        self._set_turbo_controls_enabled(False)
+        self.view.reset_frame_stats()
+        print("Turbo run started.")
+        # Worker nhận bản sao trạng thái; self.cpu chỉ còn là bản hiển thị cho tới khi worker dừng
+        # Nhật ký chỉ nhận keyframe trong Turbo (Step Back dựng lại phần còn lại khi cần);
+        # chỉ bộ ghi trace cần observer cho từng lệnh
+        observers = [self.trace_recorder.observe] if self.trace_recorder is not None else []
+        self.turbo_start_requested.emit(self.cpu.snapshot(), observers, self.turbo_run_id, self.cpu.program, self.journal)
+
+    def toggle_turbo_pause(self):
+        """Tạm dừng/tiếp tục Turbo; khi tạm dừng, nút Step thực thi từng lệnh trên worker."""
+        if not self.is_turbo_mode:
+            return
+        self.is_turbo_paused = not self.is_turbo_paused
+        if self.is_turbo_paused:
+            self.turbo_pause_requested.emit()
+            self.speed_label.setText("Speed: paused")
+        else:
+            self.turbo_resume_requested.emit()
+        self.turbo_pause_button.setText("Resume" if self.is_turbo_paused else "Pause")
+        self.step_button.setEnabled(self.is_turbo_paused)
+
+    def _set_turbo_controls_enabled(self, enabled):
+        for button in (self.run_button, self.step_button, self.step_back_button, self.seek_button,
+                       self.record_trace_button):
+            button.setEnabled(enabled)
+        # Nút Pause chỉ dùng được khi Turbo đang chạy
+        self.is_turbo_paused = False
+        self.turbo_pause_button.setText("Pause")
+        self.turbo_pause_button.setEnabled(not enabled)
+
+    def _on_worker_state(self, snapshot, info):
+        """Nhận snapshot do worker công bố (tối đa PUBLISH_HZ lần mỗi giây) và làm mới giao diện."""
+        if not self.is_turbo_mode or info['run_id'] != self.turbo_run_id:
+            return
+        self.cpu.restore(snapshot)
+        if not self.is_turbo_paused:
+            self.speed_label.setText(f"Speed: {info['cycles_per_sec']:,.0f} cycles/s")
+        self.update_gui_cpu_status()
+        self._report_frame_time()
+
+    def _on_worker_stopped(self, snapshot, result):
+        if not self.is_turbo_mode or result['run_id'] != self.turbo_run_id:
+            return  # Lần chạy đã bị hủy bởi Reset
+        self.is_turbo_mode = False
+        self.cpu.restore(snapshot)
+        self.update_gui_cpu_status()
+        self.seek_cycle_input.setRange(self.journal.base_cycle, self.journal.cycle)
+        self.seek_cycle_input.setValue(self.journal.position)
+        self.turbo_button.setText("Turbo")
+        self._set_turbo_controls_enabled(True)
+        print(f"Turbo run stopped after {result['cycles']} cycles.")
+        self._report_frame_time(summary=True)
+        if result['status'] == 'loop':
+            QMessageBox.information(self, "Infinite Loop", f"The program never halts: the machine state repeats every {result['loop_period']} instruction(s).")
+        elif result['status'] != 'stopped':
+            QMessageBox.information(self, "CPU Halted", "CPU has stopped. Please press 'Reset' to restart.")
+
+    def _cancel_turbo(self):
+        """Hủy lần chạy Turbo đang diễn ra; các tín hiệu còn tồn của nó sẽ bị bỏ qua."""
+        if not self.is_turbo_mode:
+            return
+        self.is_turbo_mode = False
+        self.turbo_run_id += 1
+        self.turbo_stop_requested.emit()
+        self.turbo_button.setText("Turbo")
+        self._set_turbo_controls_enabled(True)
+
+    def closeEvent(self, event):
+        self.wide_run_timer.stop()
+        self.turbo_stop_requested.emit()
+        self.cpu_thread.quit()
+        self.cpu_thread.wait()
+        if self.trace_recorder is not None:
+            self.trace_recorder.close()
+            self.trace_recorder = None
+        if self.program_library is not None:
+            self.library_model.set_library(None)
+            self.program_library.close()
+            self.program_library = None
+        self.log_sink.emit_pending()
+        self.log_sink.stop_spill()
+        super().closeEvent(event)
+
+    def _append_terminal_text(self, text):
+        """Chèn một lô log vào cuối terminal (các dòng cũ bị bỏ khi vượt TERMINAL_MAX_LINES)."""
+        self.terminal_output.moveCursor(QTextCursor.MoveOperation.End)
+        self.terminal_output.insertPlainText(text)
+        self.terminal_output.ensureCursorVisible()
+
+    def toggle_log_file(self):
+        """Bật/tắt ghi toàn bộ log ra file."""
+        if self.log_sink.spill_file is not None:
+            self.log_sink.stop_spill()
+            self.log_to_file_button.setText("Log to File...")
+            return
+        path, _ = QFileDialog.getSaveFileName(self, "Save full log", "cpu_trace.log", "Log files (*.log *.txt);;All files (*)")
+        if not path:
+            return
+        try:
+            self.log_sink.start_spill(path)
+        except OSError as e:
+            QMessageBox.critical(self, "Error", f"Could not open log file: {e}")
+            return
+        self.log_to_file_button.setText("Stop Logging")
+        print(f"Logging full output to {path}")
+
+    def toggle_trace_recording(self):
+        """Bật/tắt ghi trace nhị phân theo cột (mỗi cột một file .npy) vào một thư mục."""
+        if self.trace_recorder is not None:
+            recorder, self.trace_recorder = self.trace_recorder, None
+            recorder.close()
+            self.record_trace_button.setText("Record Trace...")
+            print(f"Trace saved: {recorder.cycle} cycles in {recorder.directory}")
+            return
+        directory = QFileDialog.getExistingDirectory(self, "Choose trace directory")
+        if not directory:
+            return
+        try:
+            self.trace_recorder = TraceRecorder(directory)
+        except OSError as e:
+            QMessageBox.critical(self, "Error", f"Could not create trace files: {e}")
+            return
+        self.record_trace_button.setText("Stop Trace")
+        print(f"Recording trace to {directory}")
+
+    def _record_instruction(self):
+        """Ghi lệnh vừa hoàn tất vào nhật ký (và trace nếu đang ghi), cập nhật ô chọn chu kỳ."""
+        if self.trace_recorder is not None:
+            self.trace_recorder.record(self.cpu, self.instruction_address)
+        if self.journal is None:
+            return
+        self.journal.record()
+        self.seek_cycle_input.setRange(self.journal.base_cycle, self.journal.cycle)
+        self.seek_cycle_input.setValue(self.journal.position)
+        if self.is_running_mode:
+            self._report_frame_time()
+
+    def _report_frame_time(self, summary=False):
+        """Hiển thị thời gian vẽ sơ đồ (ms/khung hình); summary=True thì in thêm tổng kết ra terminal."""
+        stats = self.view.frame_stats()
+        self.frame_time_label.setText(f"Frame: {stats['avg_ms']:.2f} ms avg, {stats['max_ms']:.2f} ms max")
+        if summary:
+            print(f"Diagram frame time: {stats['avg_ms']:.2f} ms avg, {stats['max_ms']:.2f} ms max over the last frames ({stats['frames']} frames painted).")
+
+    def _clear_journal(self):
+        self.journal = None
+        self.seek_cycle_input.setRange(0, 0)
+
+    def _can_rewind(self):
+        if self.is_running_mode or self.is_animating:
+            QMessageBox.information(self, "Busy", "Pause the CPU and wait for the animation to finish first.")
+            return False
+        if self.journal is None:
+            QMessageBox.information(self, "No history", "No instruction has been executed yet.")
+            return False
+        return True
+
+    def _seek_journal(self, cycle):
+        """Đưa CPU về trạng thái sau đúng cycle lệnh (hủy pha đang dở của lệnh hiện tại)."""
+        self._clear_all_highlights_and_animations()
+        self.journal.seek(cycle)
+        self.cpu_current_phase = 'IDLE'
+        self.seek_cycle_input.setValue(self.journal.position)
+        self.update_gui_cpu_status()
+        self.highlight_component('IAR', Qt.GlobalColor.yellow)
+        self.run_button.setEnabled(True)
+        self.step_button.setEnabled(True)
+        print(f"Rewound to cycle {self.journal.position} (IAR = {self.cpu.iar}).")
+
+    def step_back_cpu(self):
+        if not self._can_rewind():
+            return
+        # Đang giữa chừng một lệnh: quay về đầu lệnh đó; ngược lại lùi một lệnh
+        target = self.journal.position
+        if self.cpu_current_phase == 'IDLE':
+            target -= 1
+        if target < self.journal.base_cycle:
+            QMessageBox.information(self, "No history", "There is no earlier cycle to go back to.")
+            return
+        self._seek_journal(target)
+
+    def seek_cycle_gui(self):
+        if not self._can_rewind():
+            return
+        self._seek_journal(self.seek_cycle_input.value())
+
+    def _stop_execution(self):
+        """Dừng mọi chế độ chạy và bỏ lịch sử trước khi thay bộ nhớ (đổi chế độ, nạp chương trình)."""
+        self._cancel_turbo()
+        self._clear_all_highlights_and_animations()
+        self.frame_scheduler.cancel_all()
+        self.is_running_mode = False
+        self.is_animating = False
+        self.loop_detector = None
+        self.cpu_current_phase = 'IDLE'
+        self.run_button.setText("Run")
+        self.run_button.setEnabled(True)
+        self.step_button.setEnabled(True)
+        self.run_start_snapshot = None
+        self._clear_journal()
+
+    def open_image_gui(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Open memory image", "", FILE_FILTER)
+        if path:
+            self.load_image_file(path)
+
+    def save_image_gui(self):
+        """Lưu RAM (chế độ Harvard: Program RAM) ra file; định dạng theo phần mở rộng."""
+        path, _ = QFileDialog.getSaveFileName(self, "Save memory image", "program.bin", FILE_FILTER)
+        if not path:
+            return
+        image = self.cpu.program if self.cpu.harvard else self.cpu.ram
+        try:
+            write_image(path, image)
+        except OSError as e:
+            QMessageBox.critical(self, "Error", f"Could not save memory image: {e}")
+            return
+        self.statusBar().showMessage(f"Saved {len(image)} bytes to {path}", STATUS_MESSAGE_MS)
+        print(f"Saved memory image to {path}")
+
+    def _on_image_files_dropped(self, paths):
+        self.load_image_file(paths[0])
+
+    def load_image_file(self, path):
+        """
+        Kiểm tra cả file trước, rồi nạp bằng một lần chép (CPU.load_image) và làm mới giao diện
+        một lần. File lỗi không làm thay đổi RAM.
+        """
+        try:
+            offset, image = read_image(path, RAM_SIZE)
+        except (OSError, ImageFormatError) as e:
+            QMessageBox.warning(self, "Invalid memory image", f"{path}: {e}")
+            return
+        self._stop_execution()
+        self.cpu.load_image(image, offset)
+        self.cpu.reset()
+        self.update_gui_cpu_status()
+        self.statusBar().showMessage(f"Loaded {len(image)} bytes at RAM[{offset}] from {path}", STATUS_MESSAGE_MS)
+        print(f"Loaded memory image: {len(image)} bytes at RAM[{offset}] from {path}")
+
+    def open_library_gui(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Open program library", "", LIBRARY_FILE_FILTER)
+        if path:
+            self.open_library(path)
+
+    def open_library(self, path):
+        try:
+            library = ProgramLibrary(path)
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "Invalid library", f"{path}: {e}")
+            return
+        self.library_model.set_library(None)
+        if self.program_library is not None:
+            self.program_library.close()
+        self.program_library = library
+        self.library_model.set_library(library, self.library_search_input.text())
+        self._update_library_status()
+        print(f"Opened program library {path} ({len(library):,} programs)")
+
+    def filter_library_gui(self, text):
+        if self.program_library is not None:
+            self.library_model.set_filter(text)
+            self._update_library_status()
+
+    def _update_library_status(self):
+        self.library_status_label.setText(
+            f"{self.library_model.rowCount():,} of {len(self.program_library):,} programs")
+
+    def load_library_program_gui(self, index):
+        """Nạp chương trình được chọn thẳng từ vùng mmap vào RAM (phần RAM còn lại được xóa về 0)."""
+        if self.program_library is None or not index.isValid():
+            return
+        number = self.library_model.program_index(index.row())
+        name = self.program_library.names[number]
+        program = self.program_library.program(number)
+        try:
+            if len(program) > RAM_SIZE:
+                QMessageBox.warning(self, "Program too large", f"'{name}' is {len(program)} bytes, RAM has only {RAM_SIZE} cells.")
+                return
+            self._stop_execution()
+            self.cpu.load_image(program if len(program) == RAM_SIZE else bytes(program).ljust(RAM_SIZE, b'\0'))
+        finally:
+            program.release()
+        self.cpu.reset()
+        self.update_gui_cpu_status()
+        self.statusBar().showMessage(f"Loaded '{name}' from library.", STATUS_MESSAGE_MS)
+        print(f"Loaded library program '{name}' ({self.program_library.digest(number)})")
+
+    def assemble_and_load_gui(self):
+        source = self.asm_editor.toPlainText()
+        try:
+            program = assemble_cached(source)
+        except AssemblyError as e:
+            # Đưa con trỏ tới dòng lỗi
+            block = self.asm_editor.document().findBlockByNumber(e.line - 1)
+            if block.isValid():
+                cursor = QTextCursor(block)
+                cursor.select(QTextCursor.SelectionType.LineUnderCursor)
+                self.asm_editor.setTextCursor(cursor)
+            QMessageBox.warning(self, "Assembly error", str(e))
+            return
+        self._stop_execution()
+        # Cả chương trình thay thế toàn bộ RAM: một lần chép, một lần làm mới giao diện
+        self.cpu.load_image(program.image + bytes(RAM_SIZE - len(program.image)))
+        self.cpu.reset()
+        self.update_gui_cpu_status()
+        source_note = "from cache" if program.cached else "assembled"
+        self.asm_status_label.setText(f"{len(program.image)} bytes {source_note}, {len(program.labels)} labels, hash {program.digest[:12]}")
+        print(f"Loaded program: {len(program.image)} bytes ({source_note}).")
+
+    def disassemble_ram_gui(self):
+        code = self.cpu.program if self.cpu.harvard else self.cpu.ram
+        self.asm_editor.setPlainText(disassemble(bytes(code).rstrip(b'\0')))
+        self.asm_status_label.setText("Disassembled from Program RAM." if self.cpu.harvard else "Disassembled from RAM.")
+
+    def toggle_harvard_mode(self, enabled):
+        """
+        Bật: nội dung RAM hiện tại trở thành Program RAM (bất biến khi chạy) và cũng là giá trị
+        ban đầu của Data RAM. Tắt: Data RAM trở thành RAM dùng chung.
+        """
+        self._stop_execution()
+        if enabled:
+            self.cpu.load_program(self.cpu.ram)
+        else:
+            self.cpu.unload_program()
+        for widget in (self.program_label, self.program_table, self.data_label):
+            widget.setVisible(enabled)
+        self.ram_group_box.setTitle("RAM (Harvard)" if enabled else "RAM (Instruction/Data)")
+        self.update_gui_cpu_status()
+        print("Harvard mode enabled: instructions are fetched from Program RAM, STORE writes Data RAM only." if enabled
+              else "Harvard mode disabled: instructions and data share one RAM.")
+
     def reset_cpu(self):
+        self._cancel_turbo()
         self._clear_all_highlights_and_animations()
+        # Hủy mọi hiệu ứng còn hẹn giờ để không có gì kích hoạt muộn sau khi Reset
+        self.frame_scheduler.cancel_all()
+        self.loop_detector = None
+        if self.run_start_snapshot is not None:
+            # Khôi phục RAM về trạng thái trước khi chạy (hoàn tác các lệnh STORE)
+            self.cpu.restore(self.run_start_snapshot)
+            self.run_start_snapshot = None
+        self._clear_journal()
         self.cpu.reset()
         self.update_gui_cpu_status()
         self.cpu_current_phase = 'IDLE'
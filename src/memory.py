@@ -0,0 +1,111 @@
+PAGE_SIZE = 256  # Mỗi trang 256 byte, chỉ được cấp phát khi có lần ghi đầu tiên
+_PAGE_SHIFT = 8
+_PAGE_MASK = PAGE_SIZE - 1
+
+# Độ rộng địa chỉ hợp lệ: 4 bit (máy 16 ô gốc) tới 16 bit (64 KiB)
+MIN_ADDRESS_BITS = 4
+MAX_ADDRESS_BITS = 16
+ADDRESS_WIDTHS = (8, 12, 16)  # Các lựa chọn hiển thị trên giao diện
+
+
+def extension_bytes(address_bits):
+    """
+    Số byte mở rộng theo sau byte lệnh có toán hạng địa chỉ: 4 bit thấp của byte lệnh
+    là 4 bit thấp của địa chỉ, các byte mở rộng (little-endian) chứa phần còn lại.
+    Với địa chỉ 4 bit không cần byte mở rộng nào (đúng mã hóa 8 bit gốc).
+    """
+    return max(0, -(-(address_bits - 4) // 8))
+
+
+class PagedMemory:
+    """
+    Bộ nhớ thưa có bảng trang: không gian 2**address_bits byte được chia thành các trang
+    PAGE_SIZE byte, trang chỉ được cấp phát khi có lần ghi giá trị khác 0 đầu tiên; đọc ô
+    thuộc trang chưa cấp phát trả về 0. Giao diện giống bytearray (len, [], gán) nên có thể
+    dùng ở mọi chỗ đang đọc/ghi cpu.ram theo chỉ số.
+
+    dirty_pages ghi lại các trang đã bị ghi kể từ lần take_dirty_pages() gần nhất, để giao diện
+    chỉ làm mới phần bộ nhớ đã đổi.
+    """
+    __slots__ = ('address_bits', 'size', '_pages', 'dirty_pages')
+
+    def __init__(self, address_bits=16):
+        if not MIN_ADDRESS_BITS <= address_bits <= MAX_ADDRESS_BITS:
+            raise ValueError(f"Address width must be between {MIN_ADDRESS_BITS} and {MAX_ADDRESS_BITS} bits. Received: {address_bits}")
+        self.address_bits = address_bits
+        self.size = 1 << address_bits
+        self._pages = {}  # số trang -> bytearray(PAGE_SIZE)
+        self.dirty_pages = set()
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, address):
+        if not 0 <= address < self.size:
+            raise IndexError(f"Memory address out of range: {address}")
+        page = self._pages.get(address >> _PAGE_SHIFT)
+        return page[address & _PAGE_MASK] if page is not None else 0
+
+    def __setitem__(self, address, value):
+        if not 0 <= address < self.size:
+            raise IndexError(f"Memory address out of range: {address}")
+        number = address >> _PAGE_SHIFT
+        page = self._pages.get(number)
+        if page is None:
+            if value == 0:
+                return  # Ghi 0 vào trang chưa có: không cần cấp phát
+            page = self._pages[number] = bytearray(PAGE_SIZE)
+        page[address & _PAGE_MASK] = value
+        self.dirty_pages.add(number)
+
+    def read(self, start, length):
+        """Đọc length byte liên tiếp từ start thành bytes (các trang chưa cấp phát đọc ra 0)."""
+        if length < 0 or not 0 <= start <= self.size - length:
+            raise IndexError(f"Memory range out of bounds: {start}+{length}")
+        out = bytearray(length)
+        position = 0
+        while position < length:
+            address = start + position
+            offset = address & _PAGE_MASK
+            count = min(PAGE_SIZE - offset, length - position)
+            page = self._pages.get(address >> _PAGE_SHIFT)
+            if page is not None:
+                out[position:position + count] = page[offset:offset + count]
+            position += count
+        return bytes(out)
+
+    def load(self, data, offset=0):
+        """Chép data vào bộ nhớ từ offset theo từng trang (nhanh hơn gán từng ô)."""
+        if not 0 <= offset <= self.size - len(data):
+            raise ValueError(f"Image of {len(data)} bytes at offset {offset} does not fit in {self.size} bytes of memory.")
+        position = 0
+        while position < len(data):
+            address = offset + position
+            number = address >> _PAGE_SHIFT
+            start = address & _PAGE_MASK
+            count = min(PAGE_SIZE - start, len(data) - position)
+            chunk = data[position:position + count]
+            page = self._pages.get(number)
+            if page is None:
+                if not any(chunk):
+                    position += count
+                    continue
+                page = self._pages[number] = bytearray(PAGE_SIZE)
+            page[start:start + count] = chunk
+            self.dirty_pages.add(number)
+            position += count
+
+    def allocated_pages(self):
+        """Danh sách số trang đã được cấp phát, tăng dần."""
+        return sorted(self._pages)
+
+    def take_dirty_pages(self):
+        """Trả về và xóa tập các trang đã bị ghi từ lần gọi trước."""
+        pages = self.dirty_pages
+        self.dirty_pages = set()
+        return pages
+
+    def clear(self):
+        """Giải phóng mọi trang (toàn bộ bộ nhớ trở về 0)."""
+        self.dirty_pages.update(self._pages)
+        self._pages.clear()
@@ -0,0 +1,200 @@
+"""
+Thư viện chương trình: hàng chục nghìn ảnh RAM nhỏ gom trong một file duy nhất, đọc bằng mmap.
+
+    python -m src.program_library build programs/ -o programs.cpl
+    python -m src.program_library list programs.cpl --search loop
+
+Bố cục file (little-endian):
+
+    header   magic 'CPLB', phiên bản, kích thước bản ghi, số chương trình, vị trí chỉ mục
+    bản ghi  count x record_size byte, mỗi chương trình được đệm 0 tới record_size
+    chỉ mục  count mục cố định (vị trí tên, độ dài tên, độ dài chương trình, mã băm 16 byte)
+    tên      các tên UTF-8 nối liền
+
+ProgramLibrary.program(i) trả về memoryview trỏ thẳng vào vùng mmap (không chép), có thể
+đưa trực tiếp cho CPU.load_image(). Module này không import PyQt6.
+"""
+import argparse
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from pathlib import Path
+
+LIBRARY_MAGIC = b'CPLB'
+LIBRARY_VERSION = 1
+DEFAULT_RECORD_SIZE = 32
+LIBRARY_FILE_FILTER = "Program libraries (*.cpl);;All files (*)"
+_HEADER = struct.Struct('<4sHHIQ')     # magic, phiên bản, kích thước bản ghi, số chương trình, vị trí chỉ mục
+_INDEX_ENTRY = struct.Struct('<IHH16s')  # vị trí tên, độ dài tên, độ dài chương trình, mã băm
+_DIGEST_SIZE = 16
+
+
+def program_digest(image):
+    """Mã băm nội dung chương trình (BLAKE2b 16 byte, dạng hex) dùng trong chỉ mục."""
+    return hashlib.blake2b(image, digest_size=_DIGEST_SIZE).hexdigest()
+
+
+def write_library(path, programs, record_size=DEFAULT_RECORD_SIZE):
+    """
+    Ghi thư viện từ iterable (tên, bytes). Tên phải duy nhất, mỗi chương trình tối đa
+    record_size byte. Ghi ra file tạm rồi đổi tên. Trả về số chương trình đã ghi.
+    """
+    records = bytearray()
+    index = bytearray()
+    names = bytearray()
+    seen = set()
+    count = 0
+    for name, image in programs:
+        if name in seen:
+            raise ValueError(f"Duplicate program name: {name}")
+        if len(image) > record_size:
+            raise ValueError(f"Program '{name}' is {len(image)} bytes, records hold only {record_size}.")
+        seen.add(name)
+        encoded = name.encode('utf-8')
+        index += _INDEX_ENTRY.pack(len(names), len(encoded), len(image), bytes.fromhex(program_digest(image)))
+        names += encoded
+        records += image
+        records += bytes(record_size - len(image))
+        count += 1
+    path = Path(path)
+    temp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(temp, 'wb') as f:
+        f.write(_HEADER.pack(LIBRARY_MAGIC, LIBRARY_VERSION, record_size, count, _HEADER.size + len(records)))
+        f.write(records)
+        f.write(index)
+        f.write(names)
+    os.replace(temp, path)
+    return count
+
+
+class ProgramLibrary:
+    """
+    Thư viện chương trình chỉ đọc trên mmap. Tên và mã băm được đọc một lần khi mở
+    (tìm theo tên/mã băm là tra dict); dữ liệu chương trình không bao giờ được chép.
+
+    Các memoryview trả về từ program() phải được giải phóng trước close() (BufferError nếu không).
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        with open(self.path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._view = memoryview(self._mmap)
+            self._load_index()
+        except Exception:
+            self.close()
+            raise
+
+    def _load_index(self):
+        view = self._view
+        if len(view) < _HEADER.size:
+            raise ValueError("File is too short to be a program library.")
+        magic, version, self.record_size, count, index_offset = _HEADER.unpack_from(view)
+        if magic != LIBRARY_MAGIC or version != LIBRARY_VERSION:
+            raise ValueError("Not a program library (bad magic or version).")
+        names_offset = index_offset + count * _INDEX_ENTRY.size
+        if index_offset != _HEADER.size + count * self.record_size or names_offset > len(view):
+            raise ValueError("Program library is truncated or corrupt.")
+        names_blob = bytes(view[names_offset:])
+        self._lengths = []
+        self._digests = []
+        self.names = []
+        for name_offset, name_length, length, digest in _INDEX_ENTRY.iter_unpack(view[index_offset:names_offset]):
+            if length > self.record_size or name_offset + name_length > len(names_blob):
+                raise ValueError("Program library index is corrupt.")
+            self.names.append(names_blob[name_offset:name_offset + name_length].decode('utf-8'))
+            self._lengths.append(length)
+            self._digests.append(digest.hex())
+        self._by_name = {name: i for i, name in enumerate(self.names)}
+        self._by_digest = {}
+        for i, digest in enumerate(self._digests):
+            self._by_digest.setdefault(digest, i)
+        self._search_keys = [name.lower() for name in self.names]
+
+    def __len__(self):
+        return len(self.names)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._mmap is None:
+            return
+        self._view.release()
+        self._mmap.close()
+        self._mmap = None
+
+    def program(self, index):
+        """Chương trình thứ index dưới dạng memoryview chỉ đọc (không chép)."""
+        start = _HEADER.size + index * self.record_size
+        return self._view[start:start + self._lengths[index]]
+
+    def digest(self, index):
+        return self._digests[index]
+
+    def find(self, name):
+        """Chỉ số của chương trình theo tên, hoặc None."""
+        return self._by_name.get(name)
+
+    def find_digest(self, digest):
+        """Chỉ số của chương trình đầu tiên có mã băm digest (hex), hoặc None."""
+        return self._by_digest.get(digest.lower())
+
+    def search(self, text):
+        """Chỉ số các chương trình có tên chứa text (không phân biệt hoa thường) hoặc mã băm bắt đầu bằng text."""
+        text = text.strip().lower()
+        if not text:
+            return list(range(len(self.names)))
+        digests = self._digests
+        return [i for i, key in enumerate(self._search_keys) if text in key or digests[i].startswith(text)]
+
+    def __iter__(self):
+        """Duyệt (tên, memoryview) theo thứ tự trong file."""
+        for index, name in enumerate(self.names):
+            yield name, self.program(index)
+
+
+def _read_directory(directory, pattern):
+    for path in sorted(Path(directory).glob(pattern)):
+        yield path.name, path.read_bytes()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m src.program_library', description="Build or inspect a program library.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help="Pack a directory of raw images into one library file")
+    build.add_argument('directory', help="Directory containing program images")
+    build.add_argument('--pattern', default='*.bin', help="Glob pattern for image files (default: *.bin)")
+    build.add_argument('--record-size', type=int, default=DEFAULT_RECORD_SIZE,
+                       help=f"Bytes reserved per program (default: {DEFAULT_RECORD_SIZE})")
+    build.add_argument('--output', '-o', required=True, help="Library file to write (.cpl)")
+    listing = commands.add_parser('list', help="List the programs in a library")
+    listing.add_argument('library', help="Library file (.cpl)")
+    listing.add_argument('--search', default='', help="Only names containing this text (or hash prefix)")
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        try:
+            count = write_library(args.output, _read_directory(args.directory, args.pattern), args.record_size)
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+        print(f"Wrote {count} programs to {args.output}", file=sys.stderr)
+        return 0
+
+    with ProgramLibrary(args.library) as library:
+        for index in library.search(args.search):
+            program = library.program(index)
+            sys.stdout.write(f"{library.digest(index)}  {len(program):3d}  {library.names[index]}\n")
+            program.release()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
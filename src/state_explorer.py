@@ -0,0 +1,166 @@
+import itertools
+import time
+
+from .alu import FLAG_O
+from .cpu_core import CPU, RAM_SIZE, _DECODE_TABLE, _HANDLERS
+
+# Bố cục khóa trạng thái (giống CPU.state_key()): RAM[0..15], A, B, IAR, cờ
+_A, _B, _IAR, _FLAGS = RAM_SIZE, RAM_SIZE + 1, RAM_SIZE + 2, RAM_SIZE + 3
+
+
+def pack_state(ram, reg_a=0, reg_b=0, iar=0, flag_bits=0):
+    """Đóng gói một trạng thái máy thành khóa bytes 20 byte."""
+    return bytes(ram) + bytes((reg_a, reg_b, iar, flag_bits))
+
+
+def unpack_state(key):
+    """Giải nén khóa trạng thái thành dict dễ đọc."""
+    return {
+        'ram': list(key[:RAM_SIZE]),
+        'A': key[_A],
+        'B': key[_B],
+        'IAR': key[_IAR],
+        'flags': key[_FLAGS],
+    }
+
+
+class ExplorationResult:
+    """
+    Kết quả khám phá: outcome của từng đầu vào và chỉ mục trạng thái cuối -> các đầu vào.
+    outcomes[input] = {'status', 'cycles', 'final'} với status là
+    'halted' | 'unknown_opcode' | 'loop' | 'max_cycles'; final là khóa trạng thái cuối (None nếu không dừng).
+    """
+
+    def __init__(self, outcomes, index, states_explored, elapsed):
+        self.outcomes = outcomes
+        self.index = index
+        self.states_explored = states_explored
+        self.elapsed = elapsed
+
+    def inputs_where(self, predicate=None, status='halted'):
+        """Các đầu vào có trạng thái cuối thỏa predicate(unpack_state(final))."""
+        matches = []
+        for final, inputs in self.index.items():
+            if final is None:
+                continue
+            if predicate is None or predicate(unpack_state(final)):
+                matches.extend(i for i in inputs if self.outcomes[i]['status'] == status)
+        return matches
+
+
+class StateExplorer:
+    """
+    Khám phá toàn bộ không gian trạng thái đạt được từ một tập trạng thái ban đầu.
+
+    Duyệt theo chiều rộng (BFS) từng mức một; mỗi trạng thái được khử trùng lặp bằng
+    khóa đóng gói 20 byte nên các lần chạy hội tụ về cùng trạng thái dùng chung đồ thị
+    chuyển trạng thái. Vì máy tất định, đồ thị là hàm (mỗi trạng thái có tối đa một
+    trạng thái kế tiếp): outcome được tính một lần cho mỗi trạng thái rồi dùng lại.
+    """
+
+    def __init__(self, max_cycles=100000):
+        self.max_cycles = max_cycles
+        self._cpu = CPU()  # CPU nháp dùng để thực thi một lệnh trên khóa trạng thái
+        self._successor = {}  # khóa -> khóa kế tiếp
+        self._terminal = {}   # khóa -> (status, khóa cuối) của trạng thái vừa dừng
+
+    def step(self, key):
+        """Thực thi một lệnh từ trạng thái key, dùng chung bảng handler với CPU."""
+        cpu = self._cpu
+        cpu.ram[:] = key[:RAM_SIZE]
+        cpu.reg_a = key[_A]
+        cpu.reg_b = key[_B]
+        iar = key[_IAR]
+        cpu.iar = iar
+        cpu.flag_bits = key[_FLAGS] & ~FLAG_O
+        cpu.is_halted = False
+        decoded = _DECODE_TABLE[cpu.ram[iar]]
+        if not _HANDLERS[decoded.opcode](cpu, decoded.operand):
+            cpu.iar = (iar + 1) % RAM_SIZE
+        status = None
+        if cpu.is_halted:
+            status = 'halted' if decoded.name == 'HALT' else 'unknown_opcode'
+        return cpu.state_key(), status
+
+    def _walk(self, initial_keys):
+        """BFS trên đồ thị chuyển trạng thái; mỗi mức là một chu kỳ lệnh."""
+        successor = self._successor
+        terminal = self._terminal
+        frontier = [key for key in dict.fromkeys(initial_keys) if key not in successor and key not in terminal]
+        seen = set(frontier)
+        depth = 0
+        while frontier and depth < self.max_cycles:
+            next_frontier = []
+            for key in frontier:
+                following, status = self.step(key)
+                if status is not None:
+                    terminal[key] = (status, following)
+                    continue
+                successor[key] = following
+                if following not in seen and following not in successor and following not in terminal:
+                    seen.add(following)
+                    next_frontier.append(following)
+            frontier = next_frontier
+            depth += 1
+
+    def _resolve(self, key, outcome):
+        """Outcome (status, cycles, final) của key, nén đường đi cho các trạng thái trên đường."""
+        path = []
+        on_path = {}
+        while key not in outcome:
+            if key in on_path:
+                # Trạng thái lặp lại: mọi trạng thái trên đường từ đây không bao giờ dừng
+                for state in path:
+                    outcome[state] = ('loop', None, None)
+                return outcome[path[0]] if path else outcome[key]
+            if key in self._terminal:
+                status, final = self._terminal[key]
+                outcome[key] = (status, 1, final)
+                break
+            if key not in self._successor:
+                # Vượt quá giới hạn chu kỳ khi khám phá
+                outcome[key] = ('max_cycles', None, None)
+                break
+            on_path[key] = len(path)
+            path.append(key)
+            key = self._successor[key]
+
+        status, cycles, final = outcome[key]
+        for state in reversed(path):
+            if cycles is not None:
+                cycles += 1
+            outcome[state] = (status, cycles, final)
+        return outcome[path[0]] if path else outcome[key]
+
+    def explore(self, inputs):
+        """
+        inputs: dict nhãn đầu vào -> khóa trạng thái ban đầu.
+        Trả về ExplorationResult với outcome của từng nhãn và chỉ mục trạng thái cuối -> nhãn.
+        """
+        start = time.perf_counter()
+        self._walk(inputs.values())
+        outcome = {}
+        outcomes = {}
+        index = {}
+        for label, key in inputs.items():
+            status, cycles, final = self._resolve(key, outcome)
+            if status == 'max_cycles' or (cycles is not None and cycles > self.max_cycles):
+                status, cycles, final = 'max_cycles', self.max_cycles, None
+            outcomes[label] = {'status': status, 'cycles': cycles, 'final': final}
+            index.setdefault(final, []).append(label)
+        states = len(self._successor) + len(self._terminal)
+        return ExplorationResult(outcomes, index, states, time.perf_counter() - start)
+
+    def sweep(self, image, cells, values=range(256)):
+        """
+        Chạy chương trình image với mọi tổ hợp giá trị của các ô dữ liệu cells
+        (ví dụ 2 ô x 256 giá trị = 65536 đầu vào). Nhãn đầu vào là tuple giá trị.
+        """
+        base = bytearray(RAM_SIZE)
+        base[:len(image)] = image
+        inputs = {}
+        for combo in itertools.product(values, repeat=len(cells)):
+            for cell, value in zip(cells, combo):
+                base[cell] = value
+            inputs[combo] = pack_state(base)
+        return self.explore(inputs)
@@ -0,0 +1,213 @@
+import time
+
+from .alu import FLAG_O, FLAG_Z, FLAG_N
+from .cpu_core import OPCODE_MAP, _DECODE_TABLE, _HANDLERS
+from .memory import PagedMemory, extension_bytes
+
+_OPCODES_BY_NAME = {info['name']: int(bits, 2) for bits, info in OPCODE_MAP.items()}
+
+
+def instruction_length(instruction, address_bits):
+    """Độ dài (byte) của lệnh có byte đầu là instruction khi địa chỉ rộng address_bits bit."""
+    if _DECODE_TABLE[instruction].operands == 'Addr':
+        return 1 + extension_bytes(address_bits)
+    return 1
+
+
+def encode_instruction(name, operand=0, address_bits=16):
+    """
+    Mã hóa một lệnh theo định dạng toán hạng mở rộng:
+    [4 bit opcode | 4 bit thấp của địa chỉ] + các byte mở rộng little-endian cho phần địa chỉ còn lại.
+    Lệnh 'Data' (ADDI) vẫn dùng hằng số 4 bit; lệnh không có toán hạng chiếm 1 byte.
+    """
+    if name not in _OPCODES_BY_NAME:
+        raise ValueError(f"Unknown instruction: {name}")
+    opcode = _OPCODES_BY_NAME[name]
+    operands = OPCODE_MAP[f"{opcode:04b}"]['operands']
+    if operands == 'Addr':
+        if not 0 <= operand < (1 << address_bits):
+            raise ValueError(f"Address must be between 0 and {(1 << address_bits) - 1}. Received: {operand}")
+        encoded = bytearray(((opcode << 4) | (operand & 0xF),))
+        rest = operand >> 4
+        for _ in range(extension_bytes(address_bits)):
+            encoded.append(rest & 0xFF)
+            rest >>= 8
+        return bytes(encoded)
+    if operands == 'Data':
+        if not 0 <= operand <= 0xF:
+            raise ValueError(f"Immediate value must be between 0 and 15. Received: {operand}")
+        return bytes(((opcode << 4) | operand,))
+    if name in ('ADD', 'SUB'):
+        return bytes(((opcode << 4) | 0b1001,))  # Trường thanh ghi cố định như bộ nạp lệnh của giao diện
+    return bytes((opcode << 4,))
+
+
+# STORE trên bộ nhớ rộng phải hủy cache của mọi lệnh có thể chứa ô vừa ghi (kể cả byte mở rộng)
+def _op_store_a(cpu, operand):
+    cpu.memory[operand] = cpu.reg_a
+    cpu.invalidate_decode_cache(operand)
+    return False
+
+
+def _op_store_b(cpu, operand):
+    cpu.memory[operand] = cpu.reg_b
+    cpu.invalidate_decode_cache(operand)
+    return False
+
+
+# Dùng chung bảng handler của CPU (chúng đọc cpu.ram), chỉ thay STORE_A/STORE_B
+_WIDE_HANDLERS = _HANDLERS[:3] + (_op_store_a, _op_store_b) + _HANDLERS[5:]
+
+
+class WideCPU:
+    """
+    CPU cùng tập lệnh với CPU nhưng có độ rộng địa chỉ cấu hình được (4-16 bit) trên bộ nhớ
+    thưa PagedMemory. Lệnh có toán hạng địa chỉ được mã hóa mở rộng (xem encode_instruction);
+    với address_bits=4 mã hóa trùng với máy 16 ô gốc.
+
+    Chỉ chạy headless (run); giao diện đọc bộ nhớ trực tiếp qua self.memory.
+    """
+    __slots__ = (
+        'address_bits',
+        'memory',         # PagedMemory 2**address_bits byte
+        'reg_a',
+        'reg_b',
+        'iar',
+        'ir',             # Byte đầu của lệnh vừa thực thi
+        'flag_bits',
+        'is_halted',
+        '_span',          # Số byte mở rộng của lệnh địa chỉ
+        '_mask',          # 2**address_bits - 1
+        '_decode_cache',  # dict địa chỉ bắt đầu lệnh -> (DecodedInstruction, độ dài)
+    )
+
+    opcode_map = OPCODE_MAP
+
+    def __init__(self, address_bits=16):
+        self.memory = PagedMemory(address_bits)
+        self.address_bits = address_bits
+        self._span = extension_bytes(address_bits)
+        self._mask = self.memory.size - 1
+        self._decode_cache = {}
+        self.reg_a = 0
+        self.reg_b = 0
+        self.iar = 0
+        self.ir = 0
+        self.flag_bits = 0
+        self.is_halted = False
+
+    @property
+    def ram(self):
+        """Bí danh của memory để dùng chung các handler của CPU."""
+        return self.memory
+
+    @property
+    def flag_o(self):
+        return (self.flag_bits & FLAG_O) != 0
+
+    @property
+    def flag_z(self):
+        return (self.flag_bits & FLAG_Z) != 0
+
+    @property
+    def flag_n(self):
+        return (self.flag_bits & FLAG_N) != 0
+
+    def read_ram(self, address):
+        """Đọc giá trị 8-bit (0-255) từ địa chỉ bộ nhớ."""
+        if 0 <= address < self.memory.size:
+            return self.memory[address]
+        print(f"Error: Invalid RAM address on read: {address}")
+        return 0
+
+    def write_ram(self, address, value):
+        """Ghi giá trị 8-bit (0-255) vào địa chỉ bộ nhớ."""
+        if not isinstance(value, int) or not 0 <= value <= 0xFF:
+            raise ValueError(f"RAM data must be an 8-bit value (0-255). Received: {value}")
+        if 0 <= address < self.memory.size:
+            self.memory[address] = value
+            self.invalidate_decode_cache(address)
+        else:
+            print(f"Error: Invalid RAM address while writing: {address}")
+
+    def load_program(self, image, offset=0):
+        """Nạp một ảnh bộ nhớ (bytes) vào từ offset."""
+        self.memory.load(image, offset)
+        self._decode_cache.clear()
+
+    def invalidate_decode_cache(self, address=None):
+        """Hủy bản giải mã của mọi lệnh có thể chứa ô address (hoặc toàn bộ nếu address là None)."""
+        if address is None:
+            self._decode_cache.clear()
+            return
+        cache = self._decode_cache
+        for start in range(address - self._span, address + 1):
+            cache.pop(start & self._mask, None)
+
+    def decode_at(self, address):
+        """Giải mã lệnh bắt đầu tại address: trả về (DecodedInstruction với toán hạng đầy đủ, độ dài)."""
+        entry = self._decode_cache.get(address)
+        if entry is None:
+            memory = self.memory
+            decoded = _DECODE_TABLE[memory[address]]
+            length = 1
+            if decoded.operands == 'Addr' and self._span:
+                operand = decoded.operand
+                for index in range(self._span):
+                    operand |= memory[(address + 1 + index) & self._mask] << (4 + 8 * index)
+                decoded = decoded._replace(operand=operand & self._mask)
+                length += self._span
+            entry = self._decode_cache[address] = (decoded, length)
+        return entry
+
+    def run(self, max_cycles=100000, observer=None):
+        """
+        Chạy headless tối đa max_cycles lệnh (không in gì ra màn hình).
+        observer (tùy chọn) được gọi sau mỗi lệnh: observer(cycle, address, instruction, cpu).
+        Trả về dict giống CPU.run(): cycles, status, halted, elapsed, cycles_per_sec.
+        """
+        decode_cache = self._decode_cache
+        decode_at = self.decode_at
+        handlers = _WIDE_HANDLERS
+        mask = self._mask
+        not_o = ~FLAG_O
+        cycles = 0
+        status = 'halted' if self.is_halted else 'max_cycles'
+        start = time.perf_counter()
+
+        while cycles < max_cycles and not self.is_halted:
+            address = self.iar
+            entry = decode_cache.get(address)
+            if entry is None:
+                entry = decode_at(address)
+            decoded, length = entry
+            self.ir = decoded.instruction
+            self.flag_bits &= not_o
+            cycles += 1
+
+            if not handlers[decoded.opcode](self, decoded.operand):
+                self.iar = (address + length) & mask
+
+            if observer is not None:
+                observer(cycles, address, decoded.instruction, self)
+
+            if self.is_halted:
+                status = 'halted' if decoded.name == 'HALT' else 'unknown_opcode'
+
+        elapsed = time.perf_counter() - start
+        return {
+            'cycles': cycles,
+            'status': status,
+            'halted': self.is_halted,
+            'elapsed': elapsed,
+            'cycles_per_sec': cycles / elapsed if elapsed > 0 else 0.0,
+        }
+
+    def reset(self):
+        """Đặt lại thanh ghi và cờ (giữ nguyên bộ nhớ)."""
+        self.reg_a = 0
+        self.reg_b = 0
+        self.ir = 0
+        self.iar = 0
+        self.flag_bits = 0
+        self.is_halted = False
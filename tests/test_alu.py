@@ -0,0 +1,144 @@
+"""
+Kiểm tra toàn bộ bảng ALU (src/alu.py) trên mọi cặp toán hạng.
+
+Bảng được dựng từ reference_*, nên kết quả được so với một bản sao cố định của các nhánh
+ADD/SUB/ADDI trong CPU.execute_instruction gốc (BaselineALU bên dưới) và với các vector
+tính tay: một lỗi khi chép logic gốc sang reference_* sẽ bị phát hiện.
+"""
+import pytest
+
+from src.alu import (
+    ADD_TABLE, ADDI_TABLE, FLAG_N, FLAG_O, FLAG_Z, SUB_TABLE, ZN_TABLE,
+    add, addi, alu_output, sub,
+)
+
+
+class BaselineALU:
+    """Bản sao nguyên văn các nhánh ALU của CPU gốc (thanh ghi và cờ dạng dict). Không sửa khi đổi ALU."""
+
+    def __init__(self, val_a, val_b):
+        self.registers = {'A': val_a, 'B': val_b}
+        self.flags = {'Z': False, 'N': False, 'O': False}
+
+    def _update_flags_ZN(self, result):
+        self.flags['Z'] = (result == 0)
+        self.flags['N'] = (result & 0x80) != 0
+
+    def _to_signed_8bit(self, value):
+        if value > 127:
+            return value - 256
+        return value
+
+    def flag_bits(self):
+        return ((FLAG_O if self.flags['O'] else 0) | (FLAG_Z if self.flags['Z'] else 0) |
+                (FLAG_N if self.flags['N'] else 0))
+
+    def execute(self, op_name, operand_val=0):
+        """Thực thi một lệnh ALU, trả về (A, flag_bits)."""
+        if op_name == 'ADD':
+            val_a_before = self.registers['A']
+            val_b_before = self.registers['B']
+            result = val_a_before + val_b_before
+            signed_a = self._to_signed_8bit(val_a_before)
+            signed_b = self._to_signed_8bit(val_b_before)
+            if (signed_a > 0 and signed_b > 0 and self._to_signed_8bit(result) < 0) or \
+               (signed_a < 0 and signed_b < 0 and self._to_signed_8bit(result) > 0):
+                self.flags['O'] = True
+            else:
+                self.flags['O'] = False
+            self.registers['A'] = result & 0xFF
+            self._update_flags_ZN(self.registers['A'])
+        elif op_name == 'SUB':
+            val_a_before = self.registers['A']
+            val_b_before = self.registers['B']
+            result = val_a_before - val_b_before
+            signed_a = self._to_signed_8bit(val_a_before)
+            signed_b = self._to_signed_8bit(val_b_before)
+            if (signed_a > 0 and signed_b < 0 and self._to_signed_8bit(result) < 0) or \
+               (signed_a < 0 and signed_b > 0 and self._to_signed_8bit(result) > 0):
+                self.flags['O'] = True
+            else:
+                self.flags['O'] = False
+            self.registers['A'] = result & 0xFF
+            self._update_flags_ZN(self.registers['A'])
+        elif op_name == 'ADDI':
+            val_a_before = self.registers['A']
+            immediate_value = operand_val
+            result = val_a_before + immediate_value
+            signed_a = self._to_signed_8bit(val_a_before)
+            signed_immediate = immediate_value
+            if signed_a > 0 and signed_immediate > 0 and self._to_signed_8bit(result) < 0:
+                self.flags['O'] = True
+            else:
+                self.flags['O'] = False
+            self.registers['A'] = result & 0xFF
+            self._update_flags_ZN(self.registers['A'])
+        return self.registers['A'], self.flag_bits()
+
+
+OPERATIONS = {'ADD': add, 'SUB': sub, 'ADDI': addi}
+
+# Các vector đã tính tay (gồm cả các chỗ đặc thù của ALU gốc, ví dụ 128 + 128 không bật O)
+KNOWN_VECTORS = [
+    ('ADD', 0, 0, 0, FLAG_Z),
+    ('ADD', 1, 2, 3, 0),
+    ('ADD', 127, 1, 128, FLAG_O | FLAG_N),
+    ('ADD', 128, 128, 0, FLAG_Z),
+    ('ADD', 255, 1, 0, FLAG_Z),
+    ('ADD', 200, 100, 44, 0),
+    ('ADD', 192, 160, 96, FLAG_O),
+    ('SUB', 5, 3, 2, 0),
+    ('SUB', 3, 5, 254, FLAG_N),
+    ('SUB', 10, 10, 0, FLAG_Z),
+    ('SUB', 128, 1, 127, FLAG_O),
+    ('SUB', 127, 255, 128, FLAG_O | FLAG_N),
+    ('ADDI', 0, 0, 0, FLAG_Z),
+    ('ADDI', 126, 1, 127, 0),
+    ('ADDI', 127, 1, 128, FLAG_O | FLAG_N),
+    ('ADDI', 120, 15, 135, FLAG_O | FLAG_N),
+    ('ADDI', 255, 15, 14, 0),
+]
+
+
+@pytest.mark.parametrize('op_name, val_a, operand, value, flag_bits', KNOWN_VECTORS)
+def test_known_vectors(op_name, val_a, operand, value, flag_bits):
+    assert OPERATIONS[op_name](val_a, operand) == (value, flag_bits)
+    assert BaselineALU(val_a, operand).execute(op_name, operand) == (value, flag_bits)
+
+
+def test_table_sizes():
+    assert len(ADD_TABLE) == len(SUB_TABLE) == 256 * 256
+    assert len(ADDI_TABLE) == 256 * 16
+    assert len(ZN_TABLE) == 256
+
+
+@pytest.mark.parametrize('op_name', ['ADD', 'SUB'])
+def test_register_ops_match_baseline(op_name):
+    operation = OPERATIONS[op_name]
+    mismatches = [(val_a, val_b) for val_a in range(256) for val_b in range(256)
+                  if operation(val_a, val_b) != BaselineALU(val_a, val_b).execute(op_name)]
+    assert mismatches == []
+
+
+def test_addi_matches_baseline():
+    mismatches = [(val_a, immediate) for val_a in range(256) for immediate in range(16)
+                  if addi(val_a, immediate) != BaselineALU(val_a, 0).execute('ADDI', immediate)]
+    assert mismatches == []
+
+
+def test_zn_table_matches_baseline():
+    for value in range(256):
+        baseline = BaselineALU(0, 0)
+        baseline._update_flags_ZN(value)
+        assert ZN_TABLE[value] == baseline.flag_bits(), value
+
+
+def test_alu_output_matches_baseline():
+    # ALU_OUT gốc là (A op B) & 0xFF, chưa thực thi lệnh
+    for val_a in range(256):
+        for val_b in range(256):
+            assert alu_output('ADD', val_a, val_b) == (val_a + val_b) & 0xFF
+            assert alu_output('SUB', val_a, val_b) == (val_a - val_b) & 0xFF
+        for immediate in range(16):
+            assert alu_output('ADDI', val_a, 0, immediate) == (val_a + immediate) & 0xFF
+    assert alu_output('LOAD_A', 1, 2) is None